@@ -0,0 +1,154 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""Compare the Git backends of docstats on a synthetic or an existing repository
+
+Usage:
+   bench_backends.py [-h | --help]
+   bench_backends.py [options]
+
+Options:
+    -h, --help             Shows this help
+    --backends=LIST        Comma separated backends to compare [default: gitpython,git,pygit2]
+    --repo=PATH            Benchmark a clone of this repository (path or URL) instead of a synthetic one
+    --branch=NAME          The branch of the repository [default: develop]
+    --commits=N            Number of commits in the synthetic repository [default: 2000]
+    --files=M              Number of files in the synthetic repository [default: 200]
+    --tracker-density=P    Probability that a commit message contains tracker issues [default: 0.5]
+    --team=K               Number of team members; each gets three aliases [default: 20]
+    --externals=E          Number of external committers [default: 50]
+    --clone-mode=MODE      The clone mode, see docstats.worker.getcloneoptions [default: bare]
+    --set=KEYS             Comma separated section keys which decide the walk, for example
+                           "first-parent=yes,renames=yes", see docstats.config.getsectionscope
+    --repeat=R             Repeat each stage R times and report the fastest run [default: 3]
+    --seed=S               Seed for the random generator [default: 42]
+    --workdir=DIR          Directory for the repositories (default: a temporary directory)
+    --output=FILE          Write the JSON result to FILE instead of stdout
+
+Each backend clones the repository, resolves the branch, lists its commits,
+reads all commits with their diffstat, and analyzes the branch without cache.
+Run it from the root of the source tree::
+
+    $ PYTHONPATH=src python3 benchmarks/bench_backends.py --repo=https://github.com/SUSE/doc-sle.git
+"""
+
+from configparser import ConfigParser
+from docopt import docopt
+import git
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+
+import docstats
+from docstats.backends import getbackendclass
+from docstats.config import getsectionscope
+from docstats.repo import analyze_branch, resolve_ref
+from docstats.team import TeamDirectory
+from docstats.worker import getcloneoptions
+
+from bench_hotpath import makepeople, makerepo, measure
+
+
+def runbackend(name, url, branch, workdir, config, team, repeat):
+    """Run all stages with one backend and return their timings"""
+    backend = getbackendclass(name)
+    gitdir = os.path.join(workdir, 'doc-bench-{}'.format(name))
+    options = getcloneoptions(config, 'doc-bench')
+
+    def clone():
+        shutil.rmtree(gitdir, ignore_errors=True)
+        return backend.clone(url, gitdir, options)
+
+    stages = {}
+    stages['clone'], repo = measure(clone, repeat)
+    ref = resolve_ref(repo, branch)
+    if ref is None:
+        raise ValueError("Unknown branch {!r}".format(branch))
+    stages['resolve'], _ = measure(lambda: repo.resolve(ref), repeat)
+    scope = getsectionscope(config, 'doc-bench')
+    stages['revlist'], shas = measure(lambda: repo.revlist([ref], scope), repeat)
+    stages['log'], records = measure(lambda: list(repo.log(ref, scope=scope)), repeat)
+    stages['analyze'], result = measure(lambda: analyze_branch(repo, config, branch, branch, team=team,
+                                                               scope=scope), repeat)
+    for stage in stages.values():
+        stage['commits_per_second'] = len(shas) / stage['wall'] if stage['wall'] else None
+    repo.close()
+    return {'commits': len(shas),
+            'scope': scope.todict(),
+            'lines': sum(record.stats['lines'] for record in records),
+            'issues': sum(len(issues) for issues in result.ids.values()),
+            'stages': stages,
+            }
+
+
+def run(args, workdir):
+    """Run all backends and return the results as dictionary"""
+    repeat = int(args['--repeat'])
+    teammails, people = makepeople(int(args['--team']), int(args['--externals']))
+    if args['--repo']:
+        url, branch = args['--repo'], args['--branch']
+    else:
+        url, branch = makerepo(os.path.join(workdir, 'source.git'), args, people).git_dir, 'develop'
+
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'globals': {'team-mails': teammails, 'clone-mode': args['--clone-mode']},
+                      'doc-bench': {'url': url, 'branch': branch, 'cache': 'no'}})
+    if args['--set']:
+        config.read_dict({'doc-bench': dict(item.split('=', 1) for item in args['--set'].split(','))})
+    team = TeamDirectory.fromconfig(config)
+
+    backends = {}
+    for name in args['--backends'].split(','):
+        try:
+            backends[name] = runbackend(name, url, branch, workdir, config, team, repeat)
+        except (ValueError, git.GitCommandError) as error:
+            backends[name] = {'error': str(error)}
+
+    return {'docstats': docstats.__version__,
+            'python': platform.python_version(),
+            'git': ".".join(str(item) for item in git.Git().version_info),
+            'parameters': {key.lstrip('-'): value for key, value in args.items()
+                           if key not in ('--help', '--output', '--workdir')},
+            'backends': backends,
+            }
+
+
+def main(cliargs=None):
+    """Entry point of the benchmark"""
+    args = docopt(__doc__, argv=cliargs)
+    if args['--workdir']:
+        os.makedirs(args['--workdir'], exist_ok=True)
+        result = run(args, args['--workdir'])
+    else:
+        with tempfile.TemporaryDirectory(prefix='docstats-bench-') as workdir:
+            result = run(args, workdir)
+
+    if args['--output']:
+        with open(args['--output'], 'w') as fh:
+            json.dump(result, fh, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
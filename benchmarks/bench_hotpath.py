@@ -0,0 +1,209 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""Benchmark the commit processing of docstats on a synthetic Git repository
+
+Usage:
+   bench_hotpath.py [-h | --help]
+   bench_hotpath.py [options]
+
+Options:
+    -h, --help             Shows this help
+    --commits=N            Number of commits in the repository [default: 2000]
+    --files=M              Number of files in the repository [default: 200]
+    --tracker-density=P    Probability that a commit message contains tracker issues [default: 0.5]
+    --team=K               Number of team members; each gets three aliases [default: 20]
+    --externals=E          Number of external committers [default: 50]
+    --clone-mode=MODE      The clone mode, see docstats.worker.getcloneoptions [default: bare]
+    --repeat=R             Repeat each stage R times and report the fastest run [default: 3]
+    --seed=S               Seed for the random generator [default: 42]
+    --workdir=DIR          Directory for the synthetic repositories (default: a temporary directory)
+    --output=FILE          Write the JSON result to FILE instead of stdout
+
+Run it from the root of the source tree::
+
+    $ PYTHONPATH=src python3 benchmarks/bench_hotpath.py --commits=10000 --output=before.json
+"""
+
+from configparser import ConfigParser
+from docopt import docopt
+import git
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import docstats
+from docstats.gitlog import iter_log
+from docstats.repo import analyze, extract, getrange, resolve_ref
+from docstats.team import TeamDirectory
+from docstats.worker import clone_repo, getcloneoptions, output_result
+
+#: Templates for the tracker issues in commit messages
+ISSUE_TEMPLATES = ('bsc#{}', 'bnc #{}', 'fate#{}', 'https://fate.suse.com/{}', 'trello#{}',
+                   'https://trello.com/c/{}', 'Fixes #{}', 'closes SUSE/doc-sle#{}')
+
+#: Words for the commit messages
+WORDS = ('Update', 'Fix', 'typo', 'in', 'chapter', 'section', 'the', 'example', 'screen',
+         'Add', 'remove', 'obsolete', 'entity', 'procedure', 'image', 'link', 'Merge')
+
+
+def makemessage(rnd, density):
+    """Return a random commit message with tracker issues according to density"""
+    words = [rnd.choice(WORDS) for _ in range(rnd.randint(3, 12))]
+    if rnd.random() < density:
+        for _ in range(rnd.randint(1, 3)):
+            words.append(rnd.choice(ISSUE_TEMPLATES).format(rnd.randint(10, 999999)))
+    body = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(0, 40)))
+    return " ".join(words) + ("\n\n" + body if body else "") + "\n"
+
+
+def makepeople(team, externals):
+    """Return the "team-mails" text and the list of all committer identities"""
+    teammails = []
+    people = []
+    for idx in range(team):
+        aliases = ['member{}@example.org'.format(idx),
+                   'member{}@users.noreply.github.com'.format(idx),
+                   'Member.{}@Example.NET'.format(idx)]
+        teammails.append(" ".join(alias.lower() for alias in aliases))
+        people.extend(("Member {}".format(idx), alias) for alias in aliases)
+    people.extend(("External {}".format(idx), 'external{}@example.com'.format(idx)) for idx in range(externals))
+    return "\n".join(teammails), people
+
+
+def fastimport_stream(rnd, commits, files, density, people):
+    """Generator: Yields the chunks of a "git fast-import" stream"""
+    contents = [["line {} of file {}".format(line, idx) for line in range(rnd.randint(5, 50))]
+                for idx in range(files)]
+    now = 1485302400  # 2017-01-25
+    for mark in range(1, commits + 1):
+        name, mail = rnd.choice(people)
+        message = makemessage(rnd, density).encode('utf-8')
+        yield 'commit refs/heads/develop\nmark :{}\n'.format(mark).encode('utf-8')
+        yield 'committer {} <{}> {} +0000\n'.format(name, mail, now + mark * 3600).encode('utf-8')
+        yield 'data {}\n'.format(len(message)).encode('utf-8') + message
+        if mark > 1:
+            yield 'from :{}\n'.format(mark - 1).encode('utf-8')
+        changed = range(files) if mark == 1 else rnd.sample(range(files), rnd.randint(1, min(5, files)))
+        for idx in changed:
+            lines = contents[idx]
+            for _ in range(rnd.randint(1, 10)):
+                if lines and rnd.random() < 0.3:
+                    del lines[rnd.randrange(len(lines))]
+                else:
+                    lines.insert(rnd.randint(0, len(lines)), "new line {}".format(rnd.random()))
+            data = ("\n".join(lines) + "\n").encode('utf-8')
+            yield 'M 100644 inline doc/file{}.xml\ndata {}\n'.format(idx, len(data)).encode('utf-8') + data
+        yield b'\n'
+
+
+def makerepo(path, args, people):
+    """Create the synthetic repository with "git fast-import" """
+    rnd = random.Random(int(args['--seed']))
+    repo = git.Repo.init(path, bare=True)
+    proc = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd=path, stdin=subprocess.PIPE)
+    for chunk in fastimport_stream(rnd, int(args['--commits']), int(args['--files']),
+                                   float(args['--tracker-density']), people):
+        proc.stdin.write(chunk)
+    proc.stdin.close()
+    if proc.wait():
+        raise RuntimeError("git fast-import failed")
+    repo.git.symbolic_ref('HEAD', 'refs/heads/develop')
+    return repo
+
+
+def measure(func, repeat):
+    """Call func repeat times and return the fastest wall and CPU time with the last return value"""
+    best = None
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        value = func()
+        timing = {'wall': time.perf_counter() - wall, 'cpu': time.process_time() - cpu}
+        if best is None or timing['wall'] < best['wall']:
+            best = timing
+    return best, value
+
+
+def run(args, workdir):
+    """Run all stages and return the results as dictionary"""
+    repeat = int(args['--repeat'])
+    teammails, people = makepeople(int(args['--team']), int(args['--externals']))
+    source = makerepo(os.path.join(workdir, 'source.git'), args, people)
+
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'globals': {'team-mails': teammails, 'clone-mode': args['--clone-mode']},
+                      'doc-bench': {'url': source.git_dir, 'branch': 'develop', 'cache': 'no'}})
+    stages = {}
+    gitdir = os.path.join(workdir, 'doc-bench')
+
+    def clone():
+        subprocess.check_call(['rm', '-rf', gitdir])
+        return clone_repo('file://' + source.git_dir, gitdir, getcloneoptions(config, 'doc-bench'))
+
+    stages['clone'], repo = measure(clone, repeat)
+    rev = getrange(resolve_ref(repo, 'develop'))
+
+    stages['walk'], shas = measure(lambda: repo.git.rev_list(rev).split(), repeat)
+    stages['numstat'], records = measure(lambda: list(iter_log(repo, rev)), repeat)
+    stages['tracker-scan'], records = measure(lambda: [extract(record) for record in records], repeat)
+
+    team = TeamDirectory.fromtext(teammails)
+    stages['committers'], _ = measure(lambda: [team.resolve(record.email) for record in records], repeat)
+    stages['analyze'], result = measure(lambda: analyze(repo, config, 'doc-bench'), repeat)
+    stages['output'], _ = measure(lambda: output_result(repo, result), repeat)
+
+    for stage in stages.values():
+        stage['commits_per_second'] = len(shas) / stage['wall'] if stage['wall'] else None
+
+    return {'docstats': docstats.__version__,
+            'python': platform.python_version(),
+            'git': ".".join(str(item) for item in git.Git().version_info),
+            'parameters': {key.lstrip('-'): value for key, value in args.items()
+                           if key not in ('--help', '--output', '--workdir')},
+            'commits': len(shas),
+            'issues': sum(len(record.issues) for record in records),
+            'stages': stages,
+            }
+
+
+def main(cliargs=None):
+    """Entry point of the benchmark"""
+    args = docopt(__doc__, argv=cliargs)
+    if args['--workdir']:
+        os.makedirs(args['--workdir'], exist_ok=True)
+        result = run(args, args['--workdir'])
+    else:
+        with tempfile.TemporaryDirectory(prefix='docstats-bench-') as workdir:
+            result = run(args, workdir)
+
+    if args['--output']:
+        with open(args['--output'], 'w') as fh:
+            json.dump(result, fh, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -85,9 +85,12 @@ setup(
         'Operating System :: POSIX',
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12',
         # 'Programming Language :: Python :: Implementation :: CPython',
         # 'Programming Language :: Python :: Implementation :: PyPy',
         'Topic :: Utilities',
@@ -97,7 +100,15 @@ setup(
     keywords=[
         'stats', 'statistics', 'doc', 'documentation',
     ],
+    # asyncio.run() and contextvars:
+    python_requires='>=3.7',
     install_requires=requires('requirements.txt'),
+    extras_require={
+        # Exporting commits as Parquet or Arrow files:
+        'export': ['pyarrow'],
+        # Reading the repositories in-process with "backend = pygit2":
+        'pygit2': ['pygit2>=1.14'],
+    },
 
     # Testing:
     setup_requires=['pytest-runner', ],
@@ -0,0 +1,211 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+Accumulate the statistics of a branch while its commits are walked
+"""
+
+from collections import Counter
+from datetime import datetime, timezone
+
+from .tracker import TRACKERS
+
+__all__ = ('BranchStats', 'COMMITTER_KEYS', 'DIFFSTAT_KEYS', 'PERIODS', 'PERIOD_DATES',
+           'getperiodlabel')
+
+
+#: The summed up numbers of "git log --numstat"
+DIFFSTAT_KEYS = ('deletions', 'files', 'insertions', 'lines')
+
+#: Committers are either team members or external
+COMMITTER_KEYS = ('team-committers', 'external-committers')
+
+#: All possible values of the "period" key
+PERIODS = ('week', 'month', 'quarter')
+
+#: Maps the values of the "period-date" key to the field of the commit record
+PERIOD_DATES = {'commit': 'committed', 'author': 'authored'}
+
+
+def getperiodlabel(timestamp, period):
+    """Return the label of the period which contains a date (in UTC)
+
+    >>> getperiodlabel(1485302400, 'week'), getperiodlabel(1485302400, 'month')
+    ('2017-W04', '2017-01')
+    >>> getperiodlabel(1485302400, 'quarter')
+    '2017-Q1'
+
+    :param int timestamp: the date as Unix timestamp
+    :param str period: one of :data:`PERIODS`
+    :return: the label of the ISO week, the month, or the quarter
+    :rtype: str
+    """
+    date = datetime.fromtimestamp(timestamp, timezone.utc)
+    if period == 'week':
+        year, week, _ = date.isocalendar()
+        return '{:04d}-W{:02d}'.format(year, week)
+    if period == 'month':
+        return '{:04d}-{:02d}'.format(date.year, date.month)
+    if period == 'quarter':
+        return '{:04d}-Q{}'.format(date.year, (date.month - 1) // 3 + 1)
+    raise ValueError("Unknown period {!r}, expected one of {}".format(period, ", ".join(PERIODS)))
+
+
+class BranchStats:
+    """Accumulator for the commits of a branch
+
+    Duplicates are collapsed when they are added: the tracker issues are sets
+    and the committers are counters of their commits, so the memory depends
+    only on the number of distinct issues and committers, not on the number
+    of commits. Two accumulators can be combined with :meth:`merge`.
+
+    With a period, each commit is additionally collected into the
+    accumulator of its week, month, or quarter, see :meth:`getbucket`.
+
+    :param str period: one of :data:`PERIODS` or None
+    :param str perioddate: one of the keys of :data:`PERIOD_DATES`
+    """
+    __slots__ = ('commits', 'diffstats', 'issues', 'committers', 'period', 'perioddate', 'periods')
+
+    def __init__(self, period=None, perioddate='commit'):
+        if period is not None and period not in PERIODS:
+            raise ValueError("Unknown period {!r}, expected one of {}".format(period, ", ".join(PERIODS)))
+        if perioddate not in PERIOD_DATES:
+            raise ValueError("Unknown period-date {!r}, expected one of {}".format(
+                perioddate, ", ".join(PERIOD_DATES)))
+        #: Number of commits
+        self.commits = 0
+        #: Maps each key of :data:`DIFFSTAT_KEYS` to a number
+        self.diffstats = dict.fromkeys(DIFFSTAT_KEYS, 0)
+        #: Maps each tracker to a set of issues
+        self.issues = {tracker: set() for tracker in TRACKERS}
+        #: Maps each key of :data:`COMMITTER_KEYS` to a Counter of mail addresses
+        self.committers = {key: Counter() for key in COMMITTER_KEYS}
+        self.period = period
+        self.perioddate = perioddate
+        #: Maps the label of each period to its accumulator (without periods)
+        self.periods = {}
+
+    def __eq__(self, other):
+        if not isinstance(other, BranchStats):
+            return NotImplemented
+        return self.tostate() == other.tostate()
+
+    def __repr__(self):
+        return "<{} commits={}>".format(type(self).__name__, self.commits)
+
+    def merge(self, other):
+        """Add the commits of another accumulator; both must contain
+           different commits, otherwise they are counted twice
+
+        :param other: the other accumulator
+        :type other: :class:`BranchStats`
+        :return: self
+        :rtype: :class:`BranchStats`
+        """
+        self.commits += other.commits
+        for key, value in other.diffstats.items():
+            self.diffstats[key] += value
+        for tracker, issues in other.issues.items():
+            self.issues.setdefault(tracker, set()).update(issues)
+        for key, counter in other.committers.items():
+            self.committers[key].update(counter)
+        for label, stats in other.periods.items():
+            self.periods.setdefault(label, BranchStats()).merge(stats)
+        return self
+
+    def getbucket(self, commit):
+        """Return the accumulator of the period of a commit
+
+        :param commit: the commit
+        :type commit: :class:`docstats.gitlog.CommitRecord`
+        :return: the accumulator or None, if there is no period
+        :rtype: :class:`BranchStats` | None
+        """
+        if self.period is None:
+            return None
+        label = getperiodlabel(getattr(commit, PERIOD_DATES[self.perioddate]), self.period)
+        bucket = self.periods.get(label)
+        if bucket is None:
+            bucket = self.periods[label] = BranchStats()
+        return bucket
+
+    def commitsof(self, mail):
+        """Return the number of commits of a committer
+
+        :param str mail: the canonical mail address, see :meth:`docstats.team.TeamDirectory.resolve`
+        :return: the number of commits
+        :rtype: int
+        """
+        return sum(counter[mail] for counter in self.committers.values())
+
+    def todict(self):
+        """Return the result of the branch as it is written to the JSON file
+
+        The tracker issues are sorted lists and the committers are counted;
+        "committer-commits" maps each committer to the number of commits.
+        With a period, "periods" maps each label to the same data of the period.
+
+        :rtype: dict
+        """
+        result = {'commits': self.commits}
+        result.update(self.diffstats)
+        result.update((tracker, sorted(issues)) for tracker, issues in self.issues.items())
+        for key, counter in self.committers.items():
+            result[key] = len(counter)
+            # Kept for compatibility, the mails are already resolved by the team directory
+            result[key + '-mails'] = len(counter)
+        result['committer-commits'] = dict(sorted(sum(self.committers.values(), Counter()).items()))
+        if self.period is not None:
+            result['period'] = self.period
+            result['period-date'] = self.perioddate
+            result['periods'] = {label: self.periods[label].todict() for label in sorted(self.periods)}
+        return result
+
+    def tostate(self):
+        """Return the complete content as JSON serializable dictionary
+
+        :rtype: dict
+        """
+        return {'commits': self.commits,
+                'diffstats': dict(self.diffstats),
+                'issues': {tracker: sorted(issues) for tracker, issues in self.issues.items()},
+                'committers': {key: dict(counter) for key, counter in self.committers.items()},
+                'period': self.period,
+                'period-date': self.perioddate,
+                'periods': {label: stats.tostate() for label, stats in self.periods.items()},
+                }
+
+    @classmethod
+    def fromstate(cls, state):
+        """Create an accumulator from the result of :meth:`tostate`
+
+        :param dict state: the content
+        :return: the accumulator
+        :rtype: :class:`BranchStats`
+        """
+        stats = cls(state.get('period'), state.get('period-date', 'commit'))
+        stats.commits = state['commits']
+        stats.diffstats.update(state['diffstats'])
+        for tracker, issues in state['issues'].items():
+            stats.issues[tracker] = set(issues)
+        for key, counter in state['committers'].items():
+            stats.committers[key] = Counter(counter)
+        for label, substate in state.get('periods', {}).items():
+            stats.periods[label] = cls.fromstate(substate)
+        return stats
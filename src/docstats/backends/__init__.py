@@ -0,0 +1,75 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+Interchangeable backends which read the cloned repositories
+
+All backends implement :class:`GitBackend`; the "backend" key of a section
+selects one of :data:`BACKENDS`, see :func:`openbackend`.
+"""
+
+from .base import GitBackend
+from .gitpython import GitPythonBackend
+from .libgit2 import LibGit2Backend
+from .rawgit import RawGitBackend
+
+__all__ = ('BACKENDS', 'GitBackend', 'GitPythonBackend', 'LibGit2Backend', 'RawGitBackend',
+           'asbackend', 'getbackendclass', 'openbackend')
+
+
+#: Maps the values of the "backend" key to the backend classes
+BACKENDS = {backend.NAME: backend for backend in (GitPythonBackend, RawGitBackend, LibGit2Backend)}
+
+
+def getbackendclass(name):
+    """Return the class of a backend
+
+    >>> getbackendclass('git').__name__
+    'RawGitBackend'
+
+    :param str name: one of the keys of :data:`BACKENDS`
+    :rtype: type
+    """
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError("Unknown backend {!r}, expected one of {}".format(name, ", ".join(BACKENDS)))
+
+
+def openbackend(path, name='gitpython'):
+    """Open a cloned repository with a backend
+
+    :param str path: the path of the repository, with or without working tree
+    :param str name: one of the keys of :data:`BACKENDS`
+    :return: the opened repository
+    :rtype: :class:`GitBackend`
+    """
+    return getbackendclass(name)(path)
+
+
+def asbackend(repo):
+    """Return a backend for a repository; a :class:`git.Repo` is wrapped
+       into a :class:`GitPythonBackend`
+
+    :param repo: a repository
+    :type repo: :class:`git.Repo` | :class:`GitBackend`
+    :rtype: :class:`GitBackend`
+    """
+    if isinstance(repo, GitBackend):
+        return repo
+    return GitPythonBackend(repo)
@@ -0,0 +1,147 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+The interface of all Git backends
+"""
+
+import os.path
+
+import git
+
+from ..gitlog import prefetch_blobs
+
+
+class GitBackend:
+    """Read access to a cloned repository; the base class of all backends
+
+    A backend is opened with the path of a clone, with or without working
+    tree. Revisions and ranges are given as the arguments of "git rev-list",
+    see :func:`docstats.repo.getrevargs`. Failures of git are raised as
+    :class:`git.GitCommandError` by all backends.
+
+    :param str path: the path of the repository
+    """
+    #: The name of the backend in the "backend" key of the config
+    NAME = None
+
+    def __init__(self, path):
+        path = path.rstrip('/')
+        if os.path.isdir(os.path.join(path, '.git')):
+            self.working_tree_dir = path
+            self.git_dir = os.path.join(path, '.git')
+        else:
+            self.working_tree_dir = None
+            self.git_dir = path
+
+    def __repr__(self):
+        return "<{} {!r}>".format(type(self).__name__, self.working_tree_dir or self.git_dir)
+
+    @classmethod
+    def clone(cls, url, gitdir, options=None):
+        """Clone a repository and open it
+
+        :param str url: the URL of the Git repository
+        :param str gitdir: the directory to clone to
+        :param list options: additional options for "git clone", see
+                             :func:`docstats.worker.getcloneoptions`
+        :return: the opened repository
+        :rtype: :class:`GitBackend`
+        """
+        raise NotImplementedError
+
+    def fetch(self, refspecs, remote='origin'):
+        """Fetch branches from a remote
+
+        :param list refspecs: the refspecs, see :func:`docstats.worker.getrefspecs`
+        :param str remote: the name of the remote
+        """
+        raise NotImplementedError
+
+    def resolve(self, ref):
+        """Return the commit of a reference
+
+        :param str ref: a revision, for example "origin/develop"
+        :return: the SHA of the commit or None, if it is unknown
+        :rtype: str | None
+        """
+        raise NotImplementedError
+
+    def revlist(self, revargs, scope=None):
+        """Return all commits of a range, newest first
+
+        :param list revargs: the range and date options, see :func:`docstats.repo.getrevargs`
+        :param scope: only the commits which touch the scope or None, see
+                      :func:`docstats.gitlog.getscopeargs`
+        :type scope: :class:`docstats.gitlog.LogScope`
+        :return: the SHAs of the commits
+        :rtype: list
+        """
+        raise NotImplementedError
+
+    def log(self, rev=None, shas=None, scope=None):
+        """Generator: Yields the commits of a range with their diffstat
+
+        Merges are diffed against their first parent, renames are not detected,
+        and binary files are counted as changed files without lines, see
+        :func:`docstats.gitlog.iter_log`.
+
+        :param rev: the revision or range, or a list of arguments, see :meth:`revlist`
+        :type rev: str | list
+        :param list shas: instead of a range, yield exactly these commits in this order
+        :param scope: limits the commits and their diffstat or None
+        :type scope: :class:`docstats.gitlog.LogScope`
+        :return: yields each commit
+        :rtype: generator of :class:`docstats.gitlog.CommitRecord`
+        """
+        raise NotImplementedError
+
+    @property
+    def partial(self):
+        """True if the repository is a partial (blobless) clone"""
+        if not hasattr(self, '_partial'):
+            reader = git.GitConfigParser(os.path.join(self.git_dir, 'config'), read_only=True)
+            self._partial = reader.get_value('remote "origin"', 'promisor', False) is True
+        return self._partial
+
+    def prefetch(self, rev=None, shas=None, scope=None):
+        """Fetch the blobs which :meth:`log` diffs in one request if the
+           repository is a partial clone, see :func:`docstats.gitlog.prefetch_blobs`;
+           other clones have all blobs already
+
+        :param rev: the revision or range, or a list of arguments, see :meth:`revlist`
+        :type rev: str | list
+        :param list shas: instead of a range, the blobs of exactly these commits
+        :param scope: limits the commits and files or None
+        :type scope: :class:`docstats.gitlog.LogScope`
+        """
+        if self.partial:
+            prefetch_blobs(self.git_dir, rev, shas, scope)
+
+    def isancestor(self, ancestor, rev):
+        """Check if a commit is an ancestor of another one (or the same)
+
+        :param str ancestor: the possible ancestor
+        :param str rev: the descendant
+        :return: True if it is an ancestor, False otherwise or if one of the commits is unknown
+        :rtype: bool
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release all resources of the backend"""
@@ -0,0 +1,71 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+The backend which runs git through GitPython
+"""
+
+import git
+
+from ..gitlog import getscopeargs, iter_log
+from ..metrics import METRICS, instrument
+from .base import GitBackend
+
+
+class GitPythonBackend(GitBackend):
+    """Reads the repository with GitPython; each command is a git subprocess
+
+    :param path: the path of the repository or an already opened repository
+    :type path: str | :class:`git.Repo`
+    """
+    NAME = 'gitpython'
+
+    def __init__(self, path):
+        #: The instrumented repository, see :func:`docstats.metrics.instrument`
+        self.repo = instrument(path if isinstance(path, git.Repo) else git.Repo(path))
+        super().__init__(self.repo.working_tree_dir or self.repo.git_dir)
+
+    @classmethod
+    def clone(cls, url, gitdir, options=None):
+        METRICS.count('git-subprocesses')
+        return cls(git.Repo.clone_from(url, gitdir, multi_options=options))
+
+    def fetch(self, refspecs, remote='origin'):
+        self.repo.git.fetch(remote, *refspecs, prune=True)
+
+    def resolve(self, ref):
+        try:
+            return self.repo.git.rev_parse('{}^{{commit}}'.format(ref), verify=True, quiet=True)
+        except git.GitCommandError:
+            return None
+
+    def revlist(self, revargs, scope=None):
+        options, paths = getscopeargs(scope)
+        return self.repo.git.rev_list(*options, *revargs, '--', *paths).split()
+
+    def log(self, rev=None, shas=None, scope=None):
+        return iter_log(self.repo, rev, shas, scope)
+
+    def isancestor(self, ancestor, rev):
+        try:
+            return self.repo.is_ancestor(ancestor, rev)
+        except git.GitCommandError:
+            return False
+
+    def close(self):
+        self.repo.close()
@@ -0,0 +1,162 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+The backend which reads the repository in-process with libgit2 (pygit2)
+"""
+
+from git import GitCommandError
+
+try:
+    import pygit2
+except ImportError:  # pragma: no cover
+    pygit2 = None
+
+from ..config import parsedate
+from ..gitlog import CommitRecord
+from ..log import log
+from .base import GitBackend
+from .rawgit import RawGitBackend
+
+
+def _diffstat(diff):
+    """Return the numbers of a diff like :func:`docstats.gitlog.parse_numstat`"""
+    stats = diff.stats
+    return {'insertions': stats.insertions, 'deletions': stats.deletions,
+            'lines': stats.insertions + stats.deletions, 'files': stats.files_changed}
+
+
+class LibGit2Backend(GitBackend):
+    """Reads the repository with libgit2 in the same process; no git
+       subprocess is started, except for clones with options libgit2 lacks
+       and for walks which are limited by pathspecs or a binary threshold
+       (libgit2 has neither glob pathspecs nor a threshold per diff, so they
+       are passed to git as :class:`RawGitBackend` does)
+
+    Dates in ranges are compared with the committer date of each commit;
+    relative dates are approximated, see :func:`docstats.config.parsedate`.
+
+    :param str path: the path of the repository
+    """
+    NAME = 'pygit2'
+
+    def __init__(self, path):
+        if pygit2 is None:
+            raise ValueError("The backend {!r} needs pygit2".format(self.NAME))
+        super().__init__(path)
+        #: The libgit2 repository
+        self.repo = pygit2.Repository(self.git_dir)
+        #: Runs the walks which are limited by pathspecs
+        self.rawgit = RawGitBackend(self.git_dir)
+
+    @classmethod
+    def clone(cls, url, gitdir, options=None):
+        options = list(options or [])
+        if [option for option in options if option != '--bare']:
+            # Partial and shallow clones by date are not available in libgit2:
+            RawGitBackend.clone(url, gitdir, options)
+        else:
+            log.debug("Cloning %r into %r with libgit2", url, gitdir)
+            pygit2.clone_repository(url, gitdir, bare='--bare' in options)
+        return cls(gitdir)
+
+    def fetch(self, refspecs, remote='origin'):
+        self.repo.remotes[remote].fetch(refspecs, prune=pygit2.enums.FetchPrune.PRUNE)
+
+    def _lookup(self, ref):
+        """Return the commit of a revision or None"""
+        try:
+            return self.repo.revparse_single(ref).peel(pygit2.Commit)
+        except (KeyError, ValueError, pygit2.GitError):
+            return None
+
+    def resolve(self, ref):
+        commit = self._lookup(ref)
+        return None if commit is None else str(commit.id)
+
+    def _walk(self, revargs, scope=None):
+        """Generator: Yields the commits of a range, see :meth:`revlist`"""
+        since = until = None
+        for arg in revargs[1:]:
+            option, _, value = arg.partition('=')
+            if option == '--since':
+                since = parsedate(value)
+            elif option == '--until':
+                until = parsedate(value)
+            else:
+                raise ValueError("The backend {!r} doesn't support {!r}".format(self.NAME, arg))
+        try:
+            spec = self.repo.revparse(revargs[0])
+        except (KeyError, ValueError, pygit2.GitError) as error:
+            raise GitCommandError(['revparse', revargs[0]], 128, str(error))
+        if spec.to_object is None:
+            tip, hidden = spec.from_object, None
+        else:
+            tip, hidden = spec.to_object, spec.from_object
+        walker = self.repo.walk(tip.peel(pygit2.Commit).id, pygit2.GIT_SORT_TIME)
+        if hidden is not None:
+            walker.hide(hidden.peel(pygit2.Commit).id)
+        if scope is not None and scope.firstparent:
+            walker.simplify_first_parent()
+        for commit in walker:
+            if scope is not None and not scope.merges and len(commit.parents) > 1:
+                continue
+            if since is not None and commit.commit_time < since:
+                continue
+            if until is not None and commit.commit_time > until:
+                continue
+            yield commit
+
+    def revlist(self, revargs, scope=None):
+        if scope is not None and scope.paths:
+            return self.rawgit.revlist(revargs, scope)
+        return [str(commit.id) for commit in self._walk(revargs, scope)]
+
+    def _record(self, commit, scope=None):
+        """Return the record of a commit with its diffstat"""
+        if commit.parents:
+            diff = commit.parents[0].tree.diff_to_tree(commit.tree)
+        else:
+            diff = commit.tree.diff_to_tree(swap=True)
+        if scope is not None and scope.renames is not None:
+            diff.find_similar(pygit2.enums.DiffFind.FIND_RENAMES, rename_threshold=scope.renames)
+        return CommitRecord(str(commit.id), commit.committer.raw_email.decode('utf-8', 'replace'),
+                            commit.raw_message.decode('utf-8', 'replace'), _diffstat(diff), None,
+                            commit.commit_time, commit.author.time)
+
+    def log(self, rev=None, shas=None, scope=None):
+        if scope is not None and (scope.paths or scope.binarythreshold is not None):
+            yield from self.rawgit.log(rev, shas, scope)
+            return
+        if shas is not None:
+            commits = (self.repo[sha] for sha in shas)
+            if scope is not None and not scope.merges:
+                commits = (commit for commit in commits if len(commit.parents) < 2)
+        else:
+            commits = self._walk([rev] if isinstance(rev, str) else rev, scope)
+        for commit in commits:
+            yield self._record(commit, scope)
+
+    def isancestor(self, ancestor, rev):
+        ancestor, rev = self._lookup(ancestor), self._lookup(rev)
+        if ancestor is None or rev is None:
+            return False
+        return ancestor.id == rev.id or self.repo.descendant_of(rev.id, ancestor.id)
+
+    def close(self):
+        self.repo.free()
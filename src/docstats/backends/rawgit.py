@@ -0,0 +1,92 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+The backend which runs git directly as subprocess, without GitPython
+"""
+
+from subprocess import DEVNULL, PIPE, Popen, run
+
+from git import GitCommandError
+
+from ..gitlog import getlogargs, getscopeargs, parse_record, split_records
+from ..log import log
+from ..metrics import METRICS
+from .base import GitBackend
+
+
+class RawGitBackend(GitBackend):
+    """Reads the repository with plain git subprocesses
+
+    It avoids the overhead of GitPython (its command wrapper and the
+    persistent "git cat-file" processes), but runs the same commands.
+
+    :param str path: the path of the repository
+    """
+    NAME = 'git'
+
+    def _command(self, *args):
+        METRICS.count('git-subprocesses')
+        command = ['git', '--git-dir', self.git_dir] + list(args)
+        log.debug("Running %s", command)
+        return command
+
+    def _run(self, *args, check=True):
+        """Run a git command and return its output without the final newline"""
+        command = self._command(*args)
+        proc = run(command, stdout=PIPE, stderr=PIPE)
+        METRICS.count('git-bytes', len(proc.stdout))
+        if check and proc.returncode:
+            raise GitCommandError(command, proc.returncode, proc.stderr)
+        return proc.returncode, proc.stdout.decode('utf-8', 'replace').rstrip('\n')
+
+    @classmethod
+    def clone(cls, url, gitdir, options=None):
+        METRICS.count('git-subprocesses')
+        command = ['git', 'clone'] + list(options or []) + ['--', url, gitdir]
+        proc = run(command, stdout=DEVNULL, stderr=PIPE)
+        if proc.returncode:
+            raise GitCommandError(command, proc.returncode, proc.stderr)
+        return cls(gitdir)
+
+    def fetch(self, refspecs, remote='origin'):
+        self._run('fetch', '--prune', remote, *refspecs)
+
+    def resolve(self, ref):
+        status, sha = self._run('rev-parse', '--verify', '--quiet', '{}^{{commit}}'.format(ref), check=False)
+        return sha if status == 0 else None
+
+    def revlist(self, revargs, scope=None):
+        options, paths = getscopeargs(scope)
+        return self._run('rev-list', *options, *revargs, '--', *paths)[1].split()
+
+    def log(self, rev=None, shas=None, scope=None):
+        command = self._command(*getlogargs(rev, shas, scope))
+        with Popen(command, stdin=PIPE if shas is not None else DEVNULL, stdout=PIPE, stderr=PIPE) as proc:
+            if shas is not None:
+                # git reads all revisions from stdin before it starts writing
+                proc.stdin.write("".join(sha + "\n" for sha in shas).encode('ascii'))
+                proc.stdin.close()
+            for chunk in split_records(proc.stdout):
+                yield parse_record(chunk)
+            stderr = proc.stderr.read()
+        if proc.returncode:
+            raise GitCommandError(command, proc.returncode, stderr)
+
+    def isancestor(self, ancestor, rev):
+        return self._run('merge-base', '--is-ancestor', ancestor, rev, check=False)[0] == 0
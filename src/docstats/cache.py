@@ -0,0 +1,168 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+Persistent cache of extracted commits, stored as SQLite database next to the clone
+"""
+
+import json
+import sqlite3
+
+from .gitlog import CommitRecord
+from .log import log
+from .tracker import TRACKER_FINGERPRINT
+
+__all__ = ('CACHE_VERSION', 'CommitCache', 'getcachefile')
+
+
+#: Increase it when the format of the cached records changes
+CACHE_VERSION = 3
+
+#: Number of SHAs which are looked up with one query
+_BATCHSIZE = 500
+
+
+def getcachefile(repo):
+    """Return the filename of the cache which belongs to a cloned repository
+
+    :param repo: a repository, with or without working tree
+    :type repo: :class:`git.Repo`
+    :return: the path of the cache, for example "/tmp/docstats/doc-sle.cache.sqlite"
+    :rtype: str
+    """
+    path = (repo.working_tree_dir or repo.git_dir).rstrip('/')
+    return path + ".cache.sqlite"
+
+
+class CommitCache:
+    """Maps commit SHAs to their extracted :class:`docstats.gitlog.CommitRecord`
+
+    The cache is versioned by :data:`CACHE_VERSION`, the tracker regexes, and
+    the variant; if one of them changes, all cached records are dropped.
+    Cached records don't contain the commit message.
+
+    Additionally, it stores a "watermark" for each branch: the head which
+    was analyzed last and the results up to this head.
+
+    :param str filename: the path of the SQLite database or ":memory:"
+    :param str variant: what the records cover, for example the fingerprint
+                        of a :class:`docstats.gitlog.LogScope`
+    """
+
+    def __init__(self, filename, variant=''):
+        self.filename = filename
+        self.variant = variant
+        self.connection = sqlite3.connect(filename, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self._checkversion()
+
+    @property
+    def version(self):
+        """The version string of the cache"""
+        return "{}-{}-{}".format(CACHE_VERSION, TRACKER_FINGERPRINT, self.variant)
+
+    def _checkversion(self):
+        """Drop all cached records if the cache was written by another version"""
+        with self.connection as con:
+            con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = con.execute("SELECT value FROM meta WHERE key='version'").fetchone()
+            if row is not None and row[0] != self.version:
+                log.info("Cache %r is outdated, dropping it", self.filename)
+                con.execute("DROP TABLE IF EXISTS commits")
+                con.execute("DROP TABLE IF EXISTS watermarks")
+            con.execute("CREATE TABLE IF NOT EXISTS commits "
+                        "(sha TEXT PRIMARY KEY, email TEXT, stats TEXT, issues TEXT, "
+                        "committed INTEGER, authored INTEGER)")
+            con.execute("CREATE TABLE IF NOT EXISTS watermarks (name TEXT PRIMARY KEY, value TEXT)")
+            con.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,))
+
+    def get(self, shas):
+        """Look up the records of several commits
+
+        :param list shas: the SHAs of the commits
+        :return: dictionary of all found records with their SHA as key
+        :rtype: dict
+        """
+        result = {}
+        for idx in range(0, len(shas), _BATCHSIZE):
+            batch = shas[idx:idx + _BATCHSIZE]
+            query = ("SELECT sha, email, stats, issues, committed, authored "
+                     "FROM commits WHERE sha IN ({})".format(",".join("?" * len(batch))))
+            for sha, email, stats, issues, committed, authored in self.connection.execute(query, batch):
+                result[sha] = CommitRecord(sha, email, None, json.loads(stats),
+                                           tuple(tuple(issue) for issue in json.loads(issues)),
+                                           committed, authored)
+        return result
+
+    def missing(self, shas):
+        """Return the SHAs which are not in the cache
+
+        :param list shas: the SHAs of the commits
+        :return: the missing SHAs in the same order
+        :rtype: list
+        """
+        found = set()
+        for idx in range(0, len(shas), _BATCHSIZE):
+            batch = shas[idx:idx + _BATCHSIZE]
+            query = "SELECT sha FROM commits WHERE sha IN ({})".format(",".join("?" * len(batch)))
+            found.update(sha for sha, in self.connection.execute(query, batch))
+        return [sha for sha in shas if sha not in found]
+
+    def add(self, records):
+        """Store several records
+
+        :param records: the records to store
+        :type records: iterable of :class:`docstats.gitlog.CommitRecord`
+        """
+        with self.connection as con:
+            con.executemany("INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?, ?, ?)",
+                            ((record.hexsha, record.email, json.dumps(record.stats), json.dumps(record.issues),
+                              record.committed, record.authored)
+                             for record in records))
+
+    def getwatermark(self, name):
+        """Return what was stored for a branch by :meth:`setwatermark`
+
+        :param str name: the name of the branch in the config
+        :return: the stored dictionary or None
+        :rtype: dict | None
+        """
+        row = self.connection.execute("SELECT value FROM watermarks WHERE name=?", (name,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def setwatermark(self, name, value):
+        """Store the last analyzed head and the results of a branch
+
+        :param str name: the name of the branch in the config
+        :param dict value: a JSON serializable dictionary
+        """
+        with self.connection as con:
+            con.execute("INSERT OR REPLACE INTO watermarks VALUES (?, ?)", (name, json.dumps(value)))
+
+    def close(self):
+        """Close the database"""
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM commits").fetchone()[0]
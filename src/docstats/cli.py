@@ -42,6 +42,18 @@ Options:
     -h, --help             Shows this help
     -v                     Raise verbosity level
     --jobs=N, -j N         Allow N jobs at once [default: 1]
+    --clone-jobs=N         Allow N clones or fetches at once, independent of --jobs [default: 4]
+    --metrics=FILE         Write the timings and counters of all stages as JSON to FILE
+    --prometheus=FILE      Write the timings and counters for the textfile collector of
+                           the Prometheus node exporter to FILE (*.prom)
+    --report=FILE          Write the results of all sections into one report; the format
+                           is derived from the extension: .jsonl, .csv, or .sqlite/.db
+    --export=DIR           Export all commits of each branch as columnar file into DIR
+                           (needs pyarrow)
+    --export-format=FORMAT The format of the exported commits, "parquet" or "arrow"
+                           [default: parquet]
+    --profile=DIR          Profile the main process and each job with cProfile; writes
+                           the *.pstats files and a merged summary.txt into DIR
     --sections=NAME, -s NAME
                            Select one or more sections from configuration file only (default all)
                            separated  by comma
@@ -52,6 +64,9 @@ Options:
 from docopt import docopt, DocoptExit
 import os
 
+from . import export
+from .report import getreportformat
+
 
 def parsecli(cliargs=None):
     """Parse CLI arguments with docopt
@@ -81,6 +96,28 @@ def checkcliargs(args):
         args['--jobs'] = int(args['--jobs'])
     except ValueError:
         raise DocoptExit("Option -j/--jobs does not contain a number")
+    if args['--jobs'] < 1:
+        raise DocoptExit("Option -j/--jobs must be at least 1")
+
+    try:
+        args['--clone-jobs'] = int(args['--clone-jobs'])
+    except ValueError:
+        raise DocoptExit("Option --clone-jobs does not contain a number")
+    # A semaphore of 0 would wait forever:
+    if args['--clone-jobs'] < 1:
+        raise DocoptExit("Option --clone-jobs must be at least 1")
+
+    if args.get('--report'):
+        try:
+            getreportformat(args['--report'])
+        except ValueError as error:
+            raise DocoptExit(str(error))
+
+    if args.get('--export'):
+        if export.pyarrow is None:
+            raise DocoptExit("Option --export needs pyarrow, install docstats[export]")
+        if args['--export-format'] not in export.EXPORT_FORMATS:
+            raise DocoptExit("Option --export-format must be one of {}".format(", ".join(export.EXPORT_FORMATS)))
 
     args['--sections'] = None if args['--sections'] is None else args['--sections'].split(',')
 
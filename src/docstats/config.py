@@ -17,6 +17,23 @@
 #
 
 from configparser import ConfigParser
+from datetime import datetime
+import re
+import time
+
+from .gitlog import LogScope, getpathspecs
+
+
+#: Start or end positions which are dates, see :func:`isdate`
+_DATE_REGEX = re.compile(r'^(\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2})?)?'
+                         r'|\d+\.(second|minute|hour|day|week|month|year)s?(\.ago)?)$')
+
+#: Sizes in the format of git's config, for example "1m", see :func:`getsectionscope`
+_SIZE_REGEX = re.compile(r'^\d+[kmg]?$', re.IGNORECASE)
+
+#: The length of the units of relative dates in seconds; months and years are approximated
+_DATE_UNITS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400, 'week': 7 * 86400,
+               'month': 30 * 86400, 'year': 365 * 86400}
 
 
 def parseconfig(configfile):
@@ -38,6 +55,72 @@ def parseconfig(configfile):
 
     There can be multiple sections (here: "doc-sle") which contains an URL, the name of the branch, and
     optional time ranges (before and after).
+
+    The start and end of a branch ("start", "end", or "START..END" in "branches")
+    are either revisions or dates like "2017-01-25" or "90.days", see :func:`isdate`.
+    In "branches", a date with time is written with "T" like "2017-01-25T12:00".
+
+    The following keys can be set in [globals] only:
+
+    team-mails = MAIL [ALIAS...]
+        one team member per line, see :class:`docstats.team.TeamDirectory`
+    mailmap = PATH
+        a .mailmap file with additional aliases of committers
+    prune-clones = yes | no
+        remove the clones of sections which are no longer in the config from the
+        temporary directory, see :func:`docstats.maintenance.prune_clones` (default: yes)
+
+    The following keys can be set in [globals] or in a section:
+
+    clone-mode = full | bare | blobless | shallow
+        how a repository is cloned, see :func:`docstats.worker.getcloneoptions`;
+        blobless clones fetch the files of the uncached commits before they are diffed
+    shallow-since = DATE
+        the date for shallow clones when no start dates are in "branches"
+    update = yes | no
+        fetch the branches if the repository was already cloned (default: no)
+    cache = yes | no
+        keep the extracted commits in a SQLite database next to the clone (default: yes);
+        without it, the commits are only kept in memory during the run
+    period = week | month | quarter
+        additionally split the results of each branch into these periods (default: none)
+    period-date = commit | author
+        the date of a commit which decides its period (default: commit)
+    maintenance = yes | no
+        write commit-graphs and bitmaps and repack the clone after each clone or fetch,
+        see :func:`docstats.maintenance.maintain_clone` (default: yes)
+    repack-interval = DAYS
+        repack the clone at least every DAYS days; 0 repacks only when there are too many
+        loose objects or packs (default: 7)
+    object-group = auto | no | NAME
+        sections of the same group share one object store, so the objects of forks are
+        downloaded only once; "auto" groups the sections by the server and name of their
+        repository, see :mod:`docstats.objectstore` (default: no)
+    backend = gitpython | git | pygit2
+        how the cloned repository is read, see :data:`docstats.backends.BACKENDS`
+        (default: gitpython)
+    include = GLOB...
+        count only the commits and lines of the files which match one of the globs,
+        for example "**/*.xml"; git skips all other files, see :func:`getsectionscope`
+        (default: all files)
+    exclude = GLOB...
+        leave out the files which match one of the globs, for example "images/**"
+    first-parent = yes | no
+        follow only the first parent of merges, so the commits of merged branches
+        are left out (default: no)
+    merges = yes | no
+        count merges as commits with their diff against the first parent (default: yes)
+    renames = yes | no
+        detect renamed files, they count as one file instead of a deleted and an added
+        file (default: no, as it is expensive)
+    rename-threshold = PERCENT
+        the similarity from which a file counts as renamed (default: 50)
+    binary-threshold = SIZE
+        count files larger than SIZE (for example "1m") as binary files without lines;
+        they aren't diffed at all (default: git's core.bigFileThreshold, 512m)
+
+    The walk of each branch is recorded in "scope" of its result, see
+    :meth:`docstats.gitlog.LogScope.todict`.
     """
     config = ConfigParser(default_section='globals')
     files = config.read(configfile)
@@ -80,14 +163,23 @@ def getbranchparts(string, stdbranch='develop'):
     [('name', 'maintenance/SLE12', '', 'abc')]
     >>> list(getbranchparts('name maintenance/SLE12   abc..def'))
     [('name', 'maintenance/SLE12', 'abc', 'def')]
+    >>> list(getbranchparts('name maintenance/SLE12   2017-01-25T12:00..'))
+    [('name', 'maintenance/SLE12', '2017-01-25T12:00', '')]
+
+    The parts are separated by whitespace, so a date with time needs a "T"
+    instead of a space.
 
     :param string: a string in the format "NAME BRANCHNAME [[START][..][END]]
     :return: a tuple in the form "(branchname, start, end)"; the start and end parts can be an empty string
     :rtype: generator
+    :raises ValueError: if there are more parts, for example "2017-01-25 12:00.."
     """
     # Remove duplicated spaces
     data = ' '.join(string.strip().split()).split(' ')
 
+    if len(data) > 3:
+        raise ValueError("Unexpected {!r} in branch {!r}; write a date with time like "
+                         "2017-01-25T12:00".format(" ".join(data[3:]), " ".join(data)))
     if len(data) == 1:
         yield data[0], stdbranch, '', ''
     elif len(data) == 2:
@@ -119,7 +211,7 @@ def getbranches(branches):
     """
 
     if not branches:
-        raise StopIteration
+        return
 
     for branch in branches.strip().split("\n"):
         branch = branch.strip()
@@ -128,3 +220,141 @@ def getbranches(branches):
         if branch[0] in ('#', ';'):
             continue
         yield from getbranchparts(branch)
+
+
+def getsectionbranches(config, section):
+    """Return all branches of a section; if the section doesn't contain a "branches" key,
+       the keys "branch", "start", and "end" are used (the branch defaults to "develop")
+
+    :param config: a :class:`configparser.ConfigParser` instance
+    :type config: :class:`configparser.ConfigParser`
+    :param str section: the section name
+    :return: list of tuples in the format (name, branchname, start, end)
+    :rtype: list
+    """
+    branches = list(getbranches(config.get(section, 'branches', fallback=None)))
+    if not branches:
+        branchname = config.get(section, 'branch', fallback=None)
+        start = config.get(section, 'start', fallback='')
+        end = config.get(section, 'end', fallback='')
+
+        if not branchname:
+            # Use our default branch...
+            branchname = 'develop'
+        branches = [(branchname, branchname, start, end)]
+    return branches
+
+
+def getsectionperiod(config, section):
+    """Return how the results of a section are split into periods
+
+    :param config: a :class:`configparser.ConfigParser` instance
+    :type config: :class:`configparser.ConfigParser`
+    :param str section: the section name
+    :return: tuple of (period, period date); the period is None if the results
+             are not split, see :class:`docstats.aggregate.BranchStats`
+    :rtype: tuple
+    """
+    period = config.get(section, 'period', fallback=None) or None
+    return period, config.get(section, 'period-date', fallback='commit')
+
+
+def isdate(value):
+    """Check if a start or end position is a date instead of a revision
+
+    Absolute dates are "YYYY-MM-DD" (optionally with a time), relative dates
+    are passed to git as they are, for example "90.days" or "2.weeks.ago".
+
+    >>> isdate('2017-01-25'), isdate('2017-01-25 12:00'), isdate('90.days'), isdate('1.year.ago')
+    (True, True, True, True)
+    >>> isdate('abc123'), isdate('v1.0'), isdate('')
+    (False, False, False)
+
+    :param str value: the start or end position
+    :return: True if it is a date
+    :rtype: bool
+    """
+    return bool(value) and _DATE_REGEX.match(value) is not None
+
+
+def isrelativedate(value):
+    """Check if a start or end position is a date which moves with each run
+
+    >>> isrelativedate('90.days'), isrelativedate('2017-01-25'), isrelativedate('abc123')
+    (True, False, False)
+
+    :param str value: the start or end position
+    :return: True if it is a relative date
+    :rtype: bool
+    """
+    # Absolute dates always contain a dash, relative dates never:
+    return isdate(value) and '-' not in value
+
+
+def parsedate(value, now=None):
+    """Convert a date, see :func:`isdate`, into a Unix timestamp
+
+    Absolute dates are in local time like git uses them; for relative dates
+    a month is 30 days and a year 365 days.
+
+    >>> parsedate('90.days', now=10000000), parsedate('1.hour.ago', now=10000000)
+    (2224000, 9996400)
+
+    :param str value: the date
+    :param float now: the current time as Unix timestamp; if None, the time of the call
+    :return: the Unix timestamp
+    :rtype: int
+    """
+    if not isdate(value):
+        raise ValueError("Invalid date {!r}".format(value))
+    if value[0:4].isdigit() and value[4:5] == '-':
+        for fmt in ('%Y-%m-%d', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S'):
+            try:
+                return int(datetime.strptime(value.replace('T', ' '), fmt).timestamp())
+            except ValueError:
+                continue
+        # The format matched, but not the calendar, for example "2017-02-30"
+        raise ValueError("Invalid date {!r}".format(value))
+    number, unit = value.split('.')[:2]
+    now = time.time() if now is None else now
+    return int(now - int(number) * _DATE_UNITS[unit.rstrip('s')])
+
+
+def getsectionbackend(config, section):
+    """Return the name of the backend which reads the repository of a section
+
+    :param config: a :class:`configparser.ConfigParser` instance
+    :type config: :class:`configparser.ConfigParser`
+    :param str section: the section name
+    :return: one of the keys of :data:`docstats.backends.BACKENDS`
+    :rtype: str
+    """
+    return config.get(section, 'backend', fallback='gitpython') or 'gitpython'
+
+
+def getsectionscope(config, section):
+    """Return which commits and files of a section are counted and how they are
+       diffed; the "include" and "exclude" keys contain globs separated by
+       whitespace, see :func:`docstats.gitlog.getpathspecs`
+
+    :param config: a :class:`configparser.ConfigParser` instance
+    :type config: :class:`configparser.ConfigParser`
+    :param str section: the section name
+    :return: the scope of the walks
+    :raises ValueError: if the rename or binary threshold is invalid
+    :rtype: :class:`docstats.gitlog.LogScope`
+    """
+    include = config.get(section, 'include', fallback='').split()
+    exclude = config.get(section, 'exclude', fallback='').split()
+    renames = None
+    if config.getboolean(section, 'renames', fallback=False):
+        renames = config.getint(section, 'rename-threshold', fallback=50)
+        if not 0 <= renames <= 100:
+            raise ValueError("Invalid rename-threshold {!r} in {!r}".format(renames, section))
+    binarythreshold = config.get(section, 'binary-threshold', fallback='') or None
+    if binarythreshold is not None and not _SIZE_REGEX.match(binarythreshold):
+        raise ValueError("Invalid binary-threshold {!r} in {!r}".format(binarythreshold, section))
+    return LogScope(getpathspecs(include, exclude),
+                    firstparent=config.getboolean(section, 'first-parent', fallback=False),
+                    merges=config.getboolean(section, 'merges', fallback=True),
+                    renames=renames, binarythreshold=binarythreshold)
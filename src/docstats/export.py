@@ -0,0 +1,170 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+Export the records of all commits as columnar Parquet or Arrow IPC files
+
+The export needs :mod:`pyarrow`, which is an optional dependency (install
+"docstats[export]").
+"""
+
+import os
+
+from .tracker import TRACKERS
+from .utils import getsafename
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+__all__ = ('BATCHSIZE', 'CommitExporter', 'EXPORT_FORMATS', 'getexportfile', 'getschema')
+
+
+#: Number of commits which are written at once
+BATCHSIZE = 10000
+
+#: Maps the export formats to their file extension
+EXPORT_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def getexportfile(exportdir, section, name, exportformat='parquet'):
+    """Return the path of the export of a branch
+
+    >>> getexportfile('/tmp/export', 'doc-sle', 'maint/15')
+    '/tmp/export/doc-sle+maint_15@cad1aeab.parquet'
+
+    :param str exportdir: the directory of all exports or None
+    :param str section: the section name
+    :param str name: the name of the observable branch
+    :param str exportformat: one of the keys of :data:`EXPORT_FORMATS`
+    :return: the path or None, if exportdir is None
+    :rtype: str | None
+    """
+    if exportdir is None:
+        return None
+    return os.path.join(exportdir, getsafename(section, name) + EXPORT_FORMATS[exportformat])
+
+
+def getschema():
+    """Return the schema of the exported commits; each tracker is a list column
+
+    :rtype: :class:`pyarrow.Schema`
+    """
+    fields = [('section', pyarrow.string()),
+              ('name', pyarrow.string()),
+              ('sha', pyarrow.string()),
+              ('committed', pyarrow.timestamp('s', tz='UTC')),
+              ('authored', pyarrow.timestamp('s', tz='UTC')),
+              ('committer', pyarrow.string()),
+              ('team', pyarrow.bool_()),
+              ('insertions', pyarrow.int32()),
+              ('deletions', pyarrow.int32()),
+              ('lines', pyarrow.int32()),
+              ('files', pyarrow.int32()),
+              ]
+    fields.extend((tracker, pyarrow.list_(pyarrow.string())) for tracker in TRACKERS)
+    return pyarrow.schema(fields)
+
+
+class CommitExporter:
+    """Writes the commits of a branch in batches, so the memory doesn't grow
+       with the number of commits
+
+    The file is written as FILENAME.part and renamed when it is closed.
+    Parquet files of several branches can be read as one dataset with
+    ``pyarrow.parquet.read_table(EXPORTDIR)``; Arrow IPC files can be memory
+    mapped with ``pyarrow.ipc.open_file(pyarrow.memory_map(FILENAME))``.
+
+    :param str filename: the path, the format is derived from the extension
+    :param str section: the section name
+    :param str name: the name of the observable branch
+    :param team: the team members which resolve the committers
+    :type team: :class:`docstats.team.TeamDirectory`
+    :param int batchsize: number of commits which are written at once
+    """
+
+    def __init__(self, filename, section, name, team, batchsize=BATCHSIZE):
+        if pyarrow is None:
+            raise ImportError("Exporting commits needs pyarrow, install docstats[export]")
+        self.filename = filename
+        self.section = section
+        self.name = name
+        self.team = team
+        self.batchsize = batchsize
+        self.schema = getschema()
+        self.count = 0
+        self._columns = {field: [] for field in self.schema.names}
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        self._partfile = filename + ".part"
+        if filename.endswith(EXPORT_FORMATS['arrow']):
+            self._writer = pyarrow.ipc.new_file(self._partfile, self.schema)
+        else:
+            self._writer = pyarrow.parquet.ParquetWriter(self._partfile, self.schema)
+
+    def add(self, commit):
+        """Append a commit
+
+        :param commit: the commit, see :func:`docstats.repo.extract`
+        :type commit: :class:`docstats.gitlog.CommitRecord`
+        """
+        columns = self._columns
+        mail, isteam = self.team.resolve(commit.email)
+        columns['section'].append(self.section)
+        columns['name'].append(self.name)
+        columns['sha'].append(commit.hexsha)
+        columns['committed'].append(commit.committed)
+        columns['authored'].append(commit.authored)
+        columns['committer'].append(mail)
+        columns['team'].append(isteam)
+        for key in ('insertions', 'deletions', 'lines', 'files'):
+            columns[key].append(commit.stats[key])
+        issues = {tracker: [] for tracker in TRACKERS}
+        for tracker, issue in commit.issues:
+            issues[tracker].append(issue)
+        for tracker in TRACKERS:
+            columns[tracker].append(issues[tracker])
+        self.count += 1
+        if len(columns['sha']) >= self.batchsize:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered commits as one batch"""
+        if not self._columns['sha']:
+            return
+        batch = pyarrow.record_batch([self._columns[field] for field in self.schema.names], schema=self.schema)
+        self._writer.write_batch(batch)
+        for column in self._columns.values():
+            column.clear()
+
+    def close(self):
+        """Write the remaining commits and move the file to its final name"""
+        self.flush()
+        self._writer.close()
+        os.replace(self._partfile, self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._writer.close()
@@ -0,0 +1,396 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+Extract commit records from a single, streamed ``git log --numstat`` call
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+import hashlib
+from subprocess import PIPE, run
+
+import git
+
+from .log import log
+from .metrics import METRICS
+
+__all__ = ('CommitRecord', 'GIT_VERSION', 'LOG_FORMAT', 'LogScope', 'checkgitversion', 'getdiffargs', 'getgitversion',
+           'getlogargs', 'getpathspecs', 'getscopeargs', 'iter_log', 'parse_blobs', 'parse_numstat', 'parse_record',
+           'prefetch_blobs', 'split_records')
+
+
+#: Marks the start of a new commit in the output of "git log"
+RECORD_SEP = b'\x1e'
+
+#: Separates the fields of the commit header
+FIELD_SEP = '\x00'
+
+#: Format of the commit header: hash, committer email, committer and author
+#: date (as Unix timestamps), and the raw message
+LOG_FORMAT = '%x1e%H%x00%ce%x00%ct%x00%at%x00%B%x00'
+
+#: Size of the chunks which are read from the git process
+BUFSIZE = 64 * 1024
+
+#: The oldest git version which knows "--diff-merges=first-parent"
+GIT_VERSION = (2, 31)
+
+#: Fetches the objects whose IDs are read from stdin in one request, like
+#: the lazy fetches of git itself in a partial clone
+_PREFETCH_ARGS = ['-c', 'fetch.negotiationAlgorithm=noop', 'fetch', 'origin', '--no-tags', '--no-write-fetch-head',
+                  '--recurse-submodules=no', '--filter=blob:none', '--stdin']
+
+#: The mode of submodules in "git log --raw"; their IDs are commits, not blobs
+_GITLINK_MODE = '160000'
+
+#: One commit with all the information that the collectors need; the issues
+#: are a tuple of (tracker, issue) pairs which are filled in by
+#: :func:`docstats.repo.extract`; committed and authored are the dates as
+#: Unix timestamps
+CommitRecord = namedtuple('CommitRecord', ('hexsha', 'email', 'message', 'stats', 'issues',
+                                           'committed', 'authored'))
+CommitRecord.__new__.__defaults__ = (None, None)
+
+
+class LogScope(namedtuple('LogScope', ('paths', 'firstparent', 'merges', 'renames', 'binarythreshold'))):
+    """What a walk covers and how its commits are diffed
+
+    The pathspecs limit the commits and their diffstat to the matching files,
+    see :func:`getpathspecs`; without pathspecs, all files are covered. With
+    firstparent, only the first parent of each merge is followed; without
+    merges, merges are left out. Renames is the similarity in percent from
+    which a deleted and an added file count as one renamed file, or None to
+    count them as two files. Files which are larger than the binary threshold
+    (a size like "1m") are counted as binary files without diffing them.
+
+    The defaults are the cheapest exact walk: all commits, no rename detection,
+    and git's own threshold (512 MiB); merges are always diffed against their
+    first parent.
+    """
+    __slots__ = ()
+
+    @property
+    def fingerprint(self):
+        """A hash which changes whenever the scope changes"""
+        return hashlib.sha1(repr(tuple(self)).encode('utf-8')).hexdigest()
+
+    def todict(self):
+        """Return the scope as it is recorded in the result of each branch
+
+        >>> LogScope(firstparent=True, renames=50).todict()
+        {'paths': [], 'first-parent': True, 'merges': True, 'renames': 50, 'binary-threshold': None}
+
+        :rtype: dict
+        """
+        return {'paths': list(self.paths), 'first-parent': self.firstparent, 'merges': self.merges,
+                'renames': self.renames, 'binary-threshold': self.binarythreshold}
+
+
+LogScope.__new__.__defaults__ = ((), False, True, None, None)
+
+
+@lru_cache(maxsize=None)
+def getgitversion():
+    """Return the version of the installed git; git is asked only once per
+       process (and forked workers inherit the answer)
+
+    :return: tuple of (major, minor)
+    :rtype: tuple
+    """
+    return git.Git().version_info[:2]
+
+
+def checkgitversion():
+    """Make sure that the installed git can run :func:`iter_log`
+
+    :raises RuntimeError: if git is older than :data:`GIT_VERSION`
+    """
+    version = getgitversion()
+    if version < GIT_VERSION:
+        raise RuntimeError("docstats needs git {} or newer, found git {}".format(
+            ".".join(map(str, GIT_VERSION)), ".".join(map(str, version))))
+
+
+def getpathspecs(include=(), exclude=()):
+    """Convert the include and exclude globs of a section into pathspecs
+
+    The globs are relative to the top of the repository; "*" doesn't match
+    a slash, "**" matches any number of directories.
+
+    >>> getpathspecs(['**/*.xml'], ['images/**'])
+    (':(glob)**/*.xml', ':(glob,exclude)images/**')
+
+    :param list include: the globs of the covered files; if empty, all files are covered
+    :param list exclude: the globs of the files which are left out
+    :return: the pathspecs for "git rev-list" and "git log"
+    :rtype: tuple
+    """
+    return (tuple(':(glob){}'.format(glob.lstrip('/')) for glob in include) +
+            tuple(':(glob,exclude){}'.format(glob.lstrip('/')) for glob in exclude))
+
+
+def getscopeargs(scope, walk=True):
+    """Return the options and pathspecs which limit "git rev-list" and "git log" to a scope
+
+    With pathspecs, a walk lists each commit which changes the matching files
+    (instead of git's default simplification, which may skip some of them)
+    and each merge which joins such changes of both sides. A merge which only
+    brings in the changes of its side branch is left out, as these changes
+    are already counted in the commits of the side branch.
+
+    Without walking (for a list of SHAs), git can't simplify the merges, so
+    each merge which changes the files compared to one of its parents is
+    listed; this is a superset of the merges of the walk.
+
+    >>> getscopeargs(LogScope(getpathspecs(['xml/**'])))
+    (['--full-history', '--simplify-merges'], [':(glob)xml/**'])
+    >>> getscopeargs(LogScope(getpathspecs(['xml/**'])), walk=False)
+    (['--full-history'], [':(glob)xml/**'])
+    >>> getscopeargs(LogScope(firstparent=True, merges=False))
+    (['--first-parent', '--no-merges'], [])
+    >>> getscopeargs(None)
+    ([], [])
+
+    :param scope: the scope or None
+    :type scope: :class:`LogScope`
+    :param bool walk: True if git walks the history, False for a list of SHAs
+    :return: tuple of (options, pathspecs)
+    :rtype: tuple
+    """
+    if scope is None:
+        return [], []
+    options = []
+    if scope.firstparent and walk:
+        options.append('--first-parent')
+    if not scope.merges:
+        options.append('--no-merges')
+    if scope.paths:
+        options += ['--full-history', '--simplify-merges'] if walk else ['--full-history']
+    return options, list(scope.paths)
+
+
+def getdiffargs(scope):
+    """Return the git options and the "git log" options which decide how the
+       commits of a scope are diffed
+
+    >>> getdiffargs(None)
+    ([], ['--no-renames'])
+    >>> getdiffargs(LogScope(renames=40, binarythreshold='1m'))
+    (['-c', 'core.bigFileThreshold=1m'], ['--find-renames=40%'])
+
+    :param scope: the scope or None
+    :type scope: :class:`LogScope`
+    :return: tuple of (options before the git command, options of "git log")
+    :rtype: tuple
+    """
+    scope = LogScope() if scope is None else scope
+    gitoptions = []
+    if scope.binarythreshold is not None:
+        # Larger files are treated as binary, git doesn't even load them for the diff:
+        gitoptions = ['-c', 'core.bigFileThreshold={}'.format(scope.binarythreshold)]
+    if scope.renames is None:
+        return gitoptions, ['--no-renames']
+    return gitoptions, ['--find-renames={}%'.format(scope.renames)]
+
+
+def parse_numstat(text):
+    """Sum up the numstat lines of a single commit
+
+    Binary files are counted as changed files, but without any lines (as
+    GitPython's ``Commit.stats`` did).
+
+    >>> parse_numstat('1\\t2\\tfoo.txt\\n-\\t-\\tlogo.png\\n')
+    {'insertions': 1, 'deletions': 2, 'lines': 3, 'files': 2}
+
+    :param str text: the numstat lines in the format "INSERTIONS<TAB>DELETIONS<TAB>PATH"
+    :return: dictionary with the keys insertions, deletions, lines, and files
+    :rtype: dict
+    """
+    insertions = deletions = files = 0
+    for line in text.split('\n'):
+        if not line:
+            continue
+        ins, dels, _ = line.split('\t', 2)
+        files += 1
+        if ins != '-':
+            insertions += int(ins)
+            deletions += int(dels)
+    return {'insertions': insertions, 'deletions': deletions,
+            'lines': insertions + deletions, 'files': files}
+
+
+def parse_record(chunk):
+    """Parse a single commit of the "git log" output
+
+    :param str chunk: the output of one commit without the record separator
+    :return: the parsed commit
+    :rtype: :class:`CommitRecord`
+    """
+    hexsha, email, committed, authored, message, numstat = chunk.split(FIELD_SEP, 5)
+    return CommitRecord(hexsha, email, message, parse_numstat(numstat), None,
+                        int(committed), int(authored))
+
+
+def split_records(stream, bufsize=BUFSIZE):
+    """Generator: Split a binary stream into commit chunks without reading it completely;
+       the number of read bytes is counted as "git-bytes" in :data:`docstats.metrics.METRICS`
+
+    :param stream: a file-like object in binary mode
+    :param int bufsize: number of bytes to read at once
+    :return: yields each commit chunk as decoded string
+    :rtype: generator
+    """
+    buffer = b''
+    for data in iter(lambda: stream.read(bufsize), b''):
+        METRICS.count('git-bytes', len(data))
+        buffer += data
+        *chunks, buffer = buffer.split(RECORD_SEP)
+        for chunk in chunks:
+            if chunk:
+                yield chunk.decode('utf-8', 'replace')
+    if buffer:
+        yield buffer.decode('utf-8', 'replace')
+
+
+def getlogargs(rev=None, shas=None, scope=None, raw=False):
+    """Return the arguments of the "git log" call of :func:`iter_log`
+       (or of :func:`prefetch_blobs`)
+
+    >>> getlogargs(['develop', '--since=90.days'])[-3:]
+    ['develop', '--since=90.days', '--']
+    >>> getlogargs('develop', scope=LogScope(getpathspecs(['xml/**'])))[-4:]
+    ['--simplify-merges', 'develop', '--', ':(glob)xml/**']
+    >>> getlogargs('develop', scope=LogScope(binarythreshold='1m'))[:3]
+    ['-c', 'core.bigFileThreshold=1m', 'log']
+    >>> getlogargs('develop', scope=LogScope(renames=50), raw=True)[:5]
+    ['log', '--format=', '--raw', '--no-abbrev', '--no-renames']
+
+    :param rev: the revision or range, or a list of arguments
+    :type rev: str | list
+    :param list shas: if set, the commits are read from stdin instead
+    :param scope: limits the commits and decides how they are diffed or None
+    :type scope: :class:`LogScope`
+    :param bool raw: list only the blobs of each diff ("--raw"), which doesn't read them
+    :return: the arguments without the leading "git"
+    :rtype: list
+    """
+    if shas is not None:
+        revargs = ['--stdin', '--no-walk=unsorted']
+    else:
+        revargs = [rev] if isinstance(rev, str) else list(rev)
+    options, paths = getscopeargs(scope, walk=shas is None)
+    if raw:
+        # Renamed files are listed as deleted and added, so both of their blobs are included
+        command = ['log', '--format=', '--raw', '--no-abbrev', '--no-renames']
+    else:
+        gitoptions, diffoptions = getdiffargs(scope)
+        command = gitoptions + ['log', '--format=' + LOG_FORMAT, '--numstat'] + diffoptions
+    return command + ['--diff-merges=first-parent'] + options + revargs + ['--'] + paths
+
+
+def parse_blobs(text):
+    """Return the blobs of the output of "git log --raw --no-abbrev"
+
+    >>> raw = (':100644 100644 ' + 'a' * 40 + ' ' + 'b' * 40 + ' M\\tfoo.xml\\n'
+    ...        ':000000 100644 ' + '0' * 40 + ' ' + 'c' * 40 + ' A\\tbar.xml\\n')
+    >>> [blob[:4] for blob in parse_blobs(raw)]
+    ['aaaa', 'bbbb', 'cccc']
+
+    :param str text: the output
+    :return: the sorted IDs of the blobs, without the null ID of added or deleted files
+    :rtype: list
+    """
+    blobs = set()
+    for line in text.splitlines():
+        if not line.startswith(':'):
+            continue
+        oldmode, newmode, old, new = line[1:].split('\t', 1)[0].split()[:4]
+        if oldmode != _GITLINK_MODE:
+            blobs.add(old)
+        if newmode != _GITLINK_MODE:
+            blobs.add(new)
+    blobs.discard('0' * 40)
+    return sorted(blobs)
+
+
+def prefetch_blobs(gitdir, rev=None, shas=None, scope=None):
+    """Fetch the blobs which :func:`iter_log` diffs in one request; in a
+       blobless clone, git would otherwise fetch them lazily commit by commit
+
+    Blobs which are already there are fetched again; this is cheap compared
+    to one request per commit. A failure is logged and the blobs are left to
+    the lazy fetches of git.
+
+    :param str gitdir: the path of the partial clone
+    :param rev: the revision or range, or a list of arguments, see :func:`getlogargs`
+    :type rev: str | list
+    :param list shas: instead of a range, the blobs of exactly these commits
+    :param scope: limits the commits and files or None
+    :type scope: :class:`LogScope`
+    :return: the number of fetched blobs
+    :rtype: int
+    """
+    command = ['git', '--git-dir', gitdir]
+    METRICS.count('git-subprocesses')
+    proc = run(command + getlogargs(rev, shas, scope, raw=True), stdout=PIPE, stderr=PIPE,
+               input=None if shas is None else "".join(sha + "\n" for sha in shas).encode('ascii'))
+    blobs = parse_blobs(proc.stdout.decode('ascii', 'replace')) if not proc.returncode else []
+    if blobs:
+        METRICS.count('git-subprocesses')
+        proc = run(command + _PREFETCH_ARGS, stdout=PIPE, stderr=PIPE,
+                   input="".join(blob + "\n" for blob in blobs).encode('ascii'))
+    if proc.returncode:
+        log.warning("Cannot prefetch the blobs of %r: %s", gitdir, proc.stderr.decode('utf-8', 'replace').strip())
+        return 0
+    log.debug("Prefetched %d blobs into %r", len(blobs), gitdir)
+    return len(blobs)
+
+
+def iter_log(repo, rev=None, shas=None, scope=None):
+    """Generator: Yields all commits of a revision range with one "git log" call
+
+    Merges are diffed against their first parent and, without a scope,
+    renames are not detected; this gives the same numbers as GitPython's
+    ``Commit.stats`` but needs only one subprocess for the whole range.
+
+    :param repo: a repository
+    :type repo: :class:`git.Repo`
+    :param rev: the revision or range, for example "abc..develop", or a list
+                of arguments like ``['develop', '--since=2017-01-25']``
+    :type rev: str | list
+    :param list shas: instead of a range, yield exactly these commits in this order;
+                      with a scope, the commits which don't touch it are left out,
+                      see :func:`getscopeargs`
+    :param scope: limits the commits and decides how they are diffed or None
+    :type scope: :class:`LogScope`
+    :return: yields each commit
+    :rtype: generator of :class:`CommitRecord`
+    """
+    proc = repo.git.execute(['git'] + getlogargs(rev, shas, scope),
+                            istream=PIPE if shas is not None else None,
+                            as_process=True)
+    log.debug("Running %s", proc.args)
+    if shas is not None:
+        # git reads all revisions from stdin before it starts writing
+        proc.proc.stdin.write("".join(sha + "\n" for sha in shas).encode('ascii'))
+        proc.proc.stdin.close()
+    for chunk in split_records(proc.proc.stdout):
+        yield parse_record(chunk)
+    # Raises GitCommandError if git failed:
+    proc.wait()
@@ -17,9 +17,14 @@
 #
 
 from .cli import parsecli
+from contextlib import nullcontext
 from .config import parseconfig
 from configparser import DuplicateSectionError, DuplicateOptionError
+from .gitlog import checkgitversion
 from .log import log, setloglevel
+from .metrics import writemetrics, writeprometheus
+from .profiling import clearprofiles, getprofilefile, profiled, writesummary
+from .report import openreport
 from .utils import gettmpdir
 from .worker import work
 
@@ -39,10 +44,29 @@ def main(cliargs=None):
 
         configfile = args['CONFIGFILE']
         _, config = parseconfig(configfile)
+        try:
+            checkgitversion()
+        except RuntimeError as error:
+            log.error(error)
+            return 10
 
         basedir = gettmpdir(config.get('globals', 'tempdir', fallback=None))
         os.makedirs(basedir, exist_ok=True)
-        work(config, basedir, sections=args['--sections'], jobs=args['--jobs'])
+        profiledir = args.get('--profile')
+        if profiledir:
+            clearprofiles(profiledir)
+        reportfile = args.get('--report')
+        with profiled(getprofilefile(profiledir, 'main')), \
+                (openreport(reportfile) if reportfile else nullcontext()) as report:
+            metrics = work(config, basedir, sections=args['--sections'], jobs=args['--jobs'],
+                           profiledir=profiledir, clonejobs=args.get('--clone-jobs', 4), report=report,
+                           exportdir=args.get('--export'), exportformat=args.get('--export-format') or 'parquet')
+        if profiledir:
+            writesummary(profiledir)
+        if args.get('--metrics'):
+            writemetrics(metrics, args['--metrics'])
+        if args.get('--prometheus'):
+            writeprometheus(metrics, args['--prometheus'])
 
     except (DuplicateSectionError, DuplicateOptionError) as error:
         log.error(error)
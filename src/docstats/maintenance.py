@@ -0,0 +1,274 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+Keep the long-lived clones in the temporary directory fast
+
+After each clone or fetch, :func:`maintain_clone` writes a commit-graph with
+changed-path Bloom filters, a multi-pack-index with bitmap when fetches have
+added packs, and repacks the clone when there are too many loose objects or
+packs, or when the last repack is too old. :func:`prune_clones` removes the
+clones of sections which are no longer in the config.
+"""
+
+import asyncio
+import os.path
+import shutil
+from time import time
+
+import git
+
+from .gitlog import getgitversion
+from .log import log
+from .metrics import METRICS
+
+__all__ = ('CLONE_FILES', 'LOOSE_OBJECTS_LIMIT', 'MIDX_PACKS', 'PACKS_LIMIT', 'REPACK_INTERVAL',
+           'getmaintenancesteps', 'isclone', 'maintain_clone', 'parsecountobjects', 'prune_clones', 'run_git')
+
+
+#: Repack when a clone has more loose objects
+LOOSE_OBJECTS_LIMIT = 1000
+
+#: Repack when a clone has more packs
+PACKS_LIMIT = 20
+
+#: Write a multi-pack-index with bitmap when a clone has at least this many packs
+MIDX_PACKS = 2
+
+#: Days between two full repacks (the "repack-interval" key)
+REPACK_INTERVAL = 7
+
+#: The files which belong to a clone, see :func:`docstats.worker.output_result`
+#: and :func:`docstats.cache.getcachefile`
+CLONE_FILES = ('.json', '.csv', '.cache.sqlite')
+
+#: The minimum git versions of the maintenance steps
+_CHANGED_PATHS_VERSION = (2, 27)
+_MIDX_BITMAP_VERSION = (2, 34)
+
+
+async def run_git(*args):
+    """Run a git command as asyncio subprocess
+
+    :param args: the arguments of git
+    :return: the output of the command
+    :rtype: bytes
+    :raises git.GitCommandError: if the command fails
+    """
+    command = ['git'] + list(args)
+    log.debug("Running %s", command)
+    METRICS.count('git-subprocesses')
+    proc = await asyncio.create_subprocess_exec(*command,
+                                                stdout=asyncio.subprocess.PIPE,
+                                                stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await proc.communicate()
+    METRICS.count('git-bytes', len(stdout))
+    if proc.returncode:
+        raise git.GitCommandError(command, proc.returncode, stderr)
+    return stdout
+
+
+def getgitdir(path):
+    """Return the Git directory of a clone, with or without working tree"""
+    gitdir = os.path.join(path, '.git')
+    return gitdir if os.path.isdir(gitdir) else path
+
+
+def isclone(path):
+    """Check if a directory is a clone which is maintained by docstats,
+       see :func:`maintain_clone`
+
+    :param str path: the directory
+    :return: True if the clone has the key "docstats.section" in its config
+    :rtype: bool
+    """
+    configfile = os.path.join(getgitdir(path), 'config')
+    if not os.path.isfile(configfile):
+        return False
+    reader = git.GitConfigParser(configfile, read_only=True)
+    return reader.has_option('docstats', 'section')
+
+
+def parsecountobjects(text):
+    """Parse the output of "git count-objects -v"
+
+    >>> parsecountobjects('count: 12\\nsize: 48\\nin-pack: 300\\npacks: 3\\nsize-pack: 96\\n')['packs']
+    3
+
+    :param str text: the output
+    :return: maps each key to its number
+    :rtype: dict
+    """
+    objects = {}
+    for line in text.splitlines():
+        key, _, value = line.partition(':')
+        if value.strip().isdigit():
+            objects[key.strip()] = int(value)
+    return objects
+
+
+def getmaintenancesteps(objects, lastrepack, now, interval=REPACK_INTERVAL, bitmaps=True, commitgraph=True,
+                        version=(2, 34), keepunreachable=False, midxpacks=0):
+    """Return the git commands which keep a clone fast
+
+    >>> [name for name, _ in getmaintenancesteps({'count': 5, 'packs': 1}, 0, 3600)]
+    ['commit-graph']
+    >>> [name for name, _ in getmaintenancesteps({'count': 5, 'packs': 4}, 0, 3600)]
+    ['multi-pack-index', 'commit-graph']
+    >>> [name for name, _ in getmaintenancesteps({'count': 5, 'packs': 4}, 0, 3600, midxpacks=4)]
+    ['commit-graph']
+    >>> [name for name, _ in getmaintenancesteps({'count': 5000, 'packs': 4}, 0, 3600)]
+    ['repack', 'commit-graph']
+
+    :param dict objects: the numbers of the clone, see :func:`parsecountobjects`
+    :param int lastrepack: the Unix timestamp of the last repack
+    :param int now: the current Unix timestamp
+    :param int interval: the days between two repacks; 0 repacks only when there
+                         are too many loose objects or packs
+    :param bool bitmaps: False if the clone can't have bitmaps (shallow and partial clones,
+                         and clones which borrow objects from a shared store)
+    :param bool commitgraph: False if the clone can't use a commit-graph (shallow clones)
+    :param tuple version: the version of git
+    :param bool keepunreachable: True for shared object stores; other clones may still
+                                 need the objects which are no longer reachable in the store
+    :param int midxpacks: the number of packs when the last multi-pack-index was written,
+                          0 if none was written since the last repack
+    :return: list of tuples (name, arguments of git)
+    :rtype: list
+    """
+    steps = []
+    if (objects.get('count', 0) > LOOSE_OBJECTS_LIMIT or objects.get('packs', 0) > PACKS_LIMIT
+            or (interval and now - lastrepack >= interval * 86400)):
+        # One pack (and its bitmap) replaces all packs and a stale multi-pack-index
+        args = ['repack', '-a', '-d', '-l', '-q']
+        if keepunreachable:
+            args.append('--keep-unreachable')
+        if bitmaps:
+            args.append('--write-bitmap-index')
+        steps.append(('repack', args))
+    elif (bitmaps and objects.get('packs', 0) >= MIDX_PACKS and objects.get('packs') != midxpacks
+          and version >= _MIDX_BITMAP_VERSION):
+        # Only fetches since the last write add packs
+        steps.append(('multi-pack-index', ['multi-pack-index', 'write', '--bitmap']))
+    if commitgraph:
+        args = ['commit-graph', 'write', '--reachable', '--split']
+        if version >= _CHANGED_PATHS_VERSION:
+            args.append('--changed-paths')
+        steps.append(('commit-graph', args))
+    return steps
+
+
+async def _getconfig(gitdir, key):
+    """Return the value of a key in the config of a clone or None"""
+    try:
+        return (await run_git('-C', gitdir, 'config', '--get', key)).decode('utf-8').strip()
+    except git.GitCommandError:
+        return None
+
+
+async def maintain_clone(gitdir, config, section, now=None, group=None):
+    """Run the maintenance steps of a clone, see :func:`getmaintenancesteps`;
+       failures are logged, but don't stop the analysis
+
+    The time of the last repack is stored in the config of the clone as
+    "docstats.repacked", the section as "docstats.section" (or the group of a
+    shared object store as "docstats.group"). A new clone counts as just repacked.
+    The number of packs covered by the last multi-pack-index is stored as
+    "docstats.midxpacks", so it is only rewritten when fetches have added packs.
+
+    :param str gitdir: the path of the clone
+    :param config: the docstats configuration contents
+    :type config: :class:`configparser.ConfigParser`
+    :param str section: the section name
+    :param int now: the current Unix timestamp or None
+    :param str group: the object group if gitdir is a shared object store,
+                      see :mod:`docstats.objectstore`
+    """
+    if not config.getboolean(section, 'maintenance', fallback=True):
+        return
+    now = int(time()) if now is None else now
+    interval = config.getint(section, 'repack-interval', fallback=REPACK_INTERVAL)
+    with METRICS.stage('maintenance'):
+        try:
+            await _maintain(gitdir, section, now, interval, group)
+        except git.GitCommandError as error:
+            log.warning("Cannot maintain %r: %s", gitdir, error)
+
+
+async def _maintain(gitdir, section, now, interval, group):
+    """Run the maintenance steps of a clone, see :func:`maintain_clone`;
+       a failing step is logged and skipped"""
+    path = getgitdir(gitdir)
+    shallow = os.path.exists(os.path.join(path, 'shallow'))
+    partial = await _getconfig(gitdir, 'remote.origin.promisor') == 'true'
+    borrowed = os.path.exists(os.path.join(path, 'objects', 'info', 'alternates'))
+
+    lastrepack = await _getconfig(gitdir, 'docstats.repacked')
+    if lastrepack is None:
+        if group is None:
+            await run_git('-C', gitdir, 'config', 'docstats.section', section)
+        else:
+            await run_git('-C', gitdir, 'config', 'docstats.group', group)
+        await run_git('-C', gitdir, 'config', 'docstats.repacked', str(now))
+        lastrepack = now
+    midxpacks = int(await _getconfig(gitdir, 'docstats.midxpacks') or 0)
+    objects = parsecountobjects((await run_git('-C', gitdir, 'count-objects', '-v')).decode('utf-8'))
+    for name, args in getmaintenancesteps(objects, int(lastrepack), now, interval,
+                                          bitmaps=not (shallow or partial or borrowed),
+                                          commitgraph=not shallow, version=getgitversion(),
+                                          keepunreachable=group is not None, midxpacks=midxpacks):
+        try:
+            await run_git('-C', gitdir, *args)
+        except git.GitCommandError as error:
+            log.warning("Maintenance step %s of %r failed: %s", name, gitdir, error)
+            continue
+        METRICS.count(name)
+        if name == 'repack':
+            await run_git('-C', gitdir, 'config', 'docstats.repacked', str(now))
+            await run_git('-C', gitdir, 'config', 'docstats.midxpacks', '0')
+        elif name == 'multi-pack-index':
+            await run_git('-C', gitdir, 'config', 'docstats.midxpacks', str(objects['packs']))
+    log.debug("Maintained %r with %r", gitdir, objects)
+
+
+def prune_clones(config, basedir):
+    """Remove the clones (and their results and caches) of sections which are
+       no longer in the config; only clones which were maintained by docstats
+       are removed, see :func:`isclone`
+
+    :param config: the docstats configuration contents
+    :type config: :class:`configparser.ConfigParser`
+    :param str basedir: the temporary base directory
+    :return: the names of the removed clones
+    :rtype: list
+    """
+    if not config.getboolean('globals', 'prune-clones', fallback=True):
+        return []
+    sections = set(config.sections())
+    removed = []
+    for name in sorted(os.listdir(basedir)):
+        path = os.path.join(basedir, name)
+        if name in sections or not os.path.isdir(path) or not isclone(path):
+            continue
+        log.info("Removing clone %r of a section which is no longer in the config", path)
+        shutil.rmtree(path)
+        for suffix in CLONE_FILES:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        removed.append(name)
+    return removed
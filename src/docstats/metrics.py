@@ -0,0 +1,254 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+Timings and counters of the stages of a run, written as JSON or in the
+Prometheus textfile collector format
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import os
+import time
+
+import git
+
+__all__ = ('METRICS', 'CountingGit', 'Metrics', 'instrument', 'writemetrics', 'writeprometheus')
+
+
+class Metrics:
+    """Collects the wall and CPU time of stages and some counters; both are
+       labeled with the section and branch of the current :meth:`scope`
+
+    The object is picklable, so the workers return a :meth:`snapshot` of their
+    metrics which is added to the metrics of the main process with :meth:`merge`.
+    The labels are kept in a context variable, so concurrent asyncio tasks can
+    use their own :meth:`scope`.
+    """
+    __slots__ = ('timings', 'counters', '_labels')
+
+    def __init__(self):
+        #: Maps (stage, section, branch) to a list of [calls, wall, cpu]
+        self.timings = {}
+        #: Maps (name, section, branch) to a number
+        self.counters = {}
+        self._labels = ContextVar('labels', default=('', ''))
+
+    def __getstate__(self):
+        return self.timings, self.counters
+
+    def __setstate__(self, state):
+        self.timings, self.counters = state
+        self._labels = ContextVar('labels', default=('', ''))
+
+    @contextmanager
+    def scope(self, section='', branch=''):
+        """Context manager: Label all stages and counters with a section and branch
+
+        :param str section: the section name
+        :param str branch: the name of the observable branch
+        """
+        token = self._labels.set((section or '', branch or ''))
+        try:
+            yield self
+        finally:
+            self._labels.reset(token)
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager: Measure the wall and CPU time of a stage
+
+        Nested stages are measured independently, so their times overlap.
+
+        :param str name: the name of the stage, for example "clone"
+        """
+        key = (name,) + self._labels.get()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            timing = self.timings.setdefault(key, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += time.perf_counter() - wall
+            timing[2] += time.process_time() - cpu
+
+    def count(self, name, value=1):
+        """Increase a counter
+
+        :param str name: the name of the counter, for example "git-subprocesses"
+        :param int value: the amount to add
+        """
+        key = (name,) + self._labels.get()
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def merge(self, other):
+        """Add the timings and counters of another object
+
+        :param other: the metrics to add, for example of a worker
+        :type other: :class:`Metrics`
+        """
+        for key, (calls, wall, cpu) in other.timings.items():
+            timing = self.timings.setdefault(key, [0, 0.0, 0.0])
+            timing[0] += calls
+            timing[1] += wall
+            timing[2] += cpu
+        for key, value in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def snapshot(self):
+        """Return a copy of the current timings and counters
+
+        :rtype: :class:`Metrics`
+        """
+        result = Metrics()
+        result.merge(self)
+        return result
+
+    def clear(self):
+        """Remove all timings and counters"""
+        self.timings.clear()
+        self.counters.clear()
+
+    def todict(self):
+        """Return the metrics as JSON serializable dictionary
+
+        Stages of a branch which counted commits get the key "commits_per_second".
+
+        :return: dictionary with the keys "stages" and "counters"
+        :rtype: dict
+        """
+        stages = []
+        for (name, section, branch), (calls, wall, cpu) in sorted(self.timings.items()):
+            entry = {'stage': name, 'section': section, 'branch': branch,
+                     'calls': calls, 'wall': wall, 'cpu': cpu}
+            commits = self.counters.get(('commits', section, branch))
+            if commits is not None and branch:
+                entry['commits_per_second'] = commits / wall if wall else None
+            stages.append(entry)
+        counters = [{'name': name, 'section': section, 'branch': branch, 'value': value}
+                    for (name, section, branch), value in sorted(self.counters.items())]
+        return {'stages': stages, 'counters': counters}
+
+    def toprometheus(self, prefix='docstats'):
+        """Return the metrics in the Prometheus text format
+
+        >>> m = Metrics()
+        >>> with m.scope('doc-a'):
+        ...     m.count('git-subprocesses', 2)
+        >>> print(m.toprometheus().splitlines()[-1])
+        docstats_git_subprocesses_total{section="doc-a",branch=""} 2
+
+        :param str prefix: the prefix of all metric names
+        :return: the content of a textfile for the node exporter
+        :rtype: str
+        """
+        def labels(section, branch, **extra):
+            items = dict(extra, section=section, branch=branch)
+            return ",".join('{}="{}"'.format(key, _escape(value)) for key, value in items.items())
+
+        lines = []
+        for index, (suffix, helptext) in enumerate((('stage_calls_total', "Number of runs of a stage"),
+                                                    ('stage_wall_seconds', "Wall time of a stage"),
+                                                    ('stage_cpu_seconds', "CPU time of a stage"))):
+            metric = "{}_{}".format(prefix, suffix)
+            lines.append("# HELP {} {}".format(metric, helptext))
+            lines.append("# TYPE {} {}".format(metric, 'counter' if index == 0 else 'gauge'))
+            for (name, section, branch), timing in sorted(self.timings.items()):
+                lines.append("{}{{{}}} {}".format(metric, labels(section, branch, stage=name), timing[index]))
+
+        names = sorted({key[0] for key in self.counters})
+        for name in names:
+            metric = "{}_{}_total".format(prefix, name.replace('-', '_'))
+            lines.append("# TYPE {} counter".format(metric))
+            for (_, section, branch), value in sorted(item for item in self.counters.items()
+                                                      if item[0][0] == name):
+                lines.append("{}{{{}}} {}".format(metric, labels(section, branch), value))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+#: The metrics of the current process
+METRICS = Metrics()
+
+
+class CountingGit(git.Git):
+    """Git command wrapper which counts the subprocesses and the bytes of their
+       output in :data:`METRICS`; streamed output (``as_process=True``) is
+       counted by its reader
+    """
+
+    def execute(self, command, *args, **kwargs):
+        METRICS.count('git-subprocesses')
+        result = super().execute(command, *args, **kwargs)
+        output = result[1] if isinstance(result, tuple) else result
+        if isinstance(output, (str, bytes)):
+            METRICS.count('git-bytes', len(output))
+        return result
+
+
+def instrument(repo):
+    """Count all git commands of a repository in :data:`METRICS`
+
+    Commands which GitPython runs through persistent processes (for example
+    "git cat-file --batch") are counted only once.
+
+    :param repo: the repository
+    :type repo: :class:`git.Repo`
+    :return: the same repository
+    :rtype: :class:`git.Repo`
+    """
+    if not isinstance(repo.git, CountingGit):
+        repo.git = CountingGit(repo.working_dir)
+    return repo
+
+
+def _replace(filename, content):
+    """Write a file atomically, so readers never see a partial file"""
+    tmpfile = "{}.{}.tmp".format(filename, os.getpid())
+    with open(tmpfile, 'w') as fh:
+        fh.write(content)
+    os.replace(tmpfile, filename)
+
+
+def writemetrics(metrics, filename):
+    """Write the metrics as JSON file
+
+    :param metrics: the metrics
+    :type metrics: :class:`Metrics`
+    :param str filename: the path of the JSON file
+    """
+    data = dict(metrics.todict(), timestamp=time.time())
+    _replace(filename, json.dumps(data, indent=4))
+
+
+def writeprometheus(metrics, filename):
+    """Write the metrics for the textfile collector of the Prometheus node exporter
+
+    :param metrics: the metrics
+    :type metrics: :class:`Metrics`
+    :param str filename: the path of the file, it should end with ".prom"
+    """
+    content = metrics.toprometheus()
+    content += "# TYPE docstats_last_run_timestamp_seconds gauge\n"
+    content += "docstats_last_run_timestamp_seconds {}\n".format(time.time())
+    _replace(filename, content)
@@ -0,0 +1,239 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+Share the objects of sections which clone forks of the same project
+
+Sharing is opt-in: sections are in the same object group if their
+"object-group" key has the same value; with "object-group = auto", sections
+are grouped by the server and name of their repository, see
+:func:`getautogroup`. Each group with at least two sections gets a bare
+repository in ".objects" below the temporary directory. It fetches the
+configured branches of all sections of the group (as
+"refs/remotes/SECTION/BRANCH"), so common history is downloaded only once.
+The clones of the sections borrow its objects through
+"objects/info/alternates" and fetch only the objects which are missing.
+"""
+
+import os.path
+
+import git
+
+from .config import getsectionbranches
+from .log import log
+from .maintenance import maintain_clone, run_git
+from .utils import urlparse
+
+__all__ = ('STORE_DIR', 'addalternate', 'borrowobjects', 'getautogroup', 'getobjectgroups', 'getreponame',
+           'getstorepath', 'share_objects', 'update_store')
+
+
+#: The directory below the temporary directory which contains the shared object stores
+STORE_DIR = '.objects'
+
+#: Clone modes which can borrow objects; shallow and partial clones can't
+_SHARED_CLONE_MODES = ('full', 'bare')
+
+
+def getreponame(url):
+    """Return the name of the repository of an URL or a local path
+
+    >>> getreponame('git@github.com:SUSE/doc-sle.git'), getreponame('https://github.com/tux/doc-sle')
+    ('doc-sle', 'doc-sle')
+    >>> getreponame('/srv/git/doc-sle.git/'), getreponame('file:///home/tux/doc-sle/.git')
+    ('doc-sle', 'doc-sle')
+
+    :param str url: the URL of the Git repository
+    :return: the name without ".git"
+    :rtype: str
+    """
+    if url.startswith(('git@', 'http://', 'https://')):
+        return urlparse(url)['repo']
+    path = url.rstrip('/')
+    if path.endswith('/.git'):
+        path = path[:-5]
+    name = os.path.basename(path)
+    return name[:-4] if name.endswith('.git') else name
+
+
+def getautogroup(url):
+    """Return the group of a repository for "object-group = auto"; forks on the
+       same server have the same name, local repositories are grouped by name
+
+    >>> getautogroup('git@github.com:SUSE/doc-sle.git'), getautogroup('https://github.com/tux/doc-sle')
+    ('github.com-doc-sle', 'github.com-doc-sle')
+    >>> getautogroup('https://gitlab.example.org/tux/doc-sle'), getautogroup('/srv/git/doc-sle.git')
+    ('gitlab.example.org-doc-sle', 'local-doc-sle')
+
+    :param str url: the URL of the Git repository
+    :return: the name of the group
+    :rtype: str
+    """
+    server = urlparse(url)['server'] if url.startswith(('git@', 'http://', 'https://')) else 'local'
+    return '{}-{}'.format(server, getreponame(url))
+
+
+def getobjectgroups(config, urls):
+    """Return the object group of each section which shares its objects
+
+    :param config: the docstats configuration contents
+    :type config: :class:`configparser.ConfigParser`
+    :param urls: tuples of (section, url), see :func:`docstats.config.geturls`
+    :return: maps each section to the name of its group; sections without
+             group are missing
+    :rtype: dict
+    """
+    groups = {}
+    detected = {}
+    for section, url in urls:
+        group = config.get(section, 'object-group', fallback='no')
+        if group == 'no' or config.get(section, 'clone-mode', fallback='full') not in _SHARED_CLONE_MODES:
+            continue
+        if group != 'auto':
+            groups[section] = group
+            continue
+        try:
+            detected.setdefault(getautogroup(url), []).append(section)
+        except ValueError:
+            continue
+    # A detected group with only one section doesn't save anything:
+    for group, sections in detected.items():
+        if len(sections) > 1:
+            groups.update(dict.fromkeys(sections, group))
+    return groups
+
+
+def getstorepath(basedir, group):
+    """Return the path of the shared object store of a group
+
+    >>> getstorepath('/tmp/docstats', 'doc-sle')
+    '/tmp/docstats/.objects/doc-sle.git'
+
+    :param str basedir: the temporary base directory
+    :param str group: the name of the group
+    :rtype: str
+    """
+    return os.path.join(basedir, STORE_DIR, group + '.git')
+
+
+async def update_store(storedir, section, url, branches):
+    """Fetch the branches of a section into the shared object store of its
+       group; the store is created if it doesn't exist yet
+
+    :param str storedir: the path of the store, see :func:`getstorepath`
+    :param str section: the section name (used as name of the remote)
+    :param str url: the URL of the Git repository of the section
+    :param branches: the names of the branches of the section
+    :type branches: set
+    :return: the path of the store
+    :raises git.GitCommandError: if the store can't be created or fetched
+    :rtype: str
+    """
+    if not os.path.exists(storedir):
+        log.info("Creating shared object store %r", storedir)
+        await run_git('init', '--bare', '-q', storedir)
+        # The clones may still need objects which are no longer reachable in the store,
+        # so git must never prune them; the store is repacked by maintain_clone:
+        await run_git('-C', storedir, 'config', 'gc.auto', '0')
+        await run_git('-C', storedir, 'config', 'gc.pruneExpire', 'never')
+    remotes = (await run_git('-C', storedir, 'remote')).decode('utf-8').split()
+    if section in remotes:
+        await run_git('-C', storedir, 'remote', 'set-url', section, url)
+    else:
+        await run_git('-C', storedir, 'remote', 'add', section, url)
+    # Unknown branches of the config would break the fetch, they are reported by the analysis:
+    heads = (await run_git('-C', storedir, 'ls-remote', '--heads', section)).decode('utf-8').split()[1::2]
+    found = sorted({head[len('refs/heads/'):] for head in heads} & set(branches))
+    # Branches which are no longer configured (or gone) aren't tracked anymore:
+    refs = (await run_git('-C', storedir, 'for-each-ref', '--format=%(refname)',
+                          'refs/remotes/{}/'.format(section))).decode('utf-8').split()
+    for ref in set(refs) - {'refs/remotes/{}/{}'.format(section, branch) for branch in found}:
+        await run_git('-C', storedir, 'update-ref', '-d', ref)
+    if found:
+        await run_git('-C', storedir, 'fetch', '--no-tags', section,
+                      *('+refs/heads/{0}:refs/remotes/{1}/{0}'.format(branch, section) for branch in found))
+    return storedir
+
+
+def addalternate(gitdir, storedir):
+    """Let an existing clone borrow the objects of a shared object store
+
+    :param str gitdir: the path of the clone, with or without working tree
+    :param str storedir: the path of the store
+    :return: True if the store was added, False if it was already there
+    :rtype: bool
+    """
+    path = os.path.join(gitdir, '.git')
+    path = os.path.join(path if os.path.isdir(path) else gitdir, 'objects', 'info', 'alternates')
+    objects = os.path.abspath(os.path.join(storedir, 'objects'))
+    alternates = []
+    if os.path.exists(path):
+        with open(path) as fh:
+            alternates = fh.read().split('\n')
+    if objects in alternates:
+        return False
+    with open(path, 'a') as fh:
+        fh.write(objects + '\n')
+    return True
+
+
+async def share_objects(basedir, config, section, url, group, lock):
+    """Update (and maintain) the shared object store of a section before the
+       section is cloned or fetched; a failure is logged and the section is
+       cloned without the store
+
+    :param str basedir: the temporary base directory
+    :param config: the docstats configuration contents
+    :type config: :class:`configparser.ConfigParser`
+    :param str section: the section name
+    :param str url: the URL of the Git repository of the section
+    :param str group: the object group of the section, see :func:`getobjectgroups`
+    :param lock: serializes the sections of the same group
+    :type lock: :class:`asyncio.Lock`
+    :return: the path of the store or None
+    :rtype: str | None
+    """
+    storedir = getstorepath(basedir, group)
+    try:
+        async with lock:
+            await update_store(storedir, section, url,
+                               {branch for _, branch, _, _ in getsectionbranches(config, section)})
+            await maintain_clone(storedir, config, section, group=group)
+    except git.GitCommandError as error:
+        log.warning("Cannot update the shared object store %r for %r: %s", storedir, section, error)
+        return None
+    return storedir
+
+
+def borrowobjects(gitdir, options, storedir):
+    """Let the clone of a section borrow the objects of a shared object store;
+       an existing clone gets the store as alternate, a new clone is cloned
+       with "--reference"
+
+    :param str gitdir: the path of the clone
+    :param list options: the options for "git clone", see :func:`docstats.worker.getcloneoptions`
+    :param str storedir: the path of the store or None
+    :return: the options for "git clone"
+    :rtype: list
+    """
+    if storedir is None:
+        return options
+    if os.path.exists(gitdir):
+        addalternate(gitdir, storedir)
+        return options
+    return options + ['--reference', storedir]
@@ -0,0 +1,116 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+Profile the main process and each worker job with :mod:`cProfile`
+"""
+
+from contextlib import contextmanager
+import cProfile
+import glob
+import os
+import pstats
+
+from .log import log
+from .utils import getsafename
+
+__all__ = ('SUMMARY_TOP', 'clearprofiles', 'getprofilefile', 'profiled', 'writesummary')
+
+
+#: Number of functions which are listed in the summary
+SUMMARY_TOP = 40
+
+#: The running profiler as tuple of (process ID, profiler) or None, see :func:`profiled`
+_ACTIVE = None
+
+
+def getprofilefile(profiledir, *parts):
+    """Return the path of a profile for a job
+
+    >>> getprofilefile('/tmp/prof', 'doc-sle', 'maint/15')
+    '/tmp/prof/doc-sle+maint_15@cad1aeab.pstats'
+
+    :param str profiledir: the directory of all profiles or None
+    :param parts: the parts of the name, for example the section and the branch,
+                  see :func:`docstats.utils.getsafename`
+    :return: the path or None, if profiledir is None
+    :rtype: str | None
+    """
+    if profiledir is None:
+        return None
+    return os.path.join(profiledir, getsafename(*parts) + ".pstats")
+
+
+@contextmanager
+def profiled(filename):
+    """Context manager: Profile the code in its block and dump the stats to filename
+
+    :param str filename: the path of the stats file; if None, nothing is profiled
+    """
+    global _ACTIVE
+    if filename is None:
+        yield None
+        return
+    previous = _ACTIVE
+    if previous is not None and previous[0] != os.getpid():
+        # Forked workers inherit the profiler of the main process; since Python 3.12,
+        # it uses sys.monitoring, so only the profiler itself can stop it:
+        previous[1].disable()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    _ACTIVE = (os.getpid(), profiler)
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        _ACTIVE = previous
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        profiler.dump_stats(filename)
+
+
+def clearprofiles(profiledir):
+    """Remove the profiles and the summary of an earlier run, so
+       :func:`writesummary` merges only the profiles of this run
+
+    :param str profiledir: the directory of all profiles
+    """
+    for filename in glob.glob(os.path.join(profiledir, '*.pstats')) + [os.path.join(profiledir, 'summary.txt')]:
+        if os.path.exists(filename):
+            os.remove(filename)
+
+
+def writesummary(profiledir, top=SUMMARY_TOP):
+    """Merge all profiles of a directory and write the top functions, sorted by
+       cumulative and by internal time, to "summary.txt"
+
+    :param str profiledir: the directory of all profiles
+    :param int top: the number of listed functions
+    :return: the path of the summary or None, if there are no profiles
+    :rtype: str | None
+    """
+    files = sorted(glob.glob(os.path.join(profiledir, '*.pstats')))
+    if not files:
+        return None
+    filename = os.path.join(profiledir, 'summary.txt')
+    with open(filename, 'w') as fh:
+        stats = pstats.Stats(*files, stream=fh)
+        fh.write("Merged {} profiles from {}\n".format(len(files), profiledir))
+        for key in ('cumulative', 'tottime'):
+            stats.sort_stats(key).print_stats(top)
+    log.info("Writing profile summary to %r", filename)
+    return filename
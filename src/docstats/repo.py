@@ -16,62 +16,137 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 #
 
-from .config import getbranches
+from .aggregate import BranchStats
+from .backends import GitBackend, asbackend, openbackend
+from .cache import CommitCache, getcachefile
+from .config import getsectionbackend, getsectionbranches, getsectionperiod, getsectionscope, isdate, isrelativedate
+from .gitlog import LogScope
 from .log import log
+from .metrics import METRICS
+from .result import BranchResult
 from git import GitCommandError
-from .tracker import TRACKERS, findbugid
-from .utils import findallmails
+import os.path
+from .team import TeamDirectory
+from .tracker import findbugid
 
 
-def collect_diffstats(commit, dictresult):
+#: Number of commits which are looked up in the cache (and extracted) at once;
+#: only one batch of records is in memory while a branch is walked
+_BATCHSIZE = 500
+
+
+def collect_diffstats(commit, stats):
     """Collect all the diff statistics like additions, deletions, file changes etc.
 
     :param commit: the commit
-    :type commit: :class:`git.Commit`
-    :param dict dictresult: the result of the dictionary
+    :type commit: :class:`docstats.gitlog.CommitRecord`
+    :param stats: the accumulator of the branch
+    :type stats: :class:`docstats.aggregate.BranchStats`
     """
-    for item in commit.stats.total:
-        dictresult[item] += commit.stats.total[item]
+    diffstats = stats.diffstats
+    for item in commit.stats:
+        diffstats[item] += commit.stats[item]
 
 
-def collect_committers(commit, dictresult, committers):
+def collect_committers(commit, stats, team):
     """Collect all the committers, be it inside or outside of a team.
        A commiter is identified as a team member is his email address is
        in the list of the committers.
 
     :param commit:  the commit
-    :type commit: :class:`git.Commit`
-    :param dict dictresult: the result of the dictionary
-    :param committers: ditionary of all team mails; each items are in the
-                       syntax of "mail": "primary-mail"
-    :type committers: dict
+    :type commit: :class:`docstats.gitlog.CommitRecord`
+    :param stats: the accumulator of the branch
+    :type stats: :class:`docstats.aggregate.BranchStats`
+    :param team: all known mail addresses of the team and their aliases
+    :type team: :class:`docstats.team.TeamDirectory`
     """
-    mail = commit.committer.email.lower()
-    if mail in committers:
-        key = 'team-committers'
-        mail = committers.get(mail)
-    else:
-        key = 'external-committers'
+    mail, isteam = team.resolve(commit.email)
+    key = 'team-committers' if isteam else 'external-committers'
 
-    dictresult[key].append(mail)
-    dictresult[key+'-mails'].append(mail)
+    stats.committers[key][mail] += 1
 
 
-def collect_issues(message, dictresult):
-    """Collect all tracker issues that can be find in a commit message
+def getissues(message):
+    """Find all tracker issues in a commit message
 
     :param message:  the message of a commit
     :type message: str
-    :param dict dictresult: the result of the dictionary; the dict will
-                            be changed after the function has been called!
+    :return: tuple of normalized (tracker, issue) pairs
+    :rtype: tuple
+    """
+    return tuple(findbugid(message))
+
+
+def extract(commit):
+    """Complete a commit from "git log" with everything that is derived from
+       its message; the result is what is stored in the cache
+
+    :param commit: the commit
+    :type commit: :class:`docstats.gitlog.CommitRecord`
+    :return: the commit including its issues
+    :rtype: :class:`docstats.gitlog.CommitRecord`
+    """
+    return commit._replace(issues=getissues(commit.message))
+
+
+def collect_issues(commit, stats):
+    """Collect all tracker issues that can be find in a commit message
+
+    :param commit:  the commit, see :func:`extract`
+    :type commit: :class:`docstats.gitlog.CommitRecord`
+    :param stats: the accumulator of the branch; it will be changed after
+                  the function has been called!
+    :type stats: :class:`docstats.aggregate.BranchStats`
     """
+    issues = stats.issues
+    for tracker, issue in commit.issues:
+        issues[tracker].add(issue)
+
 
-    for tracker, issue in findbugid(message):
-        # Normalize GitHub issues which starts with
-        # "fix(ed|s), clo(SED?), resOLVE(S|D)?
-        tracker = "gh" if tracker[:3] in ('fix', 'clo', 'res') else tracker
-        if tracker in TRACKERS:
-            dictresult[tracker].append(issue)
+def iter_records(repo, rev, cache=None, scope=None):
+    """Generator: Yields the extracted records of all commits in a range
+
+    With a cache, the SHAs of the range are listed first; they are looked up
+    in batches of :data:`_BATCHSIZE` and only the commits of a batch which are
+    not in the cache are passed to "git log". Each batch is yielded before the
+    next one is read.
+
+    :param repo: a repository
+    :type repo: :class:`git.Repo` | :class:`docstats.backends.GitBackend`
+    :param rev: the revision or range, or a list of arguments, see :func:`getrevargs`
+    :type rev: str | list
+    :param cache: the cache or None; its records must cover the same scope
+    :type cache: :class:`docstats.cache.CommitCache`
+    :param scope: which commits and files are walked and how they are diffed, or None
+    :type scope: :class:`docstats.gitlog.LogScope`
+    :return: yields each commit
+    :rtype: generator of :class:`docstats.gitlog.CommitRecord`
+    """
+    repo = asbackend(repo)
+    if cache is None:
+        repo.prefetch(rev, scope=scope)
+        for commit in repo.log(rev, scope=scope):
+            yield extract(commit)
+        return
+
+    revargs = [rev] if isinstance(rev, str) else rev
+    shas = repo.revlist(revargs, scope)
+    hits = 0
+    for idx in range(0, len(shas), _BATCHSIZE):
+        batch = shas[idx:idx + _BATCHSIZE]
+        records = cache.get(batch)
+        hits += len(records)
+        misses = [sha for sha in batch if sha not in records]
+        if misses:
+            repo.prefetch(shas=misses, scope=scope)
+            extracted = [extract(commit) for commit in repo.log(shas=misses, scope=scope)]
+            cache.add(extracted)
+            records.update((commit.hexsha, commit) for commit in extracted)
+        for sha in batch:
+            # With a scope, a listed merge may not change the files compared to any of its parents:
+            if sha in records:
+                yield records[sha]
+    log.debug("Found %d of %d commits of %r in cache", hits, len(shas), rev)
 
 
 def if_range_is_empty(repo, rev):
@@ -90,177 +165,418 @@ def if_range_is_empty(repo, rev):
         return False
 
 
+def getsection(repo):
+    """Return the section name of a cloned repository, which is the name of
+       its directory
+
+    :param repo: a repository, with or without working tree
+    :type repo: :class:`git.Repo` | :class:`docstats.backends.GitBackend`
+    :return: the section name
+    :rtype: str
+    """
+    return os.path.basename((repo.working_tree_dir or repo.git_dir).rstrip('/'))
+
+
+def resolve_ref(repo, branchname, remote='origin'):
+    """Find the reference of a branch without checking it out
+
+    The remote-tracking branch is preferred as it is the one which gets
+    updated by a fetch; bare clones only have the local branch.
+
+    :param repo: a repository
+    :type repo: :class:`git.Repo` | :class:`docstats.backends.GitBackend`
+    :param str branchname: the name of the branch
+    :param str remote: the name of the remote
+    :return: the reference (for example "origin/develop") or None, if the
+             branch is unknown
+    :rtype: str | None
+    """
+    repo = asbackend(repo)
+    for ref in ("{}/{}".format(remote, branchname), branchname):
+        if repo.resolve(ref) is not None:
+            return ref
+    return None
+
+
+def getrange(ref, start='', end=''):
+    """Build the revision range of a branch; an empty start or end is replaced by the branch
+
+    >>> getrange('origin/develop')
+    'origin/develop'
+    >>> getrange('origin/develop', 'abc')
+    'abc..origin/develop'
+    >>> getrange('origin/develop', '', 'def')
+    'origin/develop..def'
+    >>> getrange('origin/develop', 'abc', 'def')
+    'abc..def'
+
+    :param str ref: the reference of the branch
+    :param str start: the start position or empty string
+    :param str end: the end position or empty string
+    :return: the revision range
+    :rtype: str
+    """
+    if not start and not end:
+        return ref
+    return "..".join([start or ref, end or ref])
+
+
+def getrevargs(ref, start='', end=''):
+    """Build the arguments for "git rev-list" and "git log" of a branch; a start
+       or end which is a date is passed as "--since" or "--until", so git
+       doesn't even walk the commits outside of the range
+
+    >>> getrevargs('origin/develop', 'abc')
+    ['abc..origin/develop']
+    >>> getrevargs('origin/develop', '2017-01-25', '90.days')
+    ['origin/develop', '--since=2017-01-25 00:00:00', '--until=90.days']
+    >>> getrevargs('origin/develop', '2019-01-01', 'v1')
+    ['v1', '--since=2019-01-01 00:00:00']
+
+    Dates without time mean midnight (git would use the current time of day),
+    so the start is included and the end is excluded. A start date with an
+    end revision walks the end revision alone (not "BRANCH..END").
+
+    :param str ref: the reference of the branch
+    :param str start: the start position (a revision or date) or empty string
+    :param str end: the end position (a revision or date) or empty string
+    :return: the revision range and the date options
+    :rtype: list
+    """
+    options = []
+    for option, value in (('--since', start), ('--until', end)):
+        if isdate(value):
+            if len(value) == len('YYYY-MM-DD'):
+                value += ' 00:00:00'
+            options.append('{}={}'.format(option, value))
+    end = '' if isdate(end) else end
+    if isdate(start):
+        return [end or ref] + options
+    return [getrange(ref, start, end)] + options
+
+
+def prime_cache(repo, branches, cache, scope=None):
+    """Extract the commits of several branches at once and store them in the
+       cache; commits which are shared between the branches are extracted
+       only once with a single "git log" call
+
+    :param repo: a repository
+    :type repo: :class:`git.Repo` | :class:`docstats.backends.GitBackend`
+    :param list branches: the branches in the format (name, branchname, start, end)
+    :param cache: the cache
+    :type cache: :class:`docstats.cache.CommitCache`
+    :param scope: which commits and files are walked and how they are diffed, or None
+    :type scope: :class:`docstats.gitlog.LogScope`
+    :return: the number of extracted commits
+    :rtype: int
+    """
+    repo = asbackend(repo)
+    shas = {}
+    for name, branchname, start, end in branches:
+        ref = resolve_ref(repo, branchname)
+        if ref is None:
+            continue
+        try:
+            shas.update(dict.fromkeys(repo.revlist(getrevargs(ref, start, end), scope)))
+        except GitCommandError:
+            # The unknown range is reported when the branch is analyzed
+            continue
+
+    misses = cache.missing(list(shas))
+    log.debug("Found %d of %d unique commits in cache", len(shas) - len(misses), len(shas))
+    if misses:
+        repo.prefetch(shas=misses, scope=scope)
+        cache.add(extract(commit) for commit in repo.log(shas=misses, scope=scope))
+    return len(misses)
+
+
 def iter_commits(config, repo, dictresult, name, branchname,
-                 start=None, end=None):
+                 start=None, end=None, ref='HEAD', cache=None, team=None, export=None, scope=None, since=''):
     """Iterate through all commits
 
     :param config: the docstats configuration contents
     :type config: :class:`configparser.ConfigParser`
     :param repo: a repository
-    :type repo: :class:`git.Repo`
-    :param dict dictresult: the result of the dictionary; the
-                            dict will be changed after the
+    :type repo: :class:`git.Repo` | :class:`docstats.backends.GitBackend`
+    :param dict dictresult: maps the name of the branch to its
+                            :class:`docstats.aggregate.BranchStats`; the
+                            accumulator will be changed after the
                             function has been called
     :param str name: name of the observable branch
     :param str branchname: the name of the branch
     :param start: the start position or None
     :param end: the end position or None
+    :param str ref: the reference of the branch which replaces a missing
+                    start or end
+    :param cache: the cache of already extracted commits or None
+    :type cache: :class:`docstats.cache.CommitCache`
+    :param team: the team members; if None, it is created from the config
+    :type team: :class:`docstats.team.TeamDirectory`
+    :param export: writes each commit additionally or None
+    :type export: :class:`docstats.export.CommitExporter`
+    :param scope: which commits and files are walked and how they are diffed, or None
+    :type scope: :class:`docstats.gitlog.LogScope`
+    :param str since: an additional start date for a start revision or empty string,
+                      see :func:`iter_new_commits`
     :return:
     """
     start = '' if start is None else start
     end = '' if end is None else end
+    if team is None:
+        team = TeamDirectory.fromconfig(config)
 
-    rev = "..".join([start, end])
-    if rev == '..':
-        rev = repo.head
+    rev = getrevargs(ref, start, end)
+    if since:
+        rev += getrevargs(ref, since)[1:]
 
-    try:
-        for idx, commit in enumerate(repo.iter_commits(rev), 1):
-            # Collect the statistics information
-            collect_diffstats(commit, dictresult[name])
+    stats = dictresult[name]
+    with METRICS.stage('iter-commits'):
+        try:
+            for idx, commit in enumerate(iter_records(repo, rev, cache, scope), 1):
+                # Collect the statistics information
+                collect_diffstats(commit, stats)
 
-            # Collect the committers
-            committers = findallmails(config.defaults().get('team-mails', []))
-            collect_committers(commit, dictresult[name], committers)
+                # Collect the committers
+                collect_committers(commit, stats, team)
 
-            # Collect the bug issues from different trackers
-            collect_issues(commit.message, dictresult[name])
+                # Collect the bug issues from different trackers
+                collect_issues(commit, stats)
 
-        log.info("Used %s(start=%r, end=%r) #commits=%s",
-                 branchname, start, end, idx)
-        # Save overall commits:
-        dictresult[name]['commits'] = idx
+                # The same for the period of the commit, if there is any
+                bucket = stats.getbucket(commit)
+                if bucket is not None:
+                    bucket.commits += 1
+                    collect_diffstats(commit, bucket)
+                    collect_committers(commit, bucket, team)
+                    collect_issues(commit, bucket)
 
-        return dictresult
+                if export is not None:
+                    export.add(commit)
 
-    except UnboundLocalError:
-        # This happens only, when we cannot find any commits on the branch with the specified
-        # range.
-        log.info("Skipping %s(start=%r, end=%r) as there are no commits in the specified range",
-                 branchname, start, end)
-        dictresult[name]['commits'] = 0
-        # dictresult[name].update(init_stats_dict())
-        # dictresult[name].update(init_tracker_dict())
-        # dictresult[name].update(init_committer_dict())
-        return dictresult
+            log.info("Used %s(start=%r, end=%r) #commits=%s",
+                     branchname, start, end, idx)
+            # Save overall commits:
+            stats.commits += idx
+            METRICS.count('commits', idx)
 
+            return dictresult
 
-def init_stats_dict():
-    """Create a dictionary statistics object with defaults to zero for;
-       used for counting
+        except UnboundLocalError:
+            # This happens only, when we cannot find any commits on the branch with the specified
+            # range.
+            log.info("Skipping %s(start=%r, end=%r) as there are no commits in the specified range",
+                     branchname, start, end)
+            return dictresult
 
-    :return: dictionary with all values to zero
-    :rtype: dict
+
+def is_ancestor(repo, ancestor, rev):
+    """Check if a commit is an ancestor of another one (or the same)
+
+    :param repo: a repository
+    :type repo: :class:`git.Repo` | :class:`docstats.backends.GitBackend`
+    :param str ancestor: the possible ancestor
+    :param str rev: the descendant
+    :return: True if it is an ancestor, False otherwise or if one of the commits is unknown
+    :rtype: bool
     """
-    return {item: 0 for item in ('deletions', 'files', 'insertions', 'lines')}
+    return asbackend(repo).isancestor(ancestor, rev)
 
 
-def init_tracker_dict():
-    """Create a dictionary with empty tracker issues
+def iter_new_commits(config, repo, dictresult, name, branchname, start, ref, cache, team=None, scope=None):
+    """Iterate only through the commits of an open range (without end) which
+       are new since the last run and merge them with the stored results
 
-    :return: dictionary with empty list
-    :rtype: dict
+    All commits are analyzed when there are no stored results, when the
+    history was rewritten (the stored head is no ancestor of the current head),
+    or when the branch, start, team mails, or period were changed in the config.
+    A changed scope already drops the cache, see :func:`opencache`. The start
+    can be an absolute date, but no relative date.
+
+    :param config: the docstats configuration contents
+    :type config: :class:`configparser.ConfigParser`
+    :param repo: a repository
+    :type repo: :class:`git.Repo` | :class:`docstats.backends.GitBackend`
+    :param dict dictresult: maps the name of the branch to its
+                            :class:`docstats.aggregate.BranchStats`; the
+                            accumulator will be changed after the
+                            function has been called
+    :param str name: name of the observable branch
+    :param str branchname: the name of the branch
+    :param str start: the start position (a revision or absolute date) or empty string
+    :param str ref: the reference of the branch
+    :param cache: the cache which stores the results of the last run
+    :type cache: :class:`docstats.cache.CommitCache`
+    :param team: the team members; if None, it is created from the config
+    :type team: :class:`docstats.team.TeamDirectory`
+    :param scope: which commits and files are walked and how they are diffed, or None
+    :type scope: :class:`docstats.gitlog.LogScope`
+    :return:
     """
-    return {item: [] for item in TRACKERS}
+    if team is None:
+        team = TeamDirectory.fromconfig(config)
+    head = asbackend(repo).resolve(ref)
+    mark = cache.getwatermark(name)
+
+    stats = dictresult[name]
+    key = [branchname, start, team.fingerprint, [stats.period, stats.perioddate]]
+    previous = None
+    if mark is not None and [mark['branch'], mark['start'], mark['team'], mark.get('period')] == key:
+        if is_ancestor(repo, mark['head'], head) and (not start or isdate(start) or
+                                                      is_ancestor(repo, start, mark['head'])):
+            previous = BranchStats.fromstate(mark['data'])
+        else:
+            log.info("History of %s was rewritten, analyzing all commits", name)
+
+    if previous is None:
+        iter_commits(config, repo, dictresult, name, branchname, start, '', ref=ref, cache=cache, team=team,
+                     scope=scope)
+    else:
+        log.debug("Analyzing %s since last head %s", name, mark['head'])
+        # The new commits are still limited by a start date:
+        iter_commits(config, repo, dictresult, name, branchname, mark['head'], '',
+                     ref=ref, cache=cache, team=team, scope=scope, since=start if isdate(start) else '')
+        stats.merge(previous)
 
+    cache.setwatermark(name, {'branch': branchname, 'start': start, 'head': head,
+                              'team': team.fingerprint, 'period': key[-1], 'data': stats.tostate()})
+    return dictresult
 
-def init_committer_dict():
-    """Create a dictionary with some empty committers keys
 
-    :return: dictionary with empty lists
-    :rtype: dict
+def opencache(repo, config, section):
+    """Open the commit cache of a repository; if it is disabled with "cache = no",
+       the cache is only kept in memory
+
+    The cached records are only valid for the scope of the section, so a
+    changed "include" or "exclude" key drops the cache, see :func:`docstats.config.getsectionscope`.
+
+    :param repo: a repository
+    :type repo: :class:`git.Repo` | :class:`docstats.backends.GitBackend`
+    :param config: the docstats configuration contents
+    :type config: :class:`configparser.ConfigParser`
+    :param str section: the section in the config
+    :return: the cache
+    :rtype: :class:`docstats.cache.CommitCache`
     """
-    return {item: [] for item in ('team-committers', 'external-committers',
-                                  'team-committers-mails', 'external-committers-mails')}
+    if config.getboolean(section, 'cache', fallback=True):
+        return CommitCache(getcachefile(repo), getsectionscope(config, section).fingerprint)
+    return CommitCache(':memory:')
 
 
-def cleanup_dict(dictresult):
-    """Cleanup step to turn all sets into list to make sure it is serialized by JSON
+def analyze_branch(repo, config, name, branchname, start='', end='', cache=None, team=None,
+                   period=None, perioddate='commit', export=None, scope=None):
+    """Analyze a single branch of a repository
 
-    :param dict dictresult: the result of the dictionary; the dict will be changed after the
-                            function has been called
+    The branch is never checked out, so the repository can be a bare clone
+    and several branches can be analyzed at the same time.
+
+    :param repo: a repository
+    :type repo: :class:`git.Repo` | :class:`docstats.backends.GitBackend`
+    :param config: the docstats configuration contents
+    :type config: :class:`configparser.ConfigParser`
+    :param str name: name of the observable branch
+    :param str branchname: the name of the branch
+    :param str start: the start position (a revision or date) or empty string
+    :param str end: the end position (a revision or date) or empty string
+    :param cache: the cache of already extracted commits or None
+    :type cache: :class:`docstats.cache.CommitCache`
+    :param team: the team members; if None, it is created from the config
+    :type team: :class:`docstats.team.TeamDirectory`
+    :param str period: split the data additionally into "week", "month", or "quarter"
+    :param str perioddate: the date of a commit which decides its period, "commit" or "author"
+    :param export: writes each commit additionally or None; all commits of the
+                   branch are walked, even if there are stored results
+    :type export: :class:`docstats.export.CommitExporter`
+    :param scope: which commits and files are counted and how they are diffed,
+                  see :func:`docstats.config.getsectionscope`; if None, all of them
+    :type scope: :class:`docstats.gitlog.LogScope`
+    :return: the data of the branch, see :func:`analyze`; if the branch or range
+             is unknown, it contains only the key "error"
+    :rtype: :class:`docstats.result.BranchResult`
     """
-    for branch in dictresult:
-        #
-        for tracker in TRACKERS:
-            dictresult[branch][tracker] = list(set(dictresult[branch][tracker]))
-        # Make committers unique and count them:
-        for item in ('team-committers', 'external-committers',
-                     # These are just for debugging purposes:
-                     'team-committers-mails', 'external-committers-mails'):
-            dictresult[branch][item] = len(set(dictresult[branch][item]))
-
-
-def analyze(repo, config):
+    # Initialize
+    repo = asbackend(repo)
+    if scope is None:
+        scope = LogScope()
+    result = {name: BranchStats(period, perioddate)}
+
+    ref = resolve_ref(repo, branchname)
+    if ref is None:
+        log.error("Unknown ref %r for %s in repo %r", branchname, name, repo.git_dir)
+        # We want to have it in the result dict too:
+        return BranchResult.failed("unknown ref {!r}".format(branchname))
+
+    log.info("Investigating %s on repo %r for branch %r...", name, repo.git_dir, ref)
+    try:
+        # Relative dates move with each run, so the stored results can't be reused
+        if cache is not None and not end and not isrelativedate(start) and export is None:
+            iter_new_commits(config, repo, result, name, branchname, start, ref, cache, team=team, scope=scope)
+        else:
+            iter_commits(config, repo, result, name, branchname, start, end, ref=ref, cache=cache, team=team,
+                         export=export, scope=scope)
+    except GitCommandError as error:
+        # Happens when start or end of the range are unknown:
+        log.error(error)
+        return BranchResult.failed("unknown ref in range {!r}".format(" ".join(getrevargs(ref, start, end))))
+    return BranchResult.fromstats(result[name], branchname, start, end, scope)
+
+
+def analyze(repo, config, section=None):
     """Analyze the repositories given at queue
 
     :param repo: a repository
-    :type repo: :class:`git.Repo`
+    :type repo: :class:`git.Repo` | :class:`docstats.backends.GitBackend`
     :param config: the docstats configuration contents
     :type config: :class:`configparser.ConfigParser`
+    :param str section: the section in the config; if None, it is derived from
+                        the directory of the repository
     :return: dictionary with data
         data = { 'branch1': data_of_branch1,
                  'branch2': data_of_branch2,
                 }
-        data_of_branchX = {'doc-committers': X, # type:set
-                           'additions': A,      # type:int
-                           'deletions': D,      # type:int
-                           '#commits': N,       # type:int
-                           'changes':  C,       # type:int
-                           'bsc': BSC,          # type:set
-                           'gh': GH,            # type:set
-                           'fate': FA,          # type:set
-                           'trello': TR,        # type:set
-                           'doccomments: DC',   # type:set
-                           'start-commit': SC   # type:str
-                           'end-commit': EC     # type:str
+        data_of_branchX = {'branch': B,                  # type:str
+                           'start': S,                   # type:str
+                           'end': E,                     # type:str
+                           'commits': N,                 # type:int
+                           'insertions': I,              # type:int
+                           'deletions': D,               # type:int
+                           'lines': L,                   # type:int
+                           'files': F,                   # type:int
+                           'bsc': BSC,                   # type:tuple
+                           'gh': GH,                     # type:tuple
+                           'fate': FA,                   # type:tuple
+                           'trello': TR,                 # type:tuple
+                           'team-committers': TC,        # type:int
+                           'external-committers': EC,    # type:int
+                           'committer-commits': CC,      # type:dict
+                           'periods': P,                 # type:dict, only with "period"
+                           'scope': S,                   # type:dict, see LogScope.todict
                            }
+        each data_of_branchX is a read-only :class:`docstats.result.BranchResult`,
+        see :meth:`docstats.aggregate.BranchStats.todict`
     :rtype: dict
     """
 
     result = {}
-    wd = repo.working_tree_dir
-    section = wd.rsplit("/", 1)[-1]
+    if section is None:
+        section = getsection(repo)
+    if not isinstance(repo, GitBackend):
+        repo = openbackend(repo.working_tree_dir or repo.git_dir, getsectionbackend(config, section))
 
     # Check if we have a "branches" section in the config. If not, fallback
     # to develop branch:
-    urls = list(getbranches(config.get(section, 'branches', fallback=None)))
-    if not urls:
-        branchname = config.get(section, 'branch', fallback=None)
-        start = config.get(section, 'start', fallback='')
-        end = config.get(section, 'end', fallback='')
-
-        if not branchname:
-            # Use our default branch...
-            branchname = 'develop'
-        urls = [(branchname, branchname, start, end)]
-
+    urls = getsectionbranches(config, section)
+
+    team = TeamDirectory.fromconfig(config)
+    period, perioddate = getsectionperiod(config, section)
+    scope = getsectionscope(config, section)
+    cache = opencache(repo, config, section)
+    with METRICS.scope(section), METRICS.stage('prime-cache'):
+        prime_cache(repo, urls, cache, scope)
     for name, branchname, start, end in urls:
-        # Initialize
-        result[name] = {}
-        result[name]['branch'] = branchname
-        result[name]['start'] = str(start)
-        result[name]['end'] = str(end)
-        result[name].update(init_stats_dict())
-        result[name].update(init_tracker_dict())
-        result[name].update(init_committer_dict())
-
-        try:
-            # head = repo.create_head(branchname)
-            # head.checkout(branchname)
-            repo.git.checkout(branchname)
-        except GitCommandError as error:
-            # error contains the following attributes:
-            # ._cmd, ._cause, ._cmdline
-            # .stderr, .stdout, .status, .command
-            log.error(error)
-            # We want to have it in the result dict too:
-            result[name] = {'error': error}
-            continue
-
-        log.info("Investigating %s on repo %r for branch %r...", name, repo.git_dir, branchname)
-        iter_commits(config, repo, result, name, branchname, start, end)
+        with METRICS.scope(section, name), METRICS.stage('analyze'):
+            result[name] = analyze_branch(repo, config, name, branchname, start, end, cache, team,
+                                          period, perioddate, scope=scope)
+    cache.close()
 
-    cleanup_dict(result)
     log.debug("Result dict is %r", result)
     return result
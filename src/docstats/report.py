@@ -0,0 +1,198 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+Write the results of all sections into one consolidated report
+"""
+
+import csv
+import json
+import os
+import sqlite3
+
+from .log import log
+from .result import FIELDS, jsondefault
+
+__all__ = ('CSVReport', 'FIELDS', 'JSONLinesReport', 'REPORT_FORMATS', 'ReportWriter',
+           'SQLiteReport', 'getreportformat', 'openreport')
+
+
+#: Maps the file extensions to the formats of the report
+REPORT_FORMATS = {'.jsonl': 'jsonl', '.csv': 'csv', '.sqlite': 'sqlite', '.db': 'sqlite'}
+
+
+def getreportformat(filename):
+    """Return the format of a report from its file extension
+
+    >>> getreportformat('/tmp/report.jsonl'), getreportformat('report.db')
+    ('jsonl', 'sqlite')
+
+    :param str filename: the path of the report
+    :return: one of the values of :data:`REPORT_FORMATS`
+    :rtype: str
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    try:
+        return REPORT_FORMATS[extension]
+    except KeyError:
+        raise ValueError("Unknown report format of {!r}, expected one of {}".format(
+            filename, ", ".join(sorted(REPORT_FORMATS))))
+
+
+class ReportWriter:
+    """Base class of all reports
+
+    Each finished section is appended with :meth:`add` to a temporary file
+    (the filename with ".part"), so it contains all complete sections if the
+    run is interrupted. :meth:`close` renames it to the final filename.
+
+    :param str filename: the path of the report
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.partfile = filename + ".part"
+        self.sections = 0
+        self._open()
+
+    def _open(self):
+        """Open the temporary file"""
+        raise NotImplementedError
+
+    def _write(self, section, name, data):
+        """Write a single branch"""
+        raise NotImplementedError
+
+    def _flush(self):
+        """Make sure everything written so far is on disk"""
+        raise NotImplementedError
+
+    def _close(self):
+        """Close the temporary file"""
+        raise NotImplementedError
+
+    def add(self, section, result):
+        """Append the result of a section
+
+        :param str section: the section name
+        :param dict result: maps the name of each branch to its
+                            :class:`docstats.result.BranchResult`, see :func:`docstats.repo.analyze`
+        """
+        for name, data in result.items():
+            self._write(section, name, data)
+        self._flush()
+        self.sections += 1
+
+    def close(self):
+        """Finish the report and move it atomically to its final filename"""
+        self._close()
+        os.replace(self.partfile, self.filename)
+        log.info("Writing report of %d section(s) to %r", self.sections, self.filename)
+
+    def abort(self):
+        """Close the report, but keep it as temporary file"""
+        self._close()
+        log.warning("Incomplete report of %d section(s) kept in %r", self.sections, self.partfile)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class JSONLinesReport(ReportWriter):
+    """Writes one JSON object per line and branch, with the additional keys
+       "section" and "name"
+    """
+    def _open(self):
+        self._fh = open(self.partfile, 'w')
+
+    def _write(self, section, name, data):
+        self._fh.write(json.dumps(dict(data, section=section, name=name), default=jsondefault))
+        self._fh.write("\n")
+
+    def _flush(self):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def _close(self):
+        self._fh.close()
+
+
+class CSVReport(JSONLinesReport):
+    """Writes one CSV row per branch with the columns "section", "release",
+       the numbers of :data:`FIELDS`, and "error"
+    """
+    def _open(self):
+        # The csv module writes its own line endings:
+        self._fh = open(self.partfile, 'w', newline='')
+        self._writer = csv.writer(self._fh)
+        self._writer.writerow(('section', 'release') + FIELDS + ('error',))
+
+    def _write(self, section, name, data):
+        if data.error is not None:
+            row = [''] * len(FIELDS) + [data.error]
+        else:
+            row = [data.counts[field] for field in FIELDS] + ['']
+        self._writer.writerow([section, name] + row)
+
+
+class SQLiteReport(ReportWriter):
+    """Writes one row per branch into the table "branches"; the numbers of
+       :data:`FIELDS` are columns (with underscores instead of dashes) and
+       "data" contains the complete result as JSON
+    """
+    #: The names of the columns of the numbers
+    COLUMNS = tuple(field.replace('-', '_') for field in FIELDS)
+
+    def _open(self):
+        if os.path.exists(self.partfile):
+            os.remove(self.partfile)
+        self._connection = sqlite3.connect(self.partfile)
+        self._connection.execute("CREATE TABLE branches (section TEXT, name TEXT, {}, error TEXT, data TEXT, "
+                                 "PRIMARY KEY (section, name))".format(
+                                     ", ".join("{} INTEGER".format(column) for column in self.COLUMNS)))
+
+    def _write(self, section, name, data):
+        self._connection.execute("INSERT INTO branches VALUES ({})".format(",".join("?" * (len(FIELDS) + 4))),
+                                 [section, name] + [data.counts.get(field) for field in FIELDS]
+                                 + [data.error, json.dumps(data, default=jsondefault)])
+
+    def _flush(self):
+        self._connection.commit()
+
+    def _close(self):
+        self._connection.commit()
+        self._connection.close()
+
+
+def openreport(filename, reportformat=None):
+    """Create the writer of a report
+
+    :param str filename: the path of the report
+    :param str reportformat: "jsonl", "csv", or "sqlite"; if None, it is derived from
+                             the file extension, see :func:`getreportformat`
+    :return: the writer
+    :rtype: :class:`ReportWriter`
+    """
+    reportformat = reportformat or getreportformat(filename)
+    writers = {'jsonl': JSONLinesReport, 'csv': CSVReport, 'sqlite': SQLiteReport}
+    return writers[reportformat](filename)
@@ -0,0 +1,166 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+The immutable result of a branch and its views
+"""
+
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from .tracker import TRACKERS
+
+__all__ = ('BranchResult', 'FIELDS', 'jsondefault', 'mergeids')
+
+
+#: The numbers of a branch which are written to CSV files and SQLite columns
+FIELDS = ('commits', 'insertions', 'deletions', 'lines',
+          'fate', 'bsc', 'files', 'trello', 'gh',
+          'team-committers', 'external-committers',
+          )
+
+
+def _freeze(value):
+    """Return an immutable version of a value of the result dictionary"""
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    if isinstance(value, Mapping) and not isinstance(value, BranchResult):
+        return MappingProxyType(dict(value))
+    return value
+
+
+class BranchResult(Mapping):
+    """The immutable result of a branch
+
+    It is a read-only mapping with the same keys as the JSON file (the
+    tracker issues are sorted tuples), see :func:`docstats.repo.analyze`.
+    Additionally, :attr:`ids` contains the issues of each tracker as sets
+    and :attr:`counts` the numbers of :data:`FIELDS`. All formats are written
+    from the same data, so nothing is copied or converted in place.
+
+    :param dict data: the result as returned by :meth:`docstats.aggregate.BranchStats.todict`
+                      (with "branch", "start", and "end"), or a dictionary with only
+                      the key "error"
+    """
+    __slots__ = ('_data', '_ids', '_counts')
+
+    def __init__(self, data):
+        data = {key: _freeze(value) for key, value in data.items()}
+        if 'periods' in data:
+            data['periods'] = MappingProxyType({label: period if isinstance(period, BranchResult)
+                                                else BranchResult(period)
+                                                for label, period in data['periods'].items()})
+        object.__setattr__(self, '_data', data)
+        object.__setattr__(self, '_ids', MappingProxyType(
+            {} if 'error' in data else {tracker: frozenset(data.get(tracker, ())) for tracker in TRACKERS}))
+        object.__setattr__(self, '_counts', MappingProxyType(
+            {} if 'error' in data else {field: len(self._ids[field]) if field in TRACKERS else data.get(field, 0)
+                                        for field in FIELDS}))
+
+    @classmethod
+    def fromstats(cls, stats, branch, start='', end='', scope=None):
+        """Create the result of a branch from its accumulator
+
+        :param stats: the statistics of the branch
+        :type stats: :class:`docstats.aggregate.BranchStats`
+        :param str branch: the name of the branch
+        :param str start: the start position or empty string
+        :param str end: the end position or empty string
+        :param scope: the walk of the branch, it is recorded as "scope" or None
+        :type scope: :class:`docstats.gitlog.LogScope`
+        :rtype: :class:`BranchResult`
+        """
+        data = dict({'branch': branch, 'start': str(start), 'end': str(end)}, **stats.todict())
+        if scope is not None:
+            data['scope'] = scope.todict()
+        return cls(data)
+
+    @classmethod
+    def failed(cls, error):
+        """Create the result of a branch which couldn't be analyzed
+
+        :param str error: the reason
+        :rtype: :class:`BranchResult`
+        """
+        return cls({'error': error})
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+    def __reduce__(self):
+        # Read-only proxies can't be pickled, the copies are frozen again on unpickling
+        return type(self), ({key: dict(value) if isinstance(value, MappingProxyType) else value
+                             for key, value in self._data.items()},)
+
+    def __repr__(self):
+        if self.error is not None:
+            return "<{} error={!r}>".format(type(self).__name__, self.error)
+        return "<{} commits={}>".format(type(self).__name__, self._data.get('commits'))
+
+    @property
+    def error(self):
+        """The reason why the branch couldn't be analyzed or None"""
+        return self._data.get('error')
+
+    @property
+    def ids(self):
+        """Maps each tracker to the frozenset of its issues (empty on errors)"""
+        return self._ids
+
+    @property
+    def counts(self):
+        """Maps each key of :data:`FIELDS` to its number; the tracker issues
+           and the committers are counted (empty on errors)
+        """
+        return self._counts
+
+
+def jsondefault(obj):
+    """Serialize the results with :func:`json.dump`, use it as the ``default`` argument
+
+    :param obj: an object which is unknown to :mod:`json`
+    :return: a JSON serializable object
+    """
+    if isinstance(obj, BranchResult):
+        return obj._data
+    if isinstance(obj, MappingProxyType):
+        return dict(obj)
+    raise TypeError("Object of type {} is not JSON serializable".format(type(obj).__name__))
+
+
+def mergeids(results):
+    """Combine the issues of many branches, for example of all sections
+
+    :param results: an iterable of :class:`BranchResult`
+    :return: maps each tracker to the set of all issues
+    :rtype: dict
+    """
+    ids = {tracker: set() for tracker in TRACKERS}
+    for result in results:
+        for tracker, issues in result.ids.items():
+            ids[tracker].update(issues)
+    return ids
@@ -0,0 +1,147 @@
+#
+# Copyright (c) 2017 SUSE Linux GmbH
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+
+"""
+Identify committers by their mail addresses
+"""
+
+from collections.abc import Mapping
+import hashlib
+import re
+
+from .utils import findallmails
+
+__all__ = ('TeamDirectory', 'parsemailmap',)
+
+
+#: Mail addresses in a .mailmap file are always enclosed in angle brackets
+_MAILMAP_REGEX = re.compile(r'<([^>]*)>')
+
+
+def parsemailmap(text):
+    """Find all mail aliases in the content of a .mailmap file
+
+    Only lines with two mail addresses are aliases, for example::
+
+        Tux Penguin <tux@example.org> <penguin@example.net>
+        <tux@example.org> Tux <tux@users.noreply.github.com>
+
+    >>> parsemailmap('Tux <Tux@example.org> <penguin@example.net>  # old')
+    [('tux@example.org', 'penguin@example.net')]
+
+    :param str text: the content of a .mailmap file
+    :return: list of (proper mail, commit mail) tuples in lower case
+    :rtype: list
+    """
+    result = []
+    for line in text.split('\n'):
+        line = line.split('#', 1)[0]
+        mails = _MAILMAP_REGEX.findall(line.lower())
+        if len(mails) == 2:
+            result.append(tuple(mails))
+    return result
+
+
+class TeamDirectory(Mapping):
+    """Read-only mapping of all known mail addresses (in lower case) of a
+       committer to its canonical address; the team members are a subset
+       of the canonical addresses
+
+    Create it once with :meth:`fromconfig` and pass it to the collectors,
+    so resolving a committer is just a dictionary look up.
+
+    :param dict identities: the mapping of aliases to canonical addresses
+    :param team: the canonical addresses of all team members
+    """
+    __slots__ = ('_identities', '_team')
+
+    def __init__(self, identities=None, team=()):
+        self._identities = dict(identities or {})
+        self._team = frozenset(team)
+
+    @classmethod
+    def fromtext(cls, teammails, mailmap=''):
+        """Create the directory from the "team-mails" key and a .mailmap file
+
+        :param str teammails: one team member per line, the first address is the
+                              primary one, see :func:`docstats.utils.findallmails`
+        :param str mailmap: the content of a .mailmap file
+        :return: the directory
+        :rtype: :class:`TeamDirectory`
+        """
+        identities = findallmails(teammails.lower() if teammails else teammails)
+        team = set(identities.values())
+        for proper, alias in parsemailmap(mailmap or ''):
+            canonical = identities.get(proper, proper)
+            identities.setdefault(proper, canonical)
+            identities.setdefault(alias, canonical)
+        return cls(identities, team)
+
+    @classmethod
+    def fromconfig(cls, config):
+        """Create the directory from the keys "team-mails" and "mailmap" (a path) of the config
+
+        :param config: the docstats configuration contents
+        :type config: :class:`configparser.ConfigParser`
+        :return: the directory
+        :rtype: :class:`TeamDirectory`
+        """
+        mailmap = ''
+        filename = config.defaults().get('mailmap')
+        if filename:
+            with open(filename) as fh:
+                mailmap = fh.read()
+        return cls.fromtext(config.defaults().get('team-mails', ''), mailmap)
+
+    def resolve(self, mail):
+        """Return the canonical mail address and whether it belongs to the team
+
+        :param str mail: the mail address of a committer
+        :return: tuple of (canonical mail address, is team member)
+        :rtype: tuple
+        """
+        mail = mail.lower()
+        mail = self._identities.get(mail, mail)
+        return mail, mail in self._team
+
+    @property
+    def team(self):
+        """The canonical mail addresses of all team members"""
+        return self._team
+
+    @property
+    def fingerprint(self):
+        """A hash which changes whenever the mapping or the team changes"""
+        text = repr((sorted(self._identities.items()), sorted(self._team)))
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def __getitem__(self, mail):
+        return self._identities[mail.lower()]
+
+    def __iter__(self):
+        return iter(self._identities)
+
+    def __len__(self):
+        return len(self._identities)
+
+    def __reduce__(self):
+        return self.__class__, (self._identities, self._team)
+
+    def __repr__(self):
+        return "<{} with {} addresses of {} team members>".format(self.__class__.__name__,
+                                                                  len(self), len(self._team))
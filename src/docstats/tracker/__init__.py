@@ -16,22 +16,51 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 #
 
+from . import bugzilla as _bugzilla
+from . import fate as _fate
+from . import github as _github
+from . import trello as _trello
 from .bugzilla import bugzilla
 from .github import github
 from .trello import trello
 from .fate import fate
+import hashlib
+import re
 
-TRACKERS = ('fate', 'bsc', 'gh', 'trello')
+#: All tracker modules; each has the attributes NAME, PATTERN, FLAGS, and issue(match)
+TRACKER_REGISTRY = (_fate, _bugzilla, _github, _trello)
+
+TRACKERS = tuple(tracker.NAME for tracker in TRACKER_REGISTRY)
 TRACKER_FUNCS = (fate, bugzilla, github, trello)
 
+#: One regex for all trackers: each tracker pattern is an alternative in its own
+#: group (named after the tracker) and keeps its own flags
+SCANNER_REGEX = re.compile("|".join("(?P<{}>(?{}:{}))".format(tracker.NAME,
+                                                              'i' if tracker.FLAGS & re.I else '',
+                                                              tracker.PATTERN)
+                                    for tracker in TRACKER_REGISTRY))
+
+#: Maps the group name of each alternative to the function which extracts the issue
+_ISSUE_FUNCS = {tracker.NAME: tracker.issue for tracker in TRACKER_REGISTRY}
+
+#: Changes whenever one of the tracker regexes changes; used to invalidate cached results
+TRACKER_FINGERPRINT = hashlib.sha1(SCANNER_REGEX.pattern.encode('utf-8')).hexdigest()
+
 
 def findbugid(text):
-    """Find Bugzilla IDs, GitHub, Fate, and CVEs
+    """Find Bugzilla IDs, GitHub, Fate, and Trello issues with one pass over the text
+
+    >>> list(findbugid('Fix bnc#1234 (see FATE#321), closes #7'))
+    [('bsc', '1234'), ('fate', '321'), ('gh', '7')]
 
     :param text: the text containing bug information IDs
     :return: a list of tuples of all found bug IDs; each item has the
-             format (type, value)
+             format (type, value) and the type is one of :data:`TRACKERS`
     :rtype: list
     """
-    for func in TRACKER_FUNCS:
-        yield from func(text)
+    # Fast path: all trackers need either a "#" or an URL
+    if '#' not in text and '://' not in text:
+        return
+    for match in SCANNER_REGEX.finditer(text):
+        tracker = match.lastgroup
+        yield tracker, _ISSUE_FUNCS[tracker](match)
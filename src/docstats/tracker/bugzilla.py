@@ -18,7 +18,19 @@
 
 import re
 
-_BUGZILLA_REGEX = re.compile(r'(?P<bugtracker>bsc|bnc)\s?#(?P<id>\d{2,9})')
+#: Name of the tracker in the results; "bnc" is outdated and counted as "bsc"
+NAME = 'bsc'
+
+#: The group names have to be unique among all trackers, see :data:`docstats.tracker.SCANNER_REGEX`
+PATTERN = r'(?P<bsc_tracker>bsc|bnc)\s?#(?P<bsc_id>\d{2,9})'
+FLAGS = 0
+
+_BUGZILLA_REGEX = re.compile(PATTERN, FLAGS)
+
+
+def issue(match):
+    """Return the bug number of a match of :data:`PATTERN`"""
+    return match.group('bsc_id')
 
 
 def bugzilla(text):
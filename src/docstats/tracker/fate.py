@@ -18,7 +18,19 @@
 
 import re
 
-_FATE_REGEX = re.compile(r'(?:fate\s?#|https://fate\.suse\.com/)(\d+)', re.I)
+#: Name of the tracker in the results
+NAME = 'fate'
+
+#: The group names have to be unique among all trackers, see :data:`docstats.tracker.SCANNER_REGEX`
+PATTERN = r'(?:fate\s?#|https://fate\.suse\.com/)(?P<fate_id>\d+)'
+FLAGS = re.I
+
+_FATE_REGEX = re.compile(PATTERN, FLAGS)
+
+
+def issue(match):
+    """Return the FATE number of a match of :data:`PATTERN`"""
+    return match.group('fate_id')
 
 
 def fate(text):
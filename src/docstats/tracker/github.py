@@ -25,20 +25,34 @@ _USER_REGEX = _BASE_REGEX
 _SERVER_REGEX = _USER_REGEX
 _DOMAIN_REGEX = _USER_REGEX
 _REPO_REGEX = _USER_REGEX
-_DOMAIN_REPO_REGEX = (r'(?:(?P<domain>{domain}+)/'
-                      r'(?P<repo>{repo}+))?'
+_DOMAIN_REPO_REGEX = (r'(?:(?P<gh_domain>{domain}+)/'
+                      r'(?P<gh_repo>{repo}+))?'
                       r'').format(domain=_DOMAIN_REGEX,
                                   repo=_REPO_REGEX,
                                   )
 
+#: Name of the tracker in the results
+NAME = 'gh'
+
+#: The group names have to be unique among all trackers, see :data:`docstats.tracker.SCANNER_REGEX`
+PATTERN = (r'(?P<gh_action>fix(?:es|ed)?\s(?:for)?|'
+           r'close[sd]?|'
+           r'resolve[sd]?)'
+           r'\s?'
+           r'%s#(?P<gh_id>\d{1,9})' % _DOMAIN_REPO_REGEX)
+FLAGS = re.I
 
 # external GitHub repositories
-_GH_REGEX = re.compile(r'(?P<github>fix(?:es|ed)?\s(?:for)?|'
-                       r'close[sd]?|'
-                       r'resolve[sd]?)'
-                       r'\s?'
-                       r'%s#(?P<id>\d{1,9})' % _DOMAIN_REPO_REGEX,
-                       re.I)
+_GH_REGEX = re.compile(PATTERN, FLAGS)
+
+
+def issue(match):
+    """Return the issue number of a match of :data:`PATTERN`; issues of other
+       repositories are returned as "domain/repo#number"
+    """
+    if match.group('gh_repo'):
+        return "{}/{}#{}".format(*match.group('gh_domain', 'gh_repo', 'gh_id'))
+    return match.group('gh_id')
 
 
 def github(text):
@@ -57,9 +71,5 @@ def github(text):
     :param text: the text to investigate
     :return: yields "fate", item or an empty list
     """
-    for action, *item in _GH_REGEX.findall(text):
-        key = 'gh'
-        if item[1]:
-            yield (key, "{}/{}#".format(*item))
-        else:
-            yield key, item[-1]
+    for match in _GH_REGEX.finditer(text):
+        yield NAME, issue(match)
@@ -18,7 +18,19 @@
 
 import re
 
-_TRELLO_REGEX = re.compile(r'(?:trello\s?#|https://trello\.com/c/)(\d+|\w{8})\b', re.I)
+#: Name of the tracker in the results
+NAME = 'trello'
+
+#: The group names have to be unique among all trackers, see :data:`docstats.tracker.SCANNER_REGEX`
+PATTERN = r'(?:trello\s?#|https://trello\.com/c/)(?P<trello_id>\d+|\w{8})\b'
+FLAGS = re.I
+
+_TRELLO_REGEX = re.compile(PATTERN, FLAGS)
+
+
+def issue(match):
+    """Return the card number of a match of :data:`PATTERN`"""
+    return match.group('trello_id')
 
 
 def trello(text):
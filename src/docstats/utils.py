@@ -16,12 +16,14 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 #
 
+import hashlib
 import re
 import os
 import urllib.parse
 from .tracker import findbugid
 
-__all__ = ('compare_usernames', 'findbugid', 'findcommits', 'git_urlparse', 'http_urlparse', 'urlparse',)
+__all__ = ('compare_usernames', 'findbugid', 'findcommits', 'getsafename', 'git_urlparse', 'http_urlparse',
+           'urlparse',)
 
 
 #: For parsing GitHub URLs
@@ -46,6 +48,9 @@ _GITURL_REGEX = re.compile(r'(?P<user>{user}+)@'
 
 _GITDOMAIN_REPO_REGEX = re.compile(_DOMAIN_REPO_REGEX)
 
+#: Characters which are replaced in file names, see :func:`getsafename`
+_UNSAFE_REGEX = re.compile(r'[^\w.-]+')
+
 
 #: The official regex for email addresses
 _RFC5322_REGEX = re.compile(r'''(?:[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*|"(?:[\x01-\x08\x0b\x0c\x0e-\x1f\x21\x23-\x5b\x5d-\x7f]|\\[\x01-\x09\x0b\x0c\x0e-\x7f])*")@(?:(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z0-9](?:[a-z0-9-]*[a-z0-9])?|\[(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?|[a-z0-9-]*[a-z0-9]:(?:[\x01-\x08\x0b\x0c\x0e-\x1f\x21-\x5a\x53-\x7f]|\\[\x01-\x09\x0b\x0c\x0e-\x7f])+)\])''')  # noqa
@@ -215,9 +220,37 @@ def findallmails(text):
         return result
 
     for line in text.split('\n'):
-        if line.startswith('#'):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        mails = _RFC5322_REGEX.findall(line)
+        if not mails:
             continue
-        primary, *mails = _RFC5322_REGEX.findall(line)
+        primary, *mails = mails
         result[primary] = primary
         result.update((key, primary) for key in mails)
     return result
+
+
+def getsafename(*parts):
+    """Return a file name (without extension) for some parts like a section
+       and a branch; different parts never give the same name
+
+    The parts are joined with "+", which is replaced in the parts themselves.
+    If a part had to be changed, a short hash of all original parts follows
+    after "@".
+
+    >>> getsafename('doc-sle', 'develop'), getsafename('main')
+    ('doc-sle+develop', 'main')
+    >>> getsafename('doc-sle', 'maint/15'), getsafename('doc-sle', 'maint_15')
+    ('doc-sle+maint_15@cad1aeab', 'doc-sle+maint_15')
+
+    :param parts: the parts of the name
+    :return: the name
+    :rtype: str
+    """
+    safe = [_UNSAFE_REGEX.sub('_', part) for part in parts]
+    name = "+".join(safe)
+    if safe != list(parts):
+        name += "@" + hashlib.sha1("\0".join(parts).encode('utf-8')).hexdigest()[:8]
+    return name
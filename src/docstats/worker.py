@@ -16,132 +16,455 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 #
 
+import asyncio
+from collections import defaultdict
 import csv
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 # from threading import current_thread
 from time import time
-import queue
 import os.path
 import git
 import json
 
-from .config import geturls
+from .backends import openbackend
+from .config import (geturls, getsectionbackend, getsectionbranches, getsectionperiod, getsectionscope, isdate,
+                     parsedate)
+from .export import CommitExporter, getexportfile
 from .log import log
-from .repo import analyze
-from .tracker import TRACKERS
+from .maintenance import maintain_clone, prune_clones, run_git
+from .metrics import METRICS, instrument
+from .objectstore import borrowobjects, getobjectgroups, share_objects
+from .profiling import getprofilefile, profiled
+from .repo import analyze_branch, opencache, prime_cache
+from .result import FIELDS, BranchResult, jsondefault, mergeids
+from .team import TeamDirectory
 
 
-def clone_repo(url, gitdir):
+#: Exceptions which abort the analysis of a single repository or branch
+GIT_ERRORS = (git.GitCommandError, git.CacheError, git.CommandError,
+              git.GitCommandNotFound, git.HookExecutionError, git.NoSuchPathError,
+              git.ParseError, git.RepositoryDirtyError, git.UnmergedEntriesError,
+              ValueError,
+              )
+
+#: All possible values of the "clone-mode" key
+CLONE_MODES = ('full', 'bare', 'blobless', 'shallow')
+
+
+def getshallowsince(config, section):
+    """Return the date from where the history is needed; this is the earliest
+       start date of all branches or the "shallow-since" key
+
+    :param config: the docstats configuration contents
+    :type config: :class:`configparser.ConfigParser`
+    :param str section: the section name
+    :return: the date or None, if no date could be found
+    :rtype: str | None
+    """
+    starts = [start for _, _, start, _ in getsectionbranches(config, section)]
+    # Start revisions which aren't dates don't tell us how much history is needed;
+    # git parses relative dates like "90.days" for --shallow-since as for --since:
+    if starts and all(isdate(start) for start in starts):
+        return min(starts, key=parsedate)
+    return config.get(section, 'shallow-since', fallback=None)
+
+
+def getcloneoptions(config, section):
+    """Return the options for "git clone" according to the "clone-mode" key
+
+    * ``full``: a normal clone with working tree (default)
+    * ``bare``: a bare clone with all branches and tags, but without working tree
+    * ``blobless``: like ``bare``, but file contents are fetched only when they are
+      needed for a diff; the blobs of the commits which are not in the cache yet are
+      fetched in one request before they are diffed, see
+      :meth:`docstats.backends.GitBackend.prefetch`
+    * ``shallow``: like ``bare``, but only the history since the earliest start date
+      (see :func:`getshallowsince`)
+
+    :param config: the docstats configuration contents
+    :type config: :class:`configparser.ConfigParser`
+    :param str section: the section name
+    :return: list of options
+    :rtype: list
+    """
+    mode = config.get(section, 'clone-mode', fallback='full')
+    if mode not in CLONE_MODES:
+        raise ValueError("Unknown clone-mode {!r} in section {!r}, "
+                         "expected one of {}".format(mode, section, ", ".join(CLONE_MODES)))
+
+    if mode == 'full':
+        return []
+    # We don't use --mirror as it fetches also refs/pull/* from GitHub:
+    options = ['--bare']
+    if mode == 'blobless':
+        options.append('--filter=blob:none')
+    elif mode == 'shallow':
+        since = getshallowsince(config, section)
+        if since is None:
+            log.warning("Cannot find a start date for a shallow clone of %r, "
+                        "cloning the complete history.", section)
+        else:
+            options.extend(['--shallow-since={}'.format(since), '--no-single-branch'])
+    return options
+
+
+def getrefspecs(repo, branchnames, remote='origin'):
+    """Return the refspecs to fetch only the given branches
+
+    >>> from unittest.mock import Mock
+    >>> getrefspecs(Mock(bare=False), ['develop'])
+    ['+refs/heads/develop:refs/remotes/origin/develop']
+    >>> getrefspecs(Mock(bare=True), ['develop', 'maint/a'])
+    ['+refs/heads/develop:refs/heads/develop', '+refs/heads/maint/a:refs/heads/maint/a']
+
+    :param repo: the repository
+    :type repo: :class:`git.Repo`
+    :param branchnames: the names of the branches
+    :param str remote: the name of the remote
+    :return: list of refspecs
+    :rtype: list
+    """
+    # Bare clones store the branches of the remote directly as local branches:
+    target = 'refs/heads/{}' if repo.bare else 'refs/remotes/%s/{}' % remote
+    return ['+refs/heads/{0}:{1}'.format(branch, target.format(branch)) for branch in branchnames]
+
+
+def update_repo(repo, branchnames, remote='origin'):
+    """Fetch the new commits of the given branches (and the tags pointing to them)
+
+    :param repo: the repository
+    :type repo: :class:`git.Repo`
+    :param branchnames: the names of the branches
+    :param str remote: the name of the remote
+    :return: the time the fetch took in seconds
+    :rtype: float
+    """
+    start = time()
+    with METRICS.stage('fetch'):
+        repo.git.fetch(remote, *getrefspecs(repo, branchnames, remote), prune=True)
+    return time() - start
+
+
+def clone_repo(url, gitdir, options=None, branches=None):
     """Clone the Git repository
 
     :param str url: the URL of the Git repository
     :param str gitdir: the temporary directory to clone to
-    :return: the repository
+    :param list options: additional options for "git clone", see :func:`getcloneoptions`
+    :param list branches: the names of the branches to fetch if the repository is
+                          already cloned; None doesn't fetch anything
+    :return: the repository, instrumented with :func:`docstats.metrics.instrument`
     :rtype: :class:`git.Repo`
     """
 
     if os.path.exists(gitdir):
-        log.debug("URL %r alread cloned, using %r.", url, gitdir)
-        return git.Repo(gitdir)
+        repo = instrument(git.Repo(gitdir))
+        if branches is None:
+            log.debug("URL %r alread cloned, using %r.", url, gitdir)
+        else:
+            elapsed = update_repo(repo, branches)
+            log.info("Fetched %d branch(es) of %r in %r, Time=%.2fs", len(branches), url, gitdir, elapsed)
+        return repo
 
-    repo = git.Repo.clone_from(url, gitdir)
+    log.debug("Cloning %r into %r with %s", url, gitdir, options)
+    with METRICS.stage('clone'):
+        METRICS.count('git-subprocesses')
+        repo = instrument(git.Repo.clone_from(url, gitdir, multi_options=options))
+    if any(option.startswith('--shallow-since') for option in options or []):
+        # The oldest commits need their parents, otherwise they are diffed against the empty tree:
+        repo.git.fetch('origin', '+refs/heads/*:refs/heads/*', deepen=1)
     return repo
 
 
-def tracker2int(data):
-    """Convert the list of trackers into a number
+async def clone_repo_async(url, gitdir, options=None, branches=None):
+    """Clone the Git repository like :func:`clone_repo`, but without blocking,
+       so the clones of several repositories overlap
 
-    :param dict data: the result dictionary
-    :return: None
+    :param str url: the URL of the Git repository
+    :param str gitdir: the temporary directory to clone to
+    :param list options: additional options for "git clone", see :func:`getcloneoptions`
+    :param list branches: the names of the branches to fetch if the repository is
+                          already cloned; None doesn't fetch anything
     """
-    for bug in TRACKERS:
-        for key in data:
-            data[key][bug] = len(data[key][bug])
+    if os.path.exists(gitdir):
+        if branches is None:
+            log.debug("URL %r alread cloned, using %r.", url, gitdir)
+            return
+        start = time()
+        refspecs = getrefspecs(git.Repo(gitdir), branches)
+        with METRICS.stage('fetch'):
+            await run_git('-C', gitdir, 'fetch', '--prune', 'origin', *refspecs)
+        log.info("Fetched %d branch(es) of %r in %r, Time=%.2fs", len(branches), url, gitdir, time() - start)
+        return
+
+    log.debug("Cloning %r into %r with %s", url, gitdir, options)
+    with METRICS.stage('clone'):
+        await run_git('clone', *(options or []), '--', url, gitdir)
+    if any(option.startswith('--shallow-since') for option in options or []):
+        # The oldest commits need their parents, otherwise they are diffed against the empty tree:
+        await run_git('-C', gitdir, 'fetch', '--deepen=1', 'origin', '+refs/heads/*:refs/heads/*')
 
 
 def output_result(repo, result):
     """Output the results as JSON and CSV
 
     :param repo: the repository
-    :type repo: :class:`git.Repo`
-    :param dict result: the result dictionary
+    :type repo: :class:`git.Repo` | :class:`docstats.backends.GitBackend`
+    :param dict result: maps each branch name to its :class:`docstats.result.BranchResult`;
+                        it is not modified
     :return:
     """
-    wd = repo.working_tree_dir
-    filename = wd + ".json"
-    with open(filename, 'w') as fh:
-        json.dump(result, fh, indent=4)
-        log.info("Writing results to %r", filename)
-
-    filename = wd + ".csv"
-    # Make sure we have only numbers for CSV
-    tracker2int(result)
-    with open(filename, 'wt') as csvfile:
-        # These are the fields that we are interested in
-        fields = ['release',
-                  'commits', 'insertions', 'deletions', 'lines',
-                  'fate', 'bnc', 'bsc', 'files', 'trello', 'gh', 'doccomments',
-                  'team-committers', 'external-committers',
-                  ]
-        writer = csv.writer(csvfile)
-        writer.writerow(fields)
-        for key in sorted(result):
-            row = []
-            row.append(key)
-            row.extend([result[key][field] for field in fields[1:]])
-            writer.writerow(row)
-        log.info("Writing results to %r", filename)
-
-
-def clone_and_analyze(url, gitdir, config):
-    """Clone the GitHub repo and analyze it and save the results
-
-    :param url: the GitHub URL to clone
+    with METRICS.stage('output'):
+        # Bare clones don't have a working tree:
+        wd = repo.working_tree_dir or repo.git_dir.rstrip('/')
+        filename = wd + ".json"
+        with open(filename, 'w') as fh:
+            json.dump(result, fh, default=jsondefault)
+            log.info("Writing results to %r", filename)
+
+        filename = wd + ".csv"
+        # The csv module writes its own line endings:
+        with open(filename, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            # These are the fields that we are interested in
+            writer.writerow(['release'] + list(FIELDS))
+            for key in sorted(result):
+                if result[key].error is not None:
+                    continue
+                # Only numbers for CSV
+                counts = result[key].counts
+                writer.writerow([key] + [counts[field] for field in FIELDS])
+            log.info("Writing results to %r", filename)
+
+
+def getupdatebranches(config, section):
+    """Return the branches which are fetched if the repository was already cloned
+
+    :param config: the docstats configuration contents
+    :type config: :class:`configparser.ConfigParser`
+    :param str section: the section name
+    :return: the sorted names of the branches or None, if "update" is not enabled
+    :rtype: list | None
+    """
+    if not config.getboolean(section, 'update', fallback=False):
+        return None
+    return sorted({branch for _, branch, _, _ in getsectionbranches(config, section)})
+
+
+def prime_section(gitdir, config):
+    """Extract all commits of the branches of an already cloned section into
+       the cache, see :func:`docstats.repo.prime_cache`
+
     :param gitdir: the path to the temporary directory (including the section)
     :param config:
     :type config: :class:`configparser.ConfigParser`
-    :return:
+    :return: the branches of the section, see :func:`docstats.config.getsectionbranches`
+    :rtype: list
     """
-    repo = clone_repo(url, gitdir)
-    result = analyze(repo, config)
-    output_result(repo, result)
+    section = os.path.basename(gitdir)
+    urls = getsectionbranches(config, section)
+    # Without a persistent cache, each job has to extract its commits itself
+    if config.getboolean(section, 'cache', fallback=True):
+        repo = openbackend(gitdir, getsectionbackend(config, section))
+        with METRICS.scope(section), opencache(repo, config, section) as cache, METRICS.stage('prime-cache'):
+            prime_cache(repo, urls, cache, getsectionscope(config, section))
+    return urls
+
+
+def analyze_unit(gitdir, config, name, branchname, start, end, team=None, exportfile=None):
+    """Analyze one branch of an already cloned repository; this is the
+       smallest unit of work which is distributed to the workers
+
+    :param gitdir: the path to the temporary directory (including the section)
+    :param config:
+    :type config: :class:`configparser.ConfigParser`
+    :param str name: name of the observable branch
+    :param str branchname: the name of the branch
+    :param str start: the start position or empty string
+    :param str end: the end position or empty string
+    :param team: the team members; if None, it is created from the config
+    :type team: :class:`docstats.team.TeamDirectory`
+    :param str exportfile: if set, all commits of the branch are exported to this
+                           file, see :class:`docstats.export.CommitExporter`
+    :return: the data of the branch, see :func:`docstats.repo.analyze_branch`
+    :rtype: dict
+    """
+    section = os.path.basename(gitdir)
+    repo = openbackend(gitdir, getsectionbackend(config, section))
+    if team is None:
+        team = TeamDirectory.fromconfig(config)
+    scope = getsectionscope(config, section)
+    with METRICS.scope(section, name), METRICS.stage('analyze'), opencache(repo, config, section) as cache:
+        if exportfile is None:
+            return analyze_branch(repo, config, name, branchname, start, end, cache, team,
+                                  *getsectionperiod(config, section), scope=scope)
+        with CommitExporter(exportfile, section, name, team) as export:
+            return analyze_branch(repo, config, name, branchname, start, end, cache, team,
+                                  *getsectionperiod(config, section), export=export, scope=scope)
+
+
+def runjob(profilefile, func, *args, **kwargs):
+    """Run a function in a worker and return its result together with the
+       metrics which were collected meanwhile
+
+    :param str profilefile: the path of the profile of this job or None,
+                            see :func:`docstats.profiling.profiled`
+    :param func: the function, for example :func:`analyze_unit`
+    :return: tuple of (result of the function, :class:`docstats.metrics.Metrics`)
+    :rtype: tuple
+    """
+    # Workers are reused and forked processes inherit the metrics of the parent
+    METRICS.clear()
+    with profiled(profilefile):
+        result = func(*args, **kwargs)
+    return result, METRICS.snapshot()
+
+
+async def process_section(executor, semaphore, config, basedir, section, url, team, profiledir=None,
+                          report=None, export=None, groups=None, storelocks=None):
+    """Clone a section and analyze all of its branches in the process pool
+
+    Only the clone (and its maintenance, see :func:`docstats.maintenance.maintain_clone`)
+    waits for the semaphore; as soon as it is finished, the branches are
+    analyzed while the clones of other sections continue.
+
+    :param executor: the process pool
+    :type executor: :class:`concurrent.futures.ProcessPoolExecutor`
+    :param semaphore: limits the number of concurrent clones and fetches
+    :type semaphore: :class:`asyncio.Semaphore`
+    :param config:
+    :type config: :class:`configparser.ConfigParser`
+    :param str basedir: the temporary base directory
+    :param str section: the section name
+    :param str url: the URL of the Git repository
+    :param team: the team members
+    :type team: :class:`docstats.team.TeamDirectory`
+    :param str profiledir: if set, each job is profiled into this directory
+    :param report: the consolidated report or None
+    :type report: :class:`docstats.report.ReportWriter`
+    :param tuple export: the directory and format of the exported commits or None
+    :param dict groups: maps sections to their object group, see :func:`docstats.objectstore.getobjectgroups`
+    :param dict storelocks: maps each object group to a :class:`asyncio.Lock`
+    :return: the result of the section or None, if it couldn't be cloned
+    :rtype: dict | None
+    """
+    loop = asyncio.get_running_loop()
+    gitdir = os.path.join(basedir, section)
+    with METRICS.scope(section):
+        try:
+            async with semaphore:
+                existed = os.path.exists(gitdir)
+                branches = getupdatebranches(config, section)
+                options = getcloneoptions(config, section)
+                group = (groups or {}).get(section)
+                if group is not None and (not existed or branches is not None):
+                    store = await share_objects(basedir, config, section, url, group, storelocks[group])
+                    options = borrowobjects(gitdir, options, store)
+                await clone_repo_async(url, gitdir, options, branches)
+                # Only a clone or fetch changes the objects:
+                if not existed or branches is not None:
+                    await maintain_clone(gitdir, config, section)
+            urls, metrics = await loop.run_in_executor(
+                executor, partial(runjob, getprofilefile(profiledir, section), prime_section, gitdir, config))
+        except GIT_ERRORS as error:
+            log.fatal('%r generated an exception: %s', url, error, exc_info=1)
+            return None
+        METRICS.merge(metrics)
+
+        exportdir, exportformat = export or (None, None)
+        futures = [loop.run_in_executor(executor, partial(runjob, getprofilefile(profiledir, section, branch[0]),
+                                                          analyze_unit, gitdir, config, *branch, team=team,
+                                                          exportfile=getexportfile(exportdir, section, branch[0],
+                                                                                   exportformat)))
+                   for branch in urls]
+        # Keep the order of the config file:
+        result = {}
+        for branch, outcome in zip(urls, await asyncio.gather(*futures, return_exceptions=True)):
+            if isinstance(outcome, GIT_ERRORS):
+                log.fatal('%r generated an exception: %s', url, outcome, exc_info=outcome)
+                result[branch[0]] = BranchResult.failed(str(outcome))
+                continue
+            if isinstance(outcome, Exception):
+                # A bug in one branch must not abort the other branches and sections:
+                log.error('Analyzing %r of %r failed unexpectedly: %r', branch[0], url, outcome, exc_info=outcome)
+                result[branch[0]] = BranchResult.failed(str(outcome) or type(outcome).__name__)
+                continue
+            if isinstance(outcome, BaseException):
+                raise outcome
+            data, metrics = outcome
+            METRICS.merge(metrics)
+            result[branch[0]] = data
+
+        if report is not None:
+            report.add(section, result)
+        output_result(git.Repo(gitdir), result)
+        log.info('Got data from URL %r', url)
     return result
 
 
-def work(config, basedir, sections=None, jobs=1):
+async def run_pipeline(config, basedir, urls, jobs, clonejobs, team, profiledir=None, report=None,
+                       export=None):
+    """Process all sections concurrently, see :func:`process_section`
+
+    :return: the results of all sections which could be cloned
+    :rtype: dict
+    """
+    semaphore = asyncio.Semaphore(clonejobs)
+    # Sections of the same group share their object store, see docstats.objectstore:
+    groups = getobjectgroups(config, geturls(config))
+    storelocks = defaultdict(asyncio.Lock)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = await asyncio.gather(*(process_section(executor, semaphore, config, basedir, section,
+                                                         url, team, profiledir, report, export,
+                                                         groups, storelocks)
+                                         for section, url in urls))
+    return {section: result for (section, _), result in zip(urls, results) if result is not None}
+
+
+def work(config, basedir, sections=None, jobs=1, profiledir=None, clonejobs=4, report=None,
+         exportdir=None, exportformat='parquet'):
     """Working off all Git URLs
 
+    The work is a pipeline of two stages: the repositories of all sections are
+    cloned (or fetched) concurrently by asyncio subprocesses, at most
+    clonejobs at once. As soon as a clone is ready, each of its branches is
+    analyzed as separate job in a pool of processes. When all branches of a
+    section are finished, the result of the section is written (and added to
+    the consolidated report). So the network bound clones overlap with the
+    CPU bound analysis. Before, the clones of sections which are no longer
+    in the config are removed, see :func:`docstats.maintenance.prune_clones`.
+
     :param config: a list or generator of urls
     :type config: :class:`configparser.ConfigParser`
     :param str basedir: the temporary base directory
     :param list sections: the sections to use
     :param int jobs: integer number of workers to create [default: 1]
-    :return: ???
+    :param str profiledir: if set, each job is profiled into this directory,
+                           see :func:`docstats.profiling.getprofilefile`
+    :param int clonejobs: the number of concurrent clones and fetches [default: 4]
+    :param report: the consolidated report of all sections or None
+    :type report: :class:`docstats.report.ReportWriter`
+    :param str exportdir: if set, the commits of each branch are exported into
+                          this directory, see :func:`docstats.export.getexportfile`
+    :param str exportformat: "parquet" or "arrow"
+    :return: the timings and counters of all jobs, see :data:`docstats.metrics.METRICS`
+    :rtype: :class:`docstats.metrics.Metrics`
     """
-    # Establish communication queues
-    q = queue.Queue()
-    urls = geturls(config, sections)
+    urls = list(geturls(config, sections))
+    team = TeamDirectory.fromconfig(config)
+    prune_clones(config, basedir)
 
     start = time()
-    with ProcessPoolExecutor(max_workers=jobs) as executor:
-        future_to_url = {executor.submit(clone_and_analyze,
-                                         url,
-                                         os.path.join(basedir, section),
-                                         config
-                                         ): url for section, url in urls}
-        for future in as_completed(future_to_url):
-            url = future_to_url[future]
-            try:
-                data = future.result()
-                q.put(data)
-            except (git.GitCommandError, git.CacheError, git.CommandError,
-                    git.GitCommandNotFound, git.HookExecutionError, git.NoSuchPathError,
-                    git.ParseError, git.RepositoryDirtyError, git.UnmergedEntriesError
-                    ) as error:
-                log.fatal('%r generated an exception: %s', url, error, exc_info=1)
-            else:
-                log.info('Got data from URL %r', url)
+    with METRICS.stage('total'):
+        export = None if exportdir is None else (exportdir, exportformat)
+        results = asyncio.run(run_pipeline(config, basedir, urls, jobs, clonejobs, team, profiledir, report,
+                                           export))
+
+    ids = mergeids(data for result in results.values() for data in result.values())
+    log.info("Found %s distinct issue(s) in all sections",
+             ", ".join("{} {}".format(len(issues), tracker) for tracker, issues in ids.items()))
 
     end = time()
     log.info("Finished worker. Time=%.2fs", float(end - start))
-    return
+    return METRICS
@@ -0,0 +1,97 @@
+#
+
+import json
+import pickle
+import pytest
+from collections import Counter
+
+from docstats.aggregate import BranchStats, COMMITTER_KEYS, DIFFSTAT_KEYS, getperiodlabel
+from docstats.gitlog import CommitRecord
+from docstats.tracker import TRACKERS
+
+
+def makestats(commits, bsc=(), team=(), external=()):
+    stats = BranchStats()
+    stats.commits = commits
+    stats.diffstats['insertions'] = commits
+    stats.issues['bsc'].update(bsc)
+    stats.committers['team-committers'].update(team)
+    stats.committers['external-committers'].update(external)
+    return stats
+
+
+def test_init():
+    stats = BranchStats()
+    assert stats.commits == 0
+    assert set(stats.diffstats) == set(DIFFSTAT_KEYS)
+    assert set(stats.issues) == set(TRACKERS)
+    assert set(stats.committers) == set(COMMITTER_KEYS)
+    assert not hasattr(stats, '__dict__')
+
+
+def test_merge():
+    stats = makestats(1, bsc=['1'], team=['tux@example.org'])
+    other = makestats(2, bsc=['1', '2'], team=['tux@example.org', 'tux@example.org'],
+                      external=['wilber@example.net'])
+    assert stats.merge(other) is stats
+    assert stats.commits == 3
+    assert stats.diffstats['insertions'] == 3
+    assert stats.issues['bsc'] == {'1', '2'}
+    assert stats.committers['team-committers'] == Counter({'tux@example.org': 3})
+    assert stats.commitsof('tux@example.org') == 3
+    assert stats.commitsof('wilber@example.net') == 1
+
+
+def test_todict():
+    stats = makestats(3, bsc=['2', '1'], team=['tux@example.org'] * 2, external=['wilber@example.net'])
+    data = stats.todict()
+    assert data['commits'] == 3
+    assert data['bsc'] == ['1', '2']
+    assert data['team-committers'] == data['team-committers-mails'] == 1
+    assert data['external-committers'] == 1
+    assert data['committer-commits'] == {'tux@example.org': 2, 'wilber@example.net': 1}
+    json.dumps(data)
+
+
+def test_state_and_pickle():
+    stats = makestats(2, bsc=['1'], team=['tux@example.org'])
+    state = json.loads(json.dumps(stats.tostate()))
+    assert BranchStats.fromstate(state) == stats
+    assert pickle.loads(pickle.dumps(stats)) == stats
+    assert BranchStats() != stats
+
+
+@pytest.mark.parametrize('timestamp,period,expected', [
+    (1485302400, 'week', '2017-W04'),
+    # 2021-01-01 belongs to the last ISO week of 2020:
+    (1609459200, 'week', '2020-W53'),
+    (1609459200, 'month', '2021-01'),
+    (1601510400, 'quarter', '2020-Q4'),
+])
+def test_getperiodlabel(timestamp, period, expected):
+    assert getperiodlabel(timestamp, period) == expected
+
+
+def test_unknown_period():
+    with pytest.raises(ValueError):
+        BranchStats('year')
+    with pytest.raises(ValueError):
+        BranchStats('month', 'push')
+
+
+@pytest.mark.parametrize('perioddate,expected', [
+    ('commit', ['2017-02']),
+    ('author', ['2017-01', '2017-02']),
+])
+def test_getbucket(perioddate, expected):
+    stats = BranchStats('month', perioddate)
+    for authored in (1485302400, 1486302400):
+        record = CommitRecord('12' * 20, 'tux@example.org', None, {}, (), 1486302400, authored)
+        stats.getbucket(record).commits += 1
+    assert sorted(stats.periods) == expected
+    assert BranchStats().getbucket(record) is None
+
+    data = stats.todict()
+    assert data['period'] == 'month'
+    assert sum(period['commits'] for period in data['periods'].values()) == 2
+    assert BranchStats.fromstate(json.loads(json.dumps(stats.tostate()))) == stats
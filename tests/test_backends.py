@@ -0,0 +1,191 @@
+#
+
+import git
+import pytest
+from configparser import ConfigParser
+
+from docstats.backends import (BACKENDS, GitPythonBackend, asbackend, getbackendclass,
+                               openbackend)
+from docstats.gitlog import LogScope, getpathspecs
+from docstats.repo import analyze, getrevargs
+
+
+@pytest.fixture(scope='module')
+def historyrepo(tmpdir_factory):
+    """A repository with a merge, a binary file, and commits on four dates;
+       the branch "renamed" renames a file additionally
+    """
+    path = tmpdir_factory.mktemp('backends').join('doc-a')
+    repo = git.Repo.init(path.strpath)
+    repo.git.symbolic_ref('HEAD', 'refs/heads/main')
+
+    def run(*args, date=None):
+        env = {'GIT_AUTHOR_NAME': 'Tux Penguin', 'GIT_AUTHOR_EMAIL': 'tux@example.org',
+               'GIT_COMMITTER_NAME': 'Tux Penguin', 'GIT_COMMITTER_EMAIL': 'tux@example.org'}
+        if date is not None:
+            env.update(GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+        repo.git.execute(['git'] + list(args), env=env)
+
+    def commit(message, date, **files):
+        for name, content in files.items():
+            path.join(name).write_binary(content)
+        run('add', '--all')
+        run('commit', '-m', message, date=date)
+
+    commit("First bsc#11", '2017-01-10T12:00:00', text=b'a\nb\n')
+    run('branch', 'side')
+    commit("Second bsc#12", '2017-02-10T12:00:00', text=b'a\nc\nd\n', logo=b'\x00\x01\x02')
+    run('checkout', '-q', 'side')
+    commit("Side, closes #3", '2017-02-15T12:00:00', other=b'x\n')
+    run('checkout', '-q', 'main')
+    run('merge', '--no-ff', '-m', 'Merge side', 'side', date='2017-03-01T12:00:00')
+    run('checkout', '-q', '-b', 'renamed')
+    run('mv', 'text', 'text.xml')
+    run('commit', '-m', 'Rename', date='2017-03-10T12:00:00')
+    run('checkout', '-q', 'main')
+    return repo
+
+
+def test_getbackendclass():
+    assert getbackendclass('gitpython') is GitPythonBackend
+    with pytest.raises(ValueError):
+        getbackendclass('svn')
+
+
+def test_asbackend(gitrepo):
+    _, repo = gitrepo
+    backend = asbackend(repo)
+    assert isinstance(backend, GitPythonBackend)
+    assert asbackend(backend) is backend
+    assert backend.working_tree_dir == repo.working_tree_dir
+
+
+@pytest.fixture(params=list(BACKENDS))
+def backend(request, historyrepo):
+    if request.param == 'pygit2':
+        pytest.importorskip('pygit2')
+    return openbackend(historyrepo.working_tree_dir, request.param)
+
+
+def test_same_as_gitpython(backend, historyrepo):
+    reference = GitPythonBackend(historyrepo)
+    branch = historyrepo.active_branch.name
+    assert backend.resolve(branch) == historyrepo.head.commit.hexsha
+    assert backend.resolve('does-not-exist') is None
+    for revargs in ([branch], ['side..' + branch], getrevargs(branch, '2017-02-01', '2017-02-28')):
+        assert backend.revlist(revargs) == reference.revlist(revargs)
+        assert list(backend.log(revargs)) == list(reference.log(revargs))
+    shas = reference.revlist([branch])[::-1]
+    assert list(backend.log(shas=shas)) == list(reference.log(shas=shas))
+
+
+def test_log_stats(backend, historyrepo):
+    records = {record.message.strip(): record.stats for record in backend.log(historyrepo.active_branch.name)}
+    assert records['First bsc#11'] == {'insertions': 2, 'deletions': 0, 'lines': 2, 'files': 1}
+    # The binary file counts as changed file without lines:
+    assert records['Second bsc#12'] == {'insertions': 2, 'deletions': 1, 'lines': 3, 'files': 2}
+    # The merge is diffed against its first parent:
+    assert records['Merge side'] == {'insertions': 1, 'deletions': 0, 'lines': 1, 'files': 1}
+
+
+def test_isancestor(backend, historyrepo):
+    branch = historyrepo.active_branch.name
+    assert backend.isancestor('side', branch)
+    assert backend.isancestor(branch, branch)
+    assert not backend.isancestor(branch, 'side')
+    assert not backend.isancestor('does-not-exist', branch)
+
+
+def test_unknown_range(backend):
+    with pytest.raises(git.GitCommandError):
+        backend.revlist(['does-not-exist..HEAD'])
+
+
+def test_clone(backend, historyrepo, tmpdir):
+    clone = type(backend).clone(historyrepo.git_dir, tmpdir.join('doc-b').strpath, ['--bare'])
+    assert clone.working_tree_dir is None
+    assert clone.resolve(historyrepo.active_branch.name) == historyrepo.head.commit.hexsha
+
+
+def test_prefetch_blobless(backend, historyrepo, tmpdir):
+    assert not backend.partial
+    historyrepo.git.config('uploadpack.allowFilter', 'true')
+    branch = historyrepo.active_branch.name
+    clone = type(backend).clone('file://' + historyrepo.git_dir, tmpdir.join('doc-b').strpath,
+                                ['--bare', '--filter=blob:none'])
+    assert clone.partial
+    missing = git.Git(clone.git_dir).rev_list('--objects', '--missing=print', branch).count('?')
+    assert missing
+
+    clone.prefetch(branch)
+    # All blobs which are diffed are there now, git doesn't fetch them lazily:
+    assert not git.Git(clone.git_dir).rev_list('--objects', '--missing=print', branch).count('?')
+    assert list(clone.log(branch)) == list(GitPythonBackend(historyrepo).log([branch]))
+
+
+def test_analyze_with_backend(backend, historyrepo):
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'branch': historyrepo.active_branch.name, 'cache': 'no',
+                                'backend': type(backend).NAME}})
+    result = analyze(historyrepo, config)[historyrepo.active_branch.name]
+    assert result['commits'] == 4
+    assert result['bsc'] == ('11', '12')
+    assert result['gh'] == ('3',)
+
+
+@pytest.mark.parametrize('include,exclude,expected', [
+    (['text'], [], {'First bsc#11': 1, 'Second bsc#12': 1}),
+    # The merge only brings in the file of the side branch:
+    (['oth*'], [], {'Side, closes #3': 1}),
+    ([], ['logo', 'other'], {'First bsc#11': 1, 'Second bsc#12': 1}),
+])
+def test_scoped_log(backend, historyrepo, include, exclude, expected):
+    scope = LogScope(getpathspecs(include, exclude))
+    branch = historyrepo.active_branch.name
+    records = list(backend.log(branch, scope=scope))
+    assert {record.message.strip(): record.stats['files'] for record in records} == expected
+    shas = backend.revlist([branch], scope)
+    assert shas == [record.hexsha for record in records]
+    # The commits which don't touch the scope are left out of a list of SHAs, too:
+    assert list(backend.log(shas=shas, scope=scope)) == records
+    assert {record.hexsha for record in backend.log(shas=backend.revlist([branch]), scope=scope)} >= set(shas)
+
+
+def test_analyze_with_scope(historyrepo):
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'branch': historyrepo.active_branch.name, 'include': 'text'}})
+    result = analyze(historyrepo, config)[historyrepo.active_branch.name]
+    assert (result['commits'], result['files'], result['bsc']) == (2, 2, ('11', '12'))
+    assert result['scope']['paths'] == [':(glob)text']
+    # A changed scope doesn't reuse the cached records:
+    config.set('doc-a', 'include', '')
+    config.set('doc-a', 'exclude', 'text logo')
+    result = analyze(historyrepo, config)[historyrepo.active_branch.name]
+    assert (result['commits'], result['files'], result['gh']) == (1, 1, ('3',))
+
+
+@pytest.mark.parametrize('scope', [LogScope(firstparent=True), LogScope(merges=False), LogScope(renames=50),
+                                   LogScope(binarythreshold='2')])
+def test_scope_same_as_gitpython(backend, historyrepo, scope):
+    reference = GitPythonBackend(historyrepo)
+    assert backend.revlist(['renamed'], scope) == reference.revlist(['renamed'], scope)
+    assert list(backend.log('renamed', scope=scope)) == list(reference.log('renamed', scope=scope))
+    shas = reference.revlist(['renamed'])
+    assert list(backend.log(shas=shas, scope=scope)) == list(reference.log(shas=shas, scope=scope))
+
+
+@pytest.mark.parametrize('scope,expected', [
+    (LogScope(), {'Rename': (2, 6), 'Second bsc#12': (2, 3), 'Merge side': (1, 1)}),
+    # Only the first parents, the commit of the side branch is left out:
+    (LogScope(firstparent=True), {'Rename': (2, 6), 'Second bsc#12': (2, 3), 'Merge side': (1, 1)}),
+    (LogScope(merges=False), {'Rename': (2, 6), 'Second bsc#12': (2, 3)}),
+    # The renamed file counts once and without lines:
+    (LogScope(renames=50), {'Rename': (1, 0), 'Second bsc#12': (2, 3), 'Merge side': (1, 1)}),
+    # Files with more than 2 bytes are counted without diffing them:
+    (LogScope(binarythreshold='2'), {'Rename': (2, 0), 'Second bsc#12': (2, 0), 'Merge side': (1, 1)}),
+])
+def test_log_with_scope(historyrepo, scope, expected):
+    records = {record.message.strip(): (record.stats['files'], record.stats['lines'])
+               for record in GitPythonBackend(historyrepo).log('renamed', scope=scope)}
+    assert len(records) == (4 if scope.firstparent else 5) - (not scope.merges)
+    assert {message: records[message] for message in expected} == expected
@@ -0,0 +1,71 @@
+#
+
+import pytest
+from unittest.mock import patch
+
+from docstats.cache import CommitCache, getcachefile
+from docstats.gitlog import CommitRecord
+
+
+RECORDS = [CommitRecord('a' * 40, 'tux@example.org', None,
+                        {'insertions': 1, 'deletions': 2, 'lines': 3, 'files': 1},
+                        (('bsc', '1234'), ('gh', '1'))),
+           CommitRecord('b' * 40, 'wilber@example.net', None,
+                        {'insertions': 0, 'deletions': 0, 'lines': 0, 'files': 0},
+                        ()),
+           ]
+
+
+@pytest.fixture
+def cachefile(tmpdir):
+    return tmpdir.join('doc-a.cache.sqlite').strpath
+
+
+def test_getcachefile(gitrepo):
+    _, repo = gitrepo
+    assert getcachefile(repo) == repo.working_tree_dir + '.cache.sqlite'
+
+
+def test_cache_add_and_get(cachefile):
+    with CommitCache(cachefile) as cache:
+        assert cache.get(['a' * 40]) == {}
+        cache.add(RECORDS)
+        assert len(cache) == 2
+
+    with CommitCache(cachefile) as cache:
+        assert cache.get(['a' * 40, 'b' * 40, 'c' * 40]) == {record.hexsha: record for record in RECORDS}
+
+
+def test_cache_with_many_shas(cachefile):
+    records = [RECORDS[1]._replace(hexsha='{:040x}'.format(idx)) for idx in range(1200)]
+    with CommitCache(cachefile) as cache:
+        cache.add(records)
+        assert len(cache.get([record.hexsha for record in records])) == 1200
+
+
+def test_cache_is_invalidated_by_new_version(cachefile):
+    with CommitCache(cachefile) as cache:
+        cache.add(RECORDS)
+
+    with patch('docstats.cache.TRACKER_FINGERPRINT', 'changed-regexes'):
+        with CommitCache(cachefile) as cache:
+            assert len(cache) == 0
+
+
+def test_cache_is_invalidated_by_new_variant(cachefile):
+    with CommitCache(cachefile, 'abc') as cache:
+        cache.add(RECORDS)
+        cache.setwatermark('develop', {'head': 'a' * 40})
+
+    with CommitCache(cachefile, 'abc') as cache:
+        assert len(cache) == 2
+
+    with CommitCache(cachefile, 'def') as cache:
+        assert len(cache) == 0
+        assert cache.getwatermark('develop') is None
+
+
+def test_cache_missing(cachefile):
+    with CommitCache(cachefile) as cache:
+        cache.add(RECORDS[:1])
+        assert cache.missing(['c' * 40, 'a' * 40, 'b' * 40]) == ['c' * 40, 'b' * 40]
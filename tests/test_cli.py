@@ -63,9 +63,18 @@ def test_parsecli(cli, expected, monkeypatch):
 
 def test_checkcliargs_with_FileNotFoundError():
     with pytest.raises(FileNotFoundError):
-        checkcliargs({'--jobs': '1', 'CONFIGFILE': 'fake', '--sections': None})
+        checkcliargs({'--jobs': '1', '--clone-jobs': '4', 'CONFIGFILE': 'fake', '--sections': None})
 
 
 def test_checkcliargs_with_DocoptExit():
     with pytest.raises(DocoptExit):
         checkcliargs({'--jobs': 'x', 'CONFIGFILE': None})
+
+
+@pytest.mark.parametrize('option', ['--jobs', '--clone-jobs'])
+@pytest.mark.parametrize('value', ['0', '-2'])
+def test_checkcliargs_with_too_few_jobs(option, value):
+    args = {'--jobs': '1', '--clone-jobs': '4', 'CONFIGFILE': 'fake', '--sections': None}
+    args[option] = value
+    with pytest.raises(DocoptExit, match='must be at least 1'):
+        checkcliargs(args)
@@ -1,10 +1,11 @@
 #
 
 import pytest
+from configparser import ConfigParser
 import py
 from unittest.mock import patch
 
-from docstats.config import parseconfig, geturls, getbranches, getbranchparts
+from docstats.config import parseconfig, geturls, getbranches, getbranchparts, getsectionscope, parsedate
 
 # Our global variables which is used in our configuration parser
 # will be overwritten bei setup_module()
@@ -144,6 +145,52 @@ def test_getbranches(string, expected):
     ('name maintenance/SLE12   ..abc',    [('name', 'maintenance/SLE12', '', 'abc')]),
     #
     ('name maintenance/SLE12   abc..def', [('name', 'maintenance/SLE12', 'abc', 'def')]),
+    #
+    ('name develop 2017-01-25T12:00..',   [('name', 'develop', '2017-01-25T12:00', '')]),
 ])
 def test_getbranchparts(string, expected):
     assert list(getbranchparts(string)) == expected
+
+
+@pytest.mark.parametrize('string', [
+    'name develop 2017-01-25 12:00..',
+    'name develop ..2017-01-25 12:00',
+])
+def test_getbranchparts_with_spaced_time(string):
+    with pytest.raises(ValueError, match='2017-01-25T12:00'):
+        list(getbranchparts(string))
+
+
+def test_getsectionscope():
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'globals': {'exclude': 'images/**'},
+                      'doc-a': {'include': '\n  **/*.xml\n  /README'},
+                      'doc-b': {'exclude': ''}})
+    assert getsectionscope(config, 'doc-a').paths == (':(glob)**/*.xml', ':(glob)README',
+                                                      ':(glob,exclude)images/**')
+    assert getsectionscope(config, 'doc-b').paths == ()
+    assert getsectionscope(config, 'doc-a').fingerprint != getsectionscope(config, 'doc-b').fingerprint
+
+
+def test_getsectionscope_diff_options():
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'globals': {'merges': 'no', 'rename-threshold': '70'},
+                      'doc-a': {'first-parent': 'yes', 'renames': 'yes', 'binary-threshold': '1m'},
+                      'doc-b': {'rename-threshold': '200', 'renames': 'yes'},
+                      'doc-c': {'binary-threshold': 'large'}})
+    scope = getsectionscope(config, 'doc-a')
+    assert (scope.firstparent, scope.merges, scope.renames, scope.binarythreshold) == (True, False, 70, '1m')
+    for section in ('doc-b', 'doc-c'):
+        with pytest.raises(ValueError):
+            getsectionscope(config, section)
+
+
+@pytest.mark.parametrize('value', [
+    '2017-02-30',
+    '2017-13-01',
+    '2017-01-25 25:00',
+    'develop',
+])
+def test_parsedate_with_invalid_date(value):
+    with pytest.raises(ValueError, match='Invalid date'):
+        parsedate(value)
@@ -0,0 +1,67 @@
+#
+
+import pytest
+from configparser import ConfigParser
+
+from docstats.export import CommitExporter, getexportfile
+from docstats.gitlog import CommitRecord
+from docstats.team import TeamDirectory
+from docstats.worker import work
+
+pyarrow = pytest.importorskip('pyarrow')
+import pyarrow.ipc
+import pyarrow.parquet
+
+
+STATS = {'insertions': 2, 'deletions': 1, 'lines': 3, 'files': 1}
+
+
+def makerecords(count):
+    return [CommitRecord('{:040x}'.format(idx), 'Tux@example.org' if idx % 2 else 'wilber@example.net',
+                         None, STATS, (('bsc', str(idx)), ('gh', 'SUSE/doc#1')), 1485302400 + idx, 1485302400)
+            for idx in range(count)]
+
+
+def test_getexportfile():
+    assert getexportfile(None, 'doc-a', 'dev') is None
+    assert getexportfile('/tmp/x', 'doc-a', 'maint/1', 'arrow') == '/tmp/x/doc-a+maint_1@9d919911.arrow'
+
+
+@pytest.mark.parametrize('extension', ['.parquet', '.arrow'])
+def test_commitexporter(extension, tmpdir):
+    filename = tmpdir.join('doc-a-dev' + extension).strpath
+    team = TeamDirectory.fromtext('tux@example.org')
+    with CommitExporter(filename, 'doc-a', 'dev', team, batchsize=3) as export:
+        for record in makerecords(7):
+            export.add(record)
+    assert export.count == 7
+
+    if extension == '.arrow':
+        reader = pyarrow.ipc.open_file(pyarrow.memory_map(filename))
+        assert reader.num_record_batches == 3
+        table = reader.read_all()
+    else:
+        assert pyarrow.parquet.ParquetFile(filename).metadata.num_row_groups == 3
+        table = pyarrow.parquet.read_table(filename)
+    assert table.num_rows == 7
+    rows = table.to_pylist()
+    assert rows[1]['committer'] == 'tux@example.org'
+    assert rows[1]['team'] and not rows[0]['team']
+    assert rows[1]['bsc'] == ['1']
+    assert rows[1]['gh'] == ['SUSE/doc#1']
+    assert rows[1]['fate'] == []
+    assert rows[1]['insertions'] == 2
+
+
+def test_work_with_export(gitrepo, tmpdir):
+    result, repo = gitrepo
+    branch = repo.active_branch.name
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'url': repo.git_dir, 'branch': branch}})
+    exportdir = tmpdir.join('export')
+    for _ in range(2):
+        # The second run uses the stored results, but all commits are exported anyway
+        work(config, tmpdir.strpath, jobs=2, exportdir=exportdir.strpath)
+        table = pyarrow.parquet.read_table(exportdir.strpath)
+        assert table.num_rows == result['commits']
+    assert set(table.column('sha').to_pylist()) == {commit.hexsha for commit in repo.iter_commits(branch)}
@@ -0,0 +1,75 @@
+#
+
+import io
+import pytest
+from unittest.mock import patch
+
+from docstats.gitlog import (CommitRecord,
+                             checkgitversion,
+                             iter_log,
+                             parse_numstat,
+                             parse_record,
+                             split_records,
+                             )
+
+
+@pytest.mark.parametrize('text,expected', [
+    #
+    ('', {'insertions': 0, 'deletions': 0, 'lines': 0, 'files': 0}),
+    #
+    ('\n3\t1\tfoo.xml\n', {'insertions': 3, 'deletions': 1, 'lines': 4, 'files': 1}),
+    #
+    ('3\t1\tfoo.xml\n2\t0\tbar.xml\n', {'insertions': 5, 'deletions': 1, 'lines': 6, 'files': 2}),
+    # Binary files count as a file, but without lines
+    ('-\t-\tlogo.png\n1\t1\ta b.txt\n', {'insertions': 1, 'deletions': 1, 'lines': 2, 'files': 2}),
+])
+def test_parse_numstat(text, expected):
+    assert parse_numstat(text) == expected
+
+
+def test_parse_record():
+    chunk = 'abc\x00tux@example.org\x001485302400\x001485300000\x00Fix bsc#1234\n\nLong text\x00\n\n1\t2\tfoo.xml\n'
+    record = parse_record(chunk)
+    assert record == CommitRecord('abc', 'tux@example.org', 'Fix bsc#1234\n\nLong text',
+                                  {'insertions': 1, 'deletions': 2, 'lines': 3, 'files': 1}, None,
+                                  1485302400, 1485300000)
+
+
+@pytest.mark.parametrize('bufsize', [1, 3, 1024])
+def test_split_records(bufsize):
+    stream = io.BytesIO(b'\x1eA\x00\n\x1eB\x00\n1\t1\tx\n\x1eC\xc3\xa4\x00')
+    assert list(split_records(stream, bufsize)) == ['A\x00\n', 'B\x00\n1\t1\tx\n', 'Cä\x00']
+
+
+def test_iter_log(gitrepo):
+    result, repo = gitrepo
+    records = list(iter_log(repo, 'HEAD'))
+    assert len(records) == result['commits']
+    assert {record.email for record in records} == result['committer_mails']
+    for record, commit in zip(records, repo.iter_commits('HEAD')):
+        assert record.hexsha == commit.hexsha
+        assert record.message == commit.message
+        assert record.stats == commit.stats.total
+        assert record.committed == commit.committed_date
+        assert record.authored == commit.authored_date
+
+
+def test_iter_log_with_shas(gitrepo):
+    _, repo = gitrepo
+    shas = [commit.hexsha for commit in repo.iter_commits('HEAD')][::-1]
+    assert [record.hexsha for record in iter_log(repo, shas=shas)] == shas
+
+
+@pytest.mark.parametrize('version,fails', [
+    ((2, 31), False),
+    ((2, 45), False),
+    ((2, 30), True),
+])
+@patch('docstats.gitlog.getgitversion')
+def test_checkgitversion(mock_getgitversion, version, fails):
+    mock_getgitversion.return_value = version
+    if fails:
+        with pytest.raises(RuntimeError, match='needs git 2.31 or newer, found git 2.30'):
+            checkgitversion()
+    else:
+        checkgitversion()
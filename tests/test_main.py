@@ -34,13 +34,14 @@ def test_main_with_ctrl_c(mock_parsecli, error):
     assert result
 
 
-@patch('docstats.worker.work')
+@patch('docstats.main.checkgitversion')
+@patch('docstats.main.work')
 @patch('docstats.main.os.makedirs')
 @patch('docstats.main.gettmpdir')
 @patch('docstats.main.parseconfig')
 @patch('docstats.main.parsecli')
 def test_main_return_with_0(mock_parsecli, mock_parseconfig, mock_gettmpdir,
-                            mock_makedirs, mock_work):
+                            mock_makedirs, mock_work, mock_checkgitversion):
     def work(config, basedir, sections, jobs):
         return True
     def gettmpdir(path):
@@ -61,3 +62,31 @@ def test_main_return_with_0(mock_parsecli, mock_parseconfig, mock_gettmpdir,
     mock_work.side_effects = work
 
     assert not main()
+
+
+@patch('docstats.main.work')
+@patch('docstats.main.checkgitversion')
+@patch('docstats.main.parseconfig')
+@patch('docstats.main.parsecli')
+def test_main_with_old_git(mock_parsecli, mock_parseconfig, mock_checkgitversion, mock_work):
+    mock_parsecli.return_value = {'--jobs': 1, '--sections': [], '-v': 2, 'CONFIGFILE': 'fake.ini'}
+    mock_parseconfig.return_value = ('fake.ini', Mock(autospec=ConfigParser))
+    mock_checkgitversion.side_effect = RuntimeError("docstats needs git 2.31 or newer, found git 2.26")
+    assert main() == 10
+    assert not mock_work.called
+
+
+@patch('docstats.main.work')
+@patch('docstats.main.checkgitversion')
+@patch('docstats.main.os.makedirs')
+@patch('docstats.main.gettmpdir')
+@patch('docstats.main.parseconfig')
+@patch('docstats.main.parsecli')
+def test_main_with_bug(mock_parsecli, mock_parseconfig, mock_gettmpdir, mock_makedirs, mock_checkgitversion,
+                       mock_work):
+    # Other RuntimeErrors are bugs and aren't hidden:
+    mock_parsecli.return_value = {'--jobs': 1, '--sections': [], '-v': 2, 'CONFIGFILE': 'fake.ini'}
+    mock_parseconfig.return_value = ('fake.ini', Mock(autospec=ConfigParser))
+    mock_work.side_effect = RuntimeError("bug")
+    with pytest.raises(RuntimeError):
+        main()
@@ -0,0 +1,118 @@
+#
+
+import asyncio
+import git
+import glob
+import os
+import pytest
+from configparser import ConfigParser
+
+from docstats.maintenance import (LOOSE_OBJECTS_LIMIT, getmaintenancesteps, isclone, maintain_clone,
+                                  prune_clones)
+
+
+def makeconfig(**sections):
+    config = ConfigParser(default_section='globals')
+    config.read_dict(sections)
+    return config
+
+
+@pytest.mark.parametrize('objects,lastrepack,expected', [
+    ({'count': 0, 'packs': 1}, 1000, ['commit-graph']),
+    ({'count': LOOSE_OBJECTS_LIMIT + 1, 'packs': 1}, 1000, ['repack', 'commit-graph']),
+    ({'count': 0, 'packs': 3}, 1000, ['multi-pack-index', 'commit-graph']),
+    # The last repack is older than the interval:
+    ({'count': 0, 'packs': 1}, 1000 - 7 * 86400, ['repack', 'commit-graph']),
+])
+def test_getmaintenancesteps(objects, lastrepack, expected):
+    assert [name for name, _ in getmaintenancesteps(objects, lastrepack, 1000)] == expected
+
+
+@pytest.mark.parametrize('packs,midxpacks,expected', [
+    (3, 0, ['multi-pack-index', 'commit-graph']),
+    # No fetch has added packs since the last write:
+    (3, 3, ['commit-graph']),
+    (4, 3, ['multi-pack-index', 'commit-graph']),
+])
+def test_getmaintenancesteps_midx(packs, midxpacks, expected):
+    steps = getmaintenancesteps({'count': 0, 'packs': packs}, 1000, 1000, midxpacks=midxpacks)
+    assert [name for name, _ in steps] == expected
+
+
+def test_getmaintenancesteps_restricted():
+    # Shallow clones neither have bitmaps nor a commit-graph:
+    steps = getmaintenancesteps({'count': 0, 'packs': 3}, 0, 1000 * 86400, bitmaps=False, commitgraph=False)
+    assert steps == [('repack', ['repack', '-a', '-d', '-l', '-q'])]
+    # Old git versions don't know Bloom filters and multi-pack bitmaps:
+    steps = getmaintenancesteps({'count': 0, 'packs': 3}, 0, 0, version=(2, 20))
+    assert steps == [('commit-graph', ['commit-graph', 'write', '--reachable', '--split'])]
+
+
+def test_maintain_clone(gitrepo, tmpdir):
+    _, repo = gitrepo
+    gitdir = tmpdir.join('doc-a').strpath
+    clone = git.Repo.clone_from(repo.git_dir, gitdir, bare=True)
+    config = makeconfig(**{'doc-a': {'branch': 'develop'}})
+
+    asyncio.run(maintain_clone(gitdir, config, 'doc-a', now=1000))
+    assert isclone(gitdir)
+    assert clone.git.config('docstats.repacked') == '1000'
+    assert os.path.exists(os.path.join(gitdir, 'objects', 'info', 'commit-graphs', 'commit-graph-chain'))
+    assert not glob.glob(os.path.join(gitdir, 'objects', 'pack', '*.bitmap'))
+
+    # A week later, the clone is repacked with bitmap
+    asyncio.run(maintain_clone(gitdir, config, 'doc-a', now=1000 + 7 * 86400))
+    assert clone.git.config('docstats.repacked') == str(1000 + 7 * 86400)
+    assert len(glob.glob(os.path.join(gitdir, 'objects', 'pack', '*.bitmap'))) == 1
+
+
+def test_maintain_clone_midx(gitrepo, tmpdir):
+    _, repo = gitrepo
+    gitdir = tmpdir.join('doc-a').strpath
+    clone = git.Repo.clone_from('file://' + repo.git_dir, gitdir, bare=True)
+    config = makeconfig(**{'doc-a': {'branch': 'develop'}})
+    asyncio.run(maintain_clone(gitdir, config, 'doc-a', now=1000))
+    # A fetch adds a second pack:
+    work = git.Repo.clone_from(repo.git_dir, tmpdir.join('work').strpath)
+    work.index.commit("Another commit")
+    clone.git.config('fetch.unpackLimit', '1')
+    clone.git.fetch(work.git_dir, '+HEAD:refs/heads/new')
+    midx = os.path.join(gitdir, 'objects', 'pack', 'multi-pack-index')
+
+    asyncio.run(maintain_clone(gitdir, config, 'doc-a', now=2000))
+    assert os.path.exists(midx)
+    assert clone.git.config('docstats.midxpacks') == '2'
+    # Without new packs, the multi-pack-index isn't written again
+    os.remove(midx)
+    asyncio.run(maintain_clone(gitdir, config, 'doc-a', now=3000))
+    assert not os.path.exists(midx)
+
+
+def test_maintain_clone_fails(tmpdir):
+    # Not a repository: the failure is logged, the analysis goes on
+    gitdir = tmpdir.mkdir('doc-a').strpath
+    asyncio.run(maintain_clone(gitdir, makeconfig(**{'doc-a': {}}), 'doc-a'))
+    assert not isclone(gitdir)
+
+
+def test_maintain_clone_disabled(gitrepo, tmpdir):
+    _, repo = gitrepo
+    gitdir = tmpdir.join('doc-a').strpath
+    git.Repo.clone_from(repo.git_dir, gitdir, bare=True)
+    asyncio.run(maintain_clone(gitdir, makeconfig(**{'doc-a': {'maintenance': 'no'}}), 'doc-a'))
+    assert not isclone(gitdir)
+
+
+def test_prune_clones(gitrepo, tmpdir):
+    _, repo = gitrepo
+    for name in ('doc-a', 'doc-old'):
+        gitdir = tmpdir.join(name).strpath
+        git.Repo.clone_from(repo.git_dir, gitdir, bare=True)
+        asyncio.run(maintain_clone(gitdir, makeconfig(**{name: {}}), name))
+        tmpdir.join(name + '.json').write('{}')
+    # Not created by docstats:
+    git.Repo.init(tmpdir.join('other').strpath)
+
+    assert prune_clones(makeconfig(globals={'prune-clones': 'no'}, **{'doc-a': {}}), tmpdir.strpath) == []
+    assert prune_clones(makeconfig(**{'doc-a': {}}), tmpdir.strpath) == ['doc-old']
+    assert sorted(os.listdir(tmpdir.strpath)) == ['doc-a', 'doc-a.json', 'other']
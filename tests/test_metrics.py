@@ -0,0 +1,119 @@
+#
+
+import asyncio
+import json
+import pickle
+import pytest
+from configparser import ConfigParser
+
+from docstats.metrics import METRICS, Metrics, instrument, writemetrics, writeprometheus
+from docstats.worker import work
+
+
+def test_stage_and_count():
+    metrics = Metrics()
+    with metrics.scope('doc-a', 'dev'):
+        with metrics.stage('analyze'):
+            metrics.count('commits', 3)
+        with metrics.stage('analyze'):
+            metrics.count('commits', 2)
+    with metrics.stage('total'):
+        pass
+
+    calls, wall, cpu = metrics.timings[('analyze', 'doc-a', 'dev')]
+    assert calls == 2
+    assert wall >= 0 and cpu >= 0
+    assert ('total', '', '') in metrics.timings
+    assert metrics.counters == {('commits', 'doc-a', 'dev'): 5}
+
+
+def test_stage_with_exception():
+    metrics = Metrics()
+    with pytest.raises(ValueError):
+        with metrics.stage('clone'):
+            raise ValueError
+    assert metrics.timings[('clone', '', '')][0] == 1
+
+
+def test_scope_in_concurrent_tasks():
+    metrics = Metrics()
+
+    async def task(section):
+        with metrics.scope(section):
+            await asyncio.sleep(0)
+            metrics.count('commits')
+
+    async def main():
+        await asyncio.gather(task('doc-a'), task('doc-b'))
+
+    asyncio.run(main())
+    assert metrics.counters == {('commits', 'doc-a', ''): 1, ('commits', 'doc-b', ''): 1}
+
+
+def test_merge_and_pickle():
+    metrics = Metrics()
+    with metrics.scope('doc-a'):
+        metrics.count('git-subprocesses', 2)
+        with metrics.stage('clone'):
+            pass
+    other = pickle.loads(pickle.dumps(metrics))
+    assert other.counters == metrics.counters
+
+    metrics.merge(other)
+    assert metrics.counters[('git-subprocesses', 'doc-a', '')] == 4
+    assert metrics.timings[('clone', 'doc-a', '')][0] == 2
+    # A snapshot is independent:
+    snapshot = metrics.snapshot()
+    metrics.clear()
+    assert not metrics.counters and snapshot.counters
+
+
+def test_todict_commits_per_second():
+    metrics = Metrics()
+    metrics.timings[('iter-commits', 'doc-a', 'dev')] = [1, 2.0, 1.0]
+    metrics.timings[('clone', 'doc-a', '')] = [1, 1.0, 1.0]
+    metrics.counters[('commits', 'doc-a', 'dev')] = 10
+    data = metrics.todict()
+    stages = {entry['stage']: entry for entry in data['stages']}
+    assert stages['iter-commits']['commits_per_second'] == 5.0
+    assert 'commits_per_second' not in stages['clone']
+    assert data['counters'] == [{'name': 'commits', 'section': 'doc-a', 'branch': 'dev', 'value': 10}]
+
+
+def test_toprometheus():
+    metrics = Metrics()
+    metrics.timings[('clone', 'doc "a"', '')] = [1, 2.5, 1.5]
+    text = metrics.toprometheus()
+    assert '# TYPE docstats_stage_wall_seconds gauge' in text
+    assert 'docstats_stage_wall_seconds{stage="clone",section="doc \\"a\\"",branch=""} 2.5' in text
+
+
+def test_instrument_counts_git(gitrepo):
+    _, repo = gitrepo
+    instrument(repo)
+    METRICS.clear()
+    repo.git.rev_list('HEAD')
+    assert METRICS.counters[('git-subprocesses', '', '')] == 1
+    assert METRICS.counters[('git-bytes', '', '')] > 0
+    METRICS.clear()
+
+
+def test_work_returns_metrics(gitrepo, tmpdir):
+    _, repo = gitrepo
+    branch = repo.active_branch.name
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'url': repo.git_dir, 'clone-mode': 'bare', 'branch': branch}})
+    metrics = work(config, tmpdir.strpath, jobs=2)
+
+    for stage in ('total', 'output'):
+        assert any(key[0] == stage for key in metrics.timings)
+    assert metrics.timings[('analyze', 'doc-a', branch)][0] == 1
+    assert metrics.counters[('commits', 'doc-a', branch)] > 0
+    assert metrics.counters[('git-subprocesses', 'doc-a', branch)] > 0
+
+    writemetrics(metrics, tmpdir.join('metrics.json').strpath)
+    data = json.loads(tmpdir.join('metrics.json').read())
+    assert {'stages', 'counters', 'timestamp'} <= set(data)
+    writeprometheus(metrics, tmpdir.join('docstats.prom').strpath)
+    assert 'docstats_last_run_timestamp_seconds' in tmpdir.join('docstats.prom').read()
+    METRICS.clear()
@@ -0,0 +1,69 @@
+#
+
+import git
+import os
+from configparser import ConfigParser
+
+from docstats.objectstore import addalternate, getobjectgroups, getstorepath
+from docstats.worker import work
+
+
+def test_getobjectgroups():
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'globals': {'object-group': 'auto'},
+                      'sle': {'url': 'git@github.com:SUSE/doc-sle.git'},
+                      'fork': {'url': 'https://github.com/tux/doc-sle'},
+                      # Same name, but another server:
+                      'other': {'url': 'https://gitlab.example.org/tux/doc-sle'},
+                      'shallow': {'url': 'https://github.com/wilber/doc-sle', 'clone-mode': 'shallow'},
+                      'alone': {'url': 'https://github.com/SUSE/doc-cap'},
+                      'caasp': {'url': 'https://github.com/SUSE/doc-caasp', 'object-group': 'caas'},
+                      'cap': {'url': 'https://github.com/SUSE/doc-cap-old', 'object-group': 'no'},
+                      })
+    urls = [(section, config.get(section, 'url')) for section in config.sections()]
+    assert getobjectgroups(config, urls) == {'sle': 'github.com-doc-sle', 'fork': 'github.com-doc-sle',
+                                             'caasp': 'caas'}
+    # Sharing is opt-in:
+    config.remove_option('globals', 'object-group')
+    assert getobjectgroups(config, urls) == {'caasp': 'caas'}
+
+
+def test_addalternate(tmpdir):
+    repo = git.Repo.init(tmpdir.join('doc-a').strpath)
+    store = tmpdir.join('store.git').strpath
+    assert addalternate(repo.working_tree_dir, store)
+    assert not addalternate(repo.working_tree_dir, store)
+    with open(os.path.join(repo.git_dir, 'objects', 'info', 'alternates')) as fh:
+        assert fh.read() == os.path.join(store, 'objects') + '\n'
+
+
+def test_work_with_shared_objects(gitrepo, tmpdir):
+    result, repo = gitrepo
+    branch = repo.active_branch.name
+    source = repo.clone(tmpdir.join('source.git').strpath, bare=True)
+    # Only the configured branches are fetched into the store:
+    source.create_head('unused', branch)
+    # file:// avoids the hardlinks of local clones
+    url = 'file://' + source.git_dir
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'globals': {'branch': branch, 'clone-mode': 'bare', 'update': 'yes', 'object-group': 'doc'},
+                      'doc-a': {'url': url}, 'doc-b': {'url': url}})
+    basedir = tmpdir.strpath
+    work(config, basedir, sections=['doc-a', 'doc-b'])
+
+    store = git.Repo(getstorepath(basedir, 'doc'))
+    assert {ref.name for ref in store.references} == {'doc-a/' + branch, 'doc-b/' + branch}
+    for section in ('doc-a', 'doc-b'):
+        clone = git.Repo(tmpdir.join(section).strpath)
+        with open(os.path.join(clone.git_dir, 'objects', 'info', 'alternates')) as fh:
+            assert fh.read().strip() == os.path.join(store.git_dir, 'objects')
+        # All objects are borrowed from the store
+        assert 'in-pack: 0' in clone.git.count_objects(v=True)
+        assert len(list(clone.iter_commits(branch))) == result['commits']
+
+    # The second run fetches and still gives the same results; refs of other branches are dropped:
+    store.git.update_ref('refs/remotes/doc-a/unused', 'refs/remotes/doc-a/' + branch)
+    work(config, basedir, sections=['doc-a', 'doc-b'])
+    assert {ref.name for ref in store.references} == {'doc-a/' + branch, 'doc-b/' + branch}
+    with open(tmpdir.join('doc-b.csv').strpath) as fh:
+        assert fh.read().splitlines()[1].split(',')[1] == str(result['commits'])
@@ -0,0 +1,59 @@
+#
+
+import pstats
+from configparser import ConfigParser
+
+from docstats.profiling import clearprofiles, getprofilefile, profiled, writesummary
+from docstats.worker import work
+
+
+def test_getprofilefile():
+    assert getprofilefile(None, 'main') is None
+    assert getprofilefile('/tmp/p', 'doc a', 'x/y') == '/tmp/p/doc_a+x_y@883b2a0c.pstats'
+    # Different sections and branches never share a profile:
+    names = [('doc-a', 'b'), ('doc', 'a-b'), ('doc', 'maint/15'), ('doc', 'maint_15'), ('doc', 'maint+15')]
+    assert len({getprofilefile('/tmp/p', *parts) for parts in names}) == len(names)
+
+
+def test_profiled(tmpdir):
+    filename = getprofilefile(tmpdir.join('prof').strpath, 'main')
+    with profiled(filename) as profiler:
+        sorted(range(1000), key=str)
+    assert profiler is not None
+    stats = pstats.Stats(filename)
+    assert stats.total_calls > 0
+
+    with profiled(None) as profiler:
+        assert profiler is None
+
+
+def test_writesummary(tmpdir):
+    assert writesummary(tmpdir.strpath) is None
+    for name in ('a', 'b'):
+        with profiled(getprofilefile(tmpdir.strpath, name)):
+            sorted(range(100), key=str)
+    filename = writesummary(tmpdir.strpath, top=5)
+    content = open(filename).read()
+    assert content.startswith("Merged 2 profiles")
+    assert "Ordered by: cumulative time" in content
+    assert "Ordered by: internal time" in content
+
+    # The profiles of an earlier run are not merged again:
+    clearprofiles(tmpdir.strpath)
+    assert writesummary(tmpdir.strpath) is None
+    assert not tmpdir.join('summary.txt').check()
+
+
+def test_work_with_profile(gitrepo, tmpdir):
+    _, repo = gitrepo
+    branch = repo.active_branch.name
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'url': repo.git_dir, 'clone-mode': 'bare', 'branch': branch}})
+    profiledir = tmpdir.join('prof')
+    # Like main(), the forked jobs inherit the running profiler of the main process:
+    with profiled(getprofilefile(profiledir.strpath, 'main')):
+        work(config, tmpdir.strpath, jobs=2, profiledir=profiledir.strpath)
+
+    assert profiledir.join('main.pstats').check()
+    assert profiledir.join('doc-a.pstats').check()
+    assert profiledir.join('doc-a+{}.pstats'.format(branch)).check()
@@ -4,16 +4,24 @@ import git
 import pytest
 import sys
 
-from docstats.repo import (cleanup_dict,
+from configparser import ConfigParser
+from docstats.aggregate import BranchStats
+from docstats.repo import (analyze,
                            if_range_is_empty,
                            collect_committers,
                            collect_diffstats,
                            collect_issues,
+                           extract,
+                           iter_records,
+                           prime_cache,
+                           getrange,
+                           getrevargs,
+                           resolve_ref,
                            iter_commits,
-                           init_stats_dict,
-                           init_tracker_dict,
-                           init_committer_dict,
                            )
+from docstats.cache import CommitCache
+from docstats.gitlog import CommitRecord, iter_log
+from docstats.team import TeamDirectory
 from docstats.tracker import TRACKERS
 from unittest.mock import patch, MagicMock, Mock, PropertyMock
 
@@ -33,23 +41,6 @@ skip_below_py345 = pytest.mark.skipif((sys.version_info.major,
 #    print("Git-Repo:", gitrepo)
 
 
-def test_init_committer_dict():
-    resultdict = init_committer_dict()
-    assert len(resultdict) == 4
-    assert not all(resultdict.values())
-
-
-def test_init_tracker_dict():
-    resultdict = init_tracker_dict()
-    assert len(TRACKERS) == len(resultdict)
-    assert not all(resultdict.values())
-
-
-def test_init_stats_dict():
-    resultdict = init_stats_dict()
-    assert not all(resultdict.values())
-
-
 @patch('docstats.worker.git.Repo')
 def test_if_range_is_empty_with_False(mock_repo):
     def yield_empty():
@@ -70,41 +61,30 @@ def test_if_range_is_empty_with_True(mock_repo):
 
 @pytest.mark.parametrize('user,expected', [
     #
-    (git.Actor('Tux Penguin', 'tux@example.org'),
-     {'team-committers': ['tux@example.org'],
-      'team-committers-mails': ['tux@example.org'],
-      'external-committers': [],
-      'external-committers-mails': []}),
+    (git.Actor('Tux Penguin', 'Tux@example.org'),
+     {'team-committers': {'tux@example.org': 2},
+      'external-committers': {}}),
     #
     (git.Actor('Wilber Gimp', 'wilber@example.net'),
-     {'team-committers': [],
-      'team-committers-mails': [],
-      'external-committers': ['wilber@example.net'],
-      'external-committers-mails': ['wilber@example.net']}
+     {'team-committers': {},
+      'external-committers': {'wilber@example.net': 2}}
     ),
 ])
 def test_collect_committers(user, expected):
-    binsha = b'\x12' * 20
-    commit = git.Commit('fake-repo', binsha,
-                        author=user, committer=user,
-                        message="fake commit message")
-    dictresult = {'team-committers': [], 'team-committers-mails': [],
-                  'external-committers': [], 'external-committers-mails': []}
-    collect_committers(commit, dictresult,
-                       {'tux@example.org': 'tux@example.org',
-                       })
-    assert dictresult == expected
+    commit = CommitRecord('12' * 20, user.email, "fake commit message", {}, ())
+    stats = BranchStats()
+    team = TeamDirectory.fromtext('tux@example.org')
+    collect_committers(commit, stats, team)
+    collect_committers(commit, stats, team)
+    assert stats.committers == expected
 
 
 def test_collect_diffstats():
-    dictresult = init_stats_dict()
+    result = BranchStats()
     stats = {'deletions': 1, 'files': 1, 'insertions': 1, 'lines': 2}
-    # See https://docs.python.org/3/library/unittest.mock.html#unittest.mock.PropertyMock
-    mock_commit = MagicMock(spec=git.Commit)
-    p = PropertyMock(return_value=stats)
-    type(mock_commit.stats).total = p
-    collect_diffstats(mock_commit, dictresult)
-    assert dictresult == stats
+    commit = CommitRecord('12' * 20, 'tux@example.org', "fake commit message", stats, ())
+    collect_diffstats(commit, result)
+    assert result.diffstats == stats
 
 
 @pytest.mark.parametrize('msg,expected', [
@@ -131,12 +111,15 @@ def test_collect_diffstats():
     ('Resolves #123', {'gh': ['123']}),
 ])
 def test_collect_issues(msg, expected):
-    dictresult = init_tracker_dict().copy()
-    collect_issues(msg, dictresult)
-    diffkeys = expected.keys() & dictresult.keys()
+    stats = BranchStats()
+    commit = extract(CommitRecord('12' * 20, 'tux@example.org', msg, {}, None))
+    collect_issues(commit, stats)
+    # Duplicates are collapsed:
+    collect_issues(commit, stats)
+    diffkeys = expected.keys() & stats.issues.keys()
 
     for key in diffkeys:
-        assert dictresult[key] == expected[key]
+        assert sorted(stats.issues[key]) == expected[key]
 
 
 # @patch('docstats.repo.configparser.ConfigParser')
@@ -156,9 +139,7 @@ def test_iter_commits():
     dictresult[name]['branch'] = branchname
     dictresult[name]['start'] = str(start)
     dictresult[name]['end'] = str(end)
-    dictresult = init_tracker_dict().copy()
-    dictresult.update(init_stats_dict())
-    dictresult.update(init_committer_dict())
+    dictresult = {name: BranchStats()}
 
     # Mock configparser.ConfigParser
     mock_config = Mock()
@@ -180,19 +161,188 @@ def test_iter_commits():
     #assert result
 
 
-def test_cleanup_dict():
-    #
-    teams =  ('team-committers', 'external-committers',
-              # These are just for debugging purposes:
-              'team-committers-mails', 'external-committers-mails')
-    resultdict = {}
-    resultdict['A'] = init_tracker_dict()
-    resultdict['A']['bsc'].extend(['123', '123'])
-
-    for item in teams:
-        resultdict['A'][item] = ['a', 'a', 'b']
-
-    cleanup_dict(resultdict)
-    assert len(resultdict['A']['bsc']) == 1
-    for item in teams:
-        assert resultdict['A'][item] == 2
+@pytest.mark.parametrize('start,end,expected', [
+    ('', '', 'origin/develop'),
+    ('abc', '', 'abc..origin/develop'),
+    ('', 'def', 'origin/develop..def'),
+    ('abc', 'def', 'abc..def'),
+])
+def test_getrange(start, end, expected):
+    assert getrange('origin/develop', start, end) == expected
+
+
+def test_resolve_ref(gitrepo):
+    _, repo = gitrepo
+    branchname = repo.active_branch.name
+    assert resolve_ref(repo, branchname) == branchname
+    assert resolve_ref(repo, 'does-not-exist') is None
+
+
+def test_analyze_with_unknown_ref(gitrepo):
+    result, repo = gitrepo
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'fake': {'branches': 'good {}\nbad does-not-exist'.format(repo.active_branch.name)}})
+
+    data = analyze(repo, config, section='fake')
+    assert data['good']['commits'] == result['commits']
+    assert data['bad'] == {'error': "unknown ref 'does-not-exist'"}
+
+
+def test_iter_records_with_cache(gitrepo, tmpdir):
+    result, repo = gitrepo
+    expected = [extract(commit) for commit in iter_log(repo, 'HEAD')]
+
+    with CommitCache(tmpdir.join('cache.sqlite').strpath) as cache:
+        assert list(iter_records(repo, 'HEAD', cache)) == expected
+        assert len(cache) == result['commits']
+
+        # Second run: Everything comes from the cache, only the message is missing
+        with patch('docstats.backends.gitpython.iter_log') as mock_log:
+            records = list(iter_records(repo, 'HEAD', cache))
+        assert not mock_log.called
+        assert records == [commit._replace(message=None) for commit in expected]
+
+
+@patch('docstats.repo._BATCHSIZE', 2)
+def test_iter_records_in_batches(gitrepo, tmpdir):
+    result, repo = gitrepo
+    expected = [extract(commit) for commit in iter_log(repo, 'HEAD')]
+
+    with CommitCache(tmpdir.join('cache.sqlite').strpath) as cache:
+        with patch.object(cache, 'get', wraps=cache.get) as mock_get:
+            records = iter_records(repo, 'HEAD', cache)
+            # The first batch is yielded before the second one is looked up:
+            assert [next(records), next(records)] == expected[:2]
+            assert mock_get.call_count == 1
+            assert list(records) == expected[2:]
+        assert mock_get.call_count == -(-result['commits'] // 2)
+
+
+def test_analyze_with_watermarks(tmpdir):
+    source = git.Repo.init(tmpdir.join('doc-a').strpath)
+    tux = git.Actor('Tux Penguin', 'tux@example.org')
+    branch = source.active_branch.name
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'branch': branch}})
+
+    def commit(message):
+        source.index.commit(message, committer=tux, author=tux)
+        return analyze(source, config)[branch]
+
+    assert commit("Fix bsc#11")['commits'] == 1
+    with patch('docstats.repo.iter_commits', wraps=iter_commits) as mock_iter:
+        result = commit("Fix bsc#12")
+    # Only the new commit was walked
+    assert mock_iter.call_args[0][5] != ''
+    assert result['commits'] == 2
+    assert sorted(result['bsc']) == ['11', '12']
+
+    # Rewrite the history: the last head is no ancestor anymore
+    source.head.reset('HEAD~1', index=True, working_tree=True)
+    result = commit("Fix bsc#13")
+    assert result['commits'] == 2
+    assert sorted(result['bsc']) == ['11', '13']
+
+
+def test_analyze_with_watermarks_and_start_date(tmpdir):
+    source = git.Repo.init(tmpdir.join('doc-a').strpath)
+    tux = git.Actor('Tux Penguin', 'tux@example.org')
+    branch = source.active_branch.name
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'branch': branch, 'start': '2017-01-01'}})
+
+    def commit(message, date):
+        source.index.commit(message, committer=tux, author=tux,
+                            author_date=date + "+0000", commit_date=date + "+0000")
+        return analyze(source, config)[branch]
+
+    commit("Fix bsc#10", "2016-12-01T12:00:00")
+    assert commit("Fix bsc#11", "2017-01-25T12:00:00")['commits'] == 1
+    with patch('docstats.repo.iter_commits', wraps=iter_commits) as mock_iter:
+        # An absolute date never moves, so only the new commits are walked, still since the date:
+        result = commit("Fix bsc#12", "2016-12-24T12:00:00")
+        result = commit("Fix bsc#13", "2017-02-01T12:00:00")
+    assert mock_iter.call_args[0][5] != '2017-01-01'
+    assert mock_iter.call_args[1]['since'] == '2017-01-01'
+    assert result['commits'] == 2
+    assert result['bsc'] == ('11', '13')
+
+
+def test_prime_cache(gitrepo):
+    result, repo = gitrepo
+    branch = repo.active_branch.name
+    branches = [('all', branch, '', ''),
+                ('older', branch, '', 'HEAD~1'),
+                ('bad', 'does-not-exist', '', ''),
+                ]
+    with CommitCache(':memory:') as cache:
+        with patch('docstats.backends.gitpython.iter_log', wraps=iter_log) as mock_log:
+            assert prime_cache(repo, branches, cache) == result['commits']
+            assert mock_log.call_count == 1
+            assert prime_cache(repo, branches, cache) == 0
+            assert mock_log.call_count == 1
+        assert len(cache) == result['commits']
+
+
+def test_analyze_with_periods(tmpdir):
+    source = git.Repo.init(tmpdir.join('doc-a').strpath)
+    tux = git.Actor('Tux Penguin', 'tux@example.org')
+    branch = source.active_branch.name
+    for message, date in (("Fix bsc#11", "2017-01-25T12:00:00"),
+                          ("Fix bsc#12", "2017-02-01T12:00:00"),
+                          ("Fix bsc#13", "2017-04-01T12:00:00")):
+        source.index.commit(message, committer=tux, author=tux,
+                            author_date=date + "+0000", commit_date=date + "+0000")
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'branch': branch, 'period': 'quarter'}})
+
+    result = analyze(source, config)[branch]
+    assert result['commits'] == 3
+    assert list(result['periods']) == ['2017-Q1', '2017-Q2']
+    assert result['periods']['2017-Q1']['bsc'] == ('11', '12')
+    assert result['periods']['2017-Q1']['committer-commits'] == {'tux@example.org': 2}
+
+    # A changed period invalidates the watermark:
+    config.set('doc-a', 'period', 'month')
+    result = analyze(source, config)[branch]
+    assert list(result['periods']) == ['2017-01', '2017-02', '2017-04']
+
+
+@pytest.mark.parametrize('start,end,expected', [
+    ('', '', ['origin/develop']),
+    ('abc', '', ['abc..origin/develop']),
+    ('2017-01-25', '', ['origin/develop', '--since=2017-01-25 00:00:00']),
+    ('abc', '2.weeks.ago', ['abc..origin/develop', '--until=2.weeks.ago']),
+    # A start date with an end revision walks the end revision only:
+    ('2019-01-01', 'v1', ['v1', '--since=2019-01-01 00:00:00']),
+])
+def test_getrevargs(start, end, expected):
+    assert getrevargs('origin/develop', start, end) == expected
+
+
+@pytest.mark.parametrize('cache', ['yes', 'no'])
+def test_analyze_with_dates(cache, tmpdir):
+    source = git.Repo.init(tmpdir.join('doc-a').strpath)
+    tux = git.Actor('Tux Penguin', 'tux@example.org')
+    branch = source.active_branch.name
+    for message, date in (("Fix bsc#11", "2017-01-25T12:00:00"),
+                          ("Fix bsc#12", "2017-02-01T12:00:00"),
+                          ("Fix bsc#13", "2017-04-01T12:00:00")):
+        source.index.commit(message, committer=tux, author=tux,
+                            author_date=date + "+0000", commit_date=date + "+0000")
+    source.create_tag('v2', 'HEAD~1')
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'cache': cache,
+                                'branches': 'since {0} 2017-02-01..\n'
+                                            'until {0} ..2017-03-01\n'
+                                            'both {0} 2017-01-01..2017-03-01\n'
+                                            'tagged {0} 2017-01-01..v2\n'
+                                            'recent {0} 10.days..'.format(branch)}})
+
+    for _ in range(2):
+        result = analyze(source, config)
+        assert result['since']['bsc'] == ('12', '13')
+        assert result['until']['bsc'] == ('11', '12')
+        assert result['both']['commits'] == 2
+        assert result['tagged']['bsc'] == ('11', '12')
+        assert result['recent']['commits'] == 0
@@ -0,0 +1,104 @@
+#
+
+import csv
+import json
+import pytest
+import sqlite3
+from configparser import ConfigParser
+
+from docstats.report import getreportformat, openreport
+from docstats.result import BranchResult
+from docstats.worker import work
+
+
+RESULT = {'dev': BranchResult({'branch': 'develop', 'commits': 2, 'insertions': 3, 'deletions': 1, 'lines': 4,
+                  'files': 2, 'fate': [], 'bsc': ['1', '2'], 'trello': [], 'gh': ['3'],
+                  'team-committers': 1, 'external-committers': 0}),
+          'bad': BranchResult.failed("unknown ref 'nope'"),
+          }
+
+
+@pytest.mark.parametrize('filename,expected', [
+    ('report.jsonl', 'jsonl'),
+    ('report.CSV', 'csv'),
+    ('report.sqlite', 'sqlite'),
+    ('report.db', 'sqlite'),
+])
+def test_getreportformat(filename, expected):
+    assert getreportformat(filename) == expected
+
+
+def test_getreportformat_unknown():
+    with pytest.raises(ValueError):
+        getreportformat('report.txt')
+
+
+def test_jsonl_report(tmpdir):
+    filename = tmpdir.join('report.jsonl')
+    with openreport(filename.strpath) as report:
+        report.add('doc-a', RESULT)
+        # Complete sections are readable while the run goes on:
+        assert len(tmpdir.join('report.jsonl.part').readlines()) == 2
+        report.add('doc-b', {'dev': RESULT['dev']})
+    assert not tmpdir.join('report.jsonl.part').check()
+    lines = [json.loads(line) for line in filename.readlines()]
+    assert [(line['section'], line['name']) for line in lines] == [('doc-a', 'dev'), ('doc-a', 'bad'),
+                                                                   ('doc-b', 'dev')]
+    assert lines[0]['bsc'] == ['1', '2']
+
+
+def test_csv_report(tmpdir):
+    filename = tmpdir.join('report.csv')
+    with openreport(filename.strpath) as report:
+        report.add('doc-a', RESULT)
+    rows = list(csv.DictReader(filename.open()))
+    assert rows[0]['section'] == 'doc-a'
+    assert rows[0]['release'] == 'dev'
+    assert rows[0]['bsc'] == '2'
+    assert rows[1]['error'] == "unknown ref 'nope'"
+
+
+def test_csv_report_line_endings(tmpdir):
+    filename = tmpdir.join('report.csv')
+    with openreport(filename.strpath) as report:
+        report.add('doc-a', {'bad': BranchResult.failed("fatal: bad revision\nusage: git log")})
+    content = filename.read_binary()
+    assert content.count(b'\r\n') == 2
+    assert b'\r\r\n' not in content
+    with open(filename.strpath, newline='') as fh:
+        assert next(csv.DictReader(fh))['error'] == "fatal: bad revision\nusage: git log"
+
+
+def test_sqlite_report(tmpdir):
+    filename = tmpdir.join('report.sqlite')
+    with openreport(filename.strpath) as report:
+        report.add('doc-a', RESULT)
+    connection = sqlite3.connect(filename.strpath)
+    rows = connection.execute("SELECT section, name, bsc, team_committers, error FROM branches "
+                              "ORDER BY name").fetchall()
+    assert rows == [('doc-a', 'bad', None, None, "unknown ref 'nope'"), ('doc-a', 'dev', 2, 1, None)]
+
+
+def test_report_interrupted(tmpdir):
+    filename = tmpdir.join('report.jsonl')
+    with pytest.raises(KeyboardInterrupt):
+        with openreport(filename.strpath) as report:
+            report.add('doc-a', RESULT)
+            raise KeyboardInterrupt
+    assert not filename.check()
+    assert len(tmpdir.join('report.jsonl.part').readlines()) == 2
+
+
+def test_work_with_report(gitrepo, tmpdir):
+    result, repo = gitrepo
+    branch = repo.active_branch.name
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'url': repo.git_dir, 'branch': branch},
+                      'doc-b': {'url': repo.git_dir, 'branch': branch},
+                      })
+    filename = tmpdir.join('report.csv')
+    with openreport(filename.strpath) as report:
+        work(config, tmpdir.strpath, jobs=2, report=report)
+    rows = list(csv.DictReader(filename.open()))
+    assert sorted(row['section'] for row in rows) == ['doc-a', 'doc-b']
+    assert all(int(row['commits']) == result['commits'] for row in rows)
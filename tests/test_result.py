@@ -0,0 +1,80 @@
+#
+
+import json
+import pickle
+import pytest
+
+from docstats.aggregate import BranchStats
+from docstats.gitlog import CommitRecord, LogScope
+from docstats.result import FIELDS, BranchResult, jsondefault, mergeids
+from docstats.tracker import TRACKERS
+
+
+def makestats(*issues, period=None):
+    stats = BranchStats(period)
+    for idx, bsc in enumerate(issues):
+        commit = CommitRecord('{:040x}'.format(idx), 'tux@example.org', None, None, None, 1485302400, 1485302400)
+        stats.commits += 1
+        stats.issues['bsc'].add(bsc)
+        stats.committers['team-committers'][commit.email] += 1
+        bucket = stats.getbucket(commit)
+        if bucket is not None:
+            bucket.commits += 1
+            bucket.issues['bsc'].add(bsc)
+    return stats
+
+
+def test_views():
+    result = BranchResult.fromstats(makestats('2', '1', '2'), 'develop', 'v1')
+    assert result.error is None
+    assert result['branch'] == 'develop' and result['start'] == 'v1' and result['end'] == ''
+    assert result['bsc'] == ('1', '2')
+    assert result.ids == dict({tracker: frozenset() for tracker in TRACKERS}, bsc={'1', '2'})
+    assert list(result.counts) == list(FIELDS)
+    assert result.counts['commits'] == 3
+    assert result.counts['bsc'] == 2
+    assert result.counts['team-committers'] == 1
+
+
+def test_scope():
+    scope = LogScope(firstparent=True, renames=50)
+    result = BranchResult.fromstats(makestats('1'), 'develop', scope=scope)
+    assert result['scope']['renames'] == 50
+    assert json.loads(json.dumps(result, default=jsondefault))['scope'] == scope.todict()
+    assert pickle.loads(pickle.dumps(result)) == result
+    assert 'scope' not in BranchResult.fromstats(makestats('1'), 'develop')
+
+
+def test_immutable():
+    result = BranchResult.fromstats(makestats('1'), 'develop')
+    with pytest.raises(TypeError):
+        result['commits'] = 2
+    with pytest.raises(TypeError):
+        result['committer-commits']['tux@example.org'] = 2
+    with pytest.raises(AttributeError):
+        result.ids['bsc'].add('2')
+    with pytest.raises(AttributeError):
+        result.error = 'broken'
+
+
+def test_failed():
+    result = BranchResult.failed("unknown ref 'nope'")
+    assert result == {'error': "unknown ref 'nope'"}
+    assert result.error == "unknown ref 'nope'"
+    assert result.counts == {} and result.ids == {}
+
+
+def test_json_and_pickle():
+    result = BranchResult.fromstats(makestats('1', '2', period='month'), 'develop')
+    assert isinstance(result['periods']['2017-01'], BranchResult)
+    data = json.loads(json.dumps({'dev': result}, default=jsondefault))
+    assert data['dev']['bsc'] == ['1', '2']
+    assert data['dev']['periods']['2017-01']['commits'] == 2
+    assert BranchResult(data['dev']) == result
+    assert pickle.loads(pickle.dumps(result)) == result
+
+
+def test_mergeids():
+    results = [BranchResult.fromstats(makestats('1', '2'), 'a'), BranchResult.failed('broken'),
+               BranchResult.fromstats(makestats('2', '3'), 'b')]
+    assert mergeids(results)['bsc'] == {'1', '2', '3'}
@@ -0,0 +1,87 @@
+#
+
+import pickle
+import pytest
+from configparser import ConfigParser
+
+from docstats.team import TeamDirectory, parsemailmap
+
+
+TEAMMAILS = """# primary mail [additional mails...]
+    tux@example.org Tux.Penguin@Example.NET
+    wilber@example.org
+"""
+
+MAILMAP = """# A comment
+Tux Penguin <tux@example.org>
+Tux Penguin <tux@example.org> <tux@users.noreply.github.com>
+<wilber@example.org> Wilber <WILBER@gimp.org>
+Geeko <geeko@example.com> <lizard@example.com>
+"""
+
+
+@pytest.mark.parametrize('text,expected', [
+    #
+    ('', []),
+    #
+    ('Tux <tux@example.org>', []),
+    #
+    (MAILMAP, [('tux@example.org', 'tux@users.noreply.github.com'),
+               ('wilber@example.org', 'wilber@gimp.org'),
+               ('geeko@example.com', 'lizard@example.com')]),
+])
+def test_parsemailmap(text, expected):
+    assert parsemailmap(text) == expected
+
+
+@pytest.mark.parametrize('mail,expected', [
+    #
+    ('tux@example.org', ('tux@example.org', True)),
+    #
+    ('TUX@example.org', ('tux@example.org', True)),
+    #
+    ('tux.penguin@example.net', ('tux@example.org', True)),
+    # from mailmap
+    ('tux@users.noreply.github.com', ('tux@example.org', True)),
+    #
+    ('Wilber@Gimp.org', ('wilber@example.org', True)),
+    # External committers are also resolved by the mailmap
+    ('lizard@example.com', ('geeko@example.com', False)),
+    #
+    ('nobody@example.com', ('nobody@example.com', False)),
+])
+def test_resolve(mail, expected):
+    team = TeamDirectory.fromtext(TEAMMAILS, MAILMAP)
+    assert team.resolve(mail) == expected
+
+
+def test_mapping():
+    team = TeamDirectory.fromtext(TEAMMAILS)
+    assert dict(team) == {'tux@example.org': 'tux@example.org',
+                          'tux.penguin@example.net': 'tux@example.org',
+                          'wilber@example.org': 'wilber@example.org'}
+    assert team['Tux.Penguin@example.net'] == 'tux@example.org'
+    assert team.team == {'tux@example.org', 'wilber@example.org'}
+    with pytest.raises(TypeError):
+        team['geeko@example.com'] = 'geeko@example.com'
+
+
+def test_pickle():
+    team = TeamDirectory.fromtext(TEAMMAILS, MAILMAP)
+    other = pickle.loads(pickle.dumps(team))
+    assert dict(other) == dict(team)
+    assert other.team == team.team
+    assert other.fingerprint == team.fingerprint
+
+
+def test_fingerprint():
+    assert TeamDirectory.fromtext(TEAMMAILS).fingerprint != TeamDirectory.fromtext(TEAMMAILS, MAILMAP).fingerprint
+
+
+def test_fromconfig(tmpdir):
+    mailmap = tmpdir.join('.mailmap')
+    mailmap.write(MAILMAP)
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'globals': {'team-mails': TEAMMAILS, 'mailmap': mailmap.strpath}})
+    team = TeamDirectory.fromconfig(config)
+    assert team.resolve('lizard@example.com') == ('geeko@example.com', False)
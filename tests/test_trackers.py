@@ -13,6 +13,7 @@ from unittest.mock import patch
 #                            findcommits,
 #                            )
 
+from docstats.tracker import TRACKER_FUNCS, findbugid
 from docstats.tracker.github import github
 from docstats.tracker.fate import fate
 from docstats.tracker.trello import trello
@@ -135,3 +136,41 @@ def test_trello(text, expected):
 ])
 def test_fate(text, expected):
     assert list(fate(text)) == expected
+
+
+@pytest.mark.parametrize('text,expected', [
+    #
+    ('the quick brown fox', []),
+    #
+    ('Closes tux/example_repo#76', [('gh', 'tux/example_repo#76')]),
+    #
+    ('fix #1 and fix tux/example_repo#2', [('gh', '1'), ('gh', 'tux/example_repo#2')]),
+])
+def test_github_with_other_repos(text, expected):
+    assert list(github(text)) == expected
+
+
+@pytest.mark.parametrize('text', [
+    'the quick brown fox',
+    'Fix bnc#1234, bsc #2345 and BSC#3456',
+    'fix #123, closes tux/example_repo#76 and resolved #5',
+    'see fate#123, Fate #345, https://fate.suse.com/3456 and FATE#5678',
+    'Fix trello#123, https://trello.com/c/V9Y2u46g and https://trello.com/b/cjXBA50P/sle',
+    'Fixes fate#123, fixes bsc#1234, closes trello#42\n\nResolves #9 for https://fate.suse.com/1',
+])
+def test_findbugid_is_same_as_single_trackers(text):
+    expected = [item for func in TRACKER_FUNCS for item in func(text)]
+    assert sorted(findbugid(text)) == sorted(expected)
+
+
+def test_findbugid_keeps_order():
+    assert list(findbugid('trello#1234 fixes #1 fate#2 bsc#12')) == [('trello', '1234'),
+                                                                      ('gh', '1'),
+                                                                      ('fate', '2'),
+                                                                      ('bsc', '12')]
+
+
+def test_findbugid_without_candidates():
+    with patch('docstats.tracker.SCANNER_REGEX') as mock_regex:
+        assert list(findbugid('Update the fate and the bsc chapter')) == []
+    assert not mock_regex.finditer.called
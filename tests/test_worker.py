@@ -1,9 +1,16 @@
 #
 
-from unittest.mock import patch, Mock, MagicMock
-from docstats.worker import clone_repo, clone_and_analyze, tracker2int
-from docstats.repo import init_tracker_dict
-from docstats.tracker import TRACKERS
+import asyncio
+import git
+import json
+import pytest
+from configparser import ConfigParser
+from unittest.mock import patch, Mock
+from docstats.worker import (clone_repo, clone_repo_async, getcloneoptions,
+                             output_result, work)
+from docstats.aggregate import BranchStats
+from docstats.repo import analyze_branch, resolve_ref
+from docstats.result import BranchResult
 
 
 @patch('docstats.worker.os.path.exists')
@@ -26,28 +33,173 @@ def test_clone_repo(mock_repo, mock_path, gitrepo):
 
 
 
-def test_tracker2int():
-    data = {}
-    data['a'] = init_tracker_dict()
-    tracker2int(data)
-    assert data['a'] == {key: 0  for key in TRACKERS}
+def test_output_result(tmpdir):
+    repo = Mock(working_tree_dir=tmpdir.join('doc-a').strpath)
+    data = BranchStats().todict()
+    data['bsc'] = ['1', '2']
+    result = {'a': BranchResult(data), 'b': BranchResult.failed('unknown ref')}
+    output_result(repo, result)
+    # The IDs are kept for the caller:
+    assert result['a']['bsc'] == ('1', '2')
+    with open(repo.working_tree_dir + '.json') as fh:
+        assert json.load(fh)['a']['bsc'] == ['1', '2']
+    with open(repo.working_tree_dir + '.csv', 'rb') as fh:
+        content = fh.read()
+    assert content.count(b'\r\n') == 2 and b'\r\r\n' not in content
+    lines = content.decode('utf-8').splitlines()
+    assert len(lines) == 2
+    assert lines[1].split(',')[:7] == ['a', '0', '0', '0', '0', '0', '2']
 
 
-#@patch('docstats.repo.analyze')
-#@patch('docstats.worker.clone_repo')
-#def test_clone_and_analyze(mock_clone, mock_analyze):
-#    # clone_and_analyze(url, gitdir, config)
-#    mock_clone.return_value = MagicMock()# 'fake-url'
-#    mock_clone.mock_add_spec(git.Repo)
-#    mock_clone.heads.__getitem__.return_value = 'develop'
-#    mock_clone.head.return_value = 'develop'
-#    mock_clone.iter_commits.return_value = ['a', 'b']
-#
-#    mock_analyze.return_value = "repo_result"
-#    config = Mock()
-#
-#    # with patch.object()
-#    result = clone_and_analyze("fake-url", os.path.join(PYTESTTMPDIR, SECTION), config)
-#    assert mock_clone.called
-#    assert mock_analyze.called
+@pytest.mark.parametrize('values,expected', [
+    #
+    ({}, []),
+    #
+    ({'clone-mode': 'full'}, []),
+    #
+    ({'clone-mode': 'bare'}, ['--bare']),
+    #
+    ({'clone-mode': 'blobless'}, ['--bare', '--filter=blob:none']),
+    # Start revisions are no dates, so the whole history is cloned
+    ({'clone-mode': 'shallow', 'branches': 'a develop abc..'}, ['--bare']),
+    #
+    ({'clone-mode': 'shallow', 'branches': 'a develop abc..', 'shallow-since': '2017-01-01'},
+     ['--bare', '--shallow-since=2017-01-01', '--no-single-branch']),
+    #
+    ({'clone-mode': 'shallow', 'branches': 'a develop 2017-03-01..\nb maint/b 2016-12-24..'},
+     ['--bare', '--shallow-since=2016-12-24', '--no-single-branch']),
+    # Relative dates are passed to git, the earliest one wins
+    ({'clone-mode': 'shallow', 'branches': 'a develop 90.days..\nb maint/b 2.years..'},
+     ['--bare', '--shallow-since=2.years', '--no-single-branch']),
+])
+def test_getcloneoptions(values, expected):
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': values})
+    assert getcloneoptions(config, 'doc-a') == expected
+
+
+def test_getcloneoptions_with_unknown_mode():
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'globals': {'clone-mode': 'fancy'}, 'doc-a': {}})
+    with pytest.raises(ValueError):
+        getcloneoptions(config, 'doc-a')
+
+
+@pytest.mark.parametrize('mode', ['bare', 'blobless'])
+def test_clone_repo_without_worktree(mode, gitrepo, tmpdir):
+    result, repo = gitrepo
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'clone-mode': mode}})
+    gitdir = tmpdir.join('doc-a').strpath
+
+    clone = clone_repo('file://' + repo.working_tree_dir, gitdir, getcloneoptions(config, 'doc-a'))
+    assert clone.bare
+    assert len(list(clone.iter_commits(repo.active_branch.name))) == result['commits']
+
+
+@pytest.mark.parametrize('mode', ['full', 'bare'])
+def test_clone_repo_with_update(mode, tmpdir):
+    source = git.Repo.init(tmpdir.join('source').strpath)
+    tux = git.Actor('Tux Penguin', 'tux@example.org')
+    source.index.commit("First commit", committer=tux, author=tux)
+    branch = source.active_branch.name
+
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'clone-mode': mode}})
+    gitdir = tmpdir.join('doc-a').strpath
+    clone = clone_repo(source.git_dir, gitdir, getcloneoptions(config, 'doc-a'))
+    ref = resolve_ref(clone, branch)
+
+    source.index.commit("Second commit", committer=tux, author=tux)
+    # Without branches, the existing clone is used as it is:
+    assert clone_repo(source.git_dir, gitdir).commit(ref) != source.head.commit
+    clone = clone_repo(source.git_dir, gitdir, branches=[branch])
+    assert clone.commit(ref) == source.head.commit
+
+
+def test_work(gitrepo, tmpdir):
+    result, repo = gitrepo
+    branch = repo.active_branch.name
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'url': repo.git_dir,
+                                'clone-mode': 'bare',
+                                'branches': 'all {0}\nnone {0} HEAD..\nbad does-not-exist'.format(branch)},
+                      'doc-b': {'url': repo.git_dir,
+                                'branch': branch},
+                      })
+    work(config, tmpdir.strpath, jobs=2)
+
+    for section in ('doc-a', 'doc-b'):
+        data = json.loads(tmpdir.join(section + '.json').read())
+        assert tmpdir.join(section + '.csv').check()
+    assert list(data) == [branch]
+    assert data[branch]['commits'] == result['commits']
+
+    data = json.loads(tmpdir.join('doc-a.json').read())
+    assert list(data) == ['all', 'none', 'bad']
+    assert data['all']['commits'] == result['commits']
+    assert data['none']['commits'] == 0
+    assert 'error' in data['bad']
+
+
+@pytest.mark.parametrize('mode', ['full', 'bare', 'shallow'])
+def test_clone_repo_async(mode, tmpdir):
+    source = git.Repo.init(tmpdir.join('source').strpath)
+    tux = git.Actor('Tux Penguin', 'tux@example.org')
+    source.index.commit("First commit", committer=tux, author=tux, commit_date="2017-01-20T12:00:00")
+    source.index.commit("Second commit", committer=tux, author=tux, commit_date="2017-01-25T12:00:00")
+    branch = source.active_branch.name
+
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'clone-mode': mode, 'shallow-since': '2017-01-24'}})
+    gitdir = tmpdir.join('doc-a').strpath
+    url = 'file://' + source.git_dir
+    asyncio.run(clone_repo_async(url, gitdir, getcloneoptions(config, 'doc-a')))
+    clone = git.Repo(gitdir)
+    ref = resolve_ref(clone, branch)
+    assert clone.commit(ref) == source.head.commit
+
+    source.index.commit("Third commit", committer=tux, author=tux)
+    asyncio.run(clone_repo_async(url, gitdir))
+    assert clone.commit(ref) != source.head.commit
+    asyncio.run(clone_repo_async(url, gitdir, branches=[branch]))
+    assert clone.commit(ref) == source.head.commit
+
+
+def test_clone_repo_async_fails(tmpdir):
+    with pytest.raises(git.GitCommandError):
+        asyncio.run(clone_repo_async(tmpdir.join('nothing').strpath, tmpdir.join('doc-a').strpath))
+
+
+def test_work_with_failing_branch(gitrepo, tmpdir):
+    result, repo = gitrepo
+    branch = repo.active_branch.name
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'url': repo.git_dir, 'branches': 'broken {0}\ngood {0}'.format(branch)},
+                      'doc-b': {'url': repo.git_dir, 'branch': branch},
+                      })
+
+    def analyze(repo, config, name, *args, **kwargs):
+        if name == 'broken':
+            raise KeyError('unexpected')
+        return analyze_branch(repo, config, name, *args, **kwargs)
+
+    # The forked workers inherit the patch:
+    with patch('docstats.worker.analyze_branch', side_effect=analyze):
+        work(config, tmpdir.strpath, jobs=1)
+    data = json.loads(tmpdir.join('doc-a.json').read())
+    assert data['broken'] == {'error': "'unexpected'"}
+    assert data['good']['commits'] == result['commits']
+    assert json.loads(tmpdir.join('doc-b.json').read())[branch]['commits'] == result['commits']
+
 
+def test_work_with_bad_url(gitrepo, tmpdir):
+    result, repo = gitrepo
+    config = ConfigParser(default_section='globals')
+    config.read_dict({'doc-a': {'url': tmpdir.join('nothing').strpath},
+                      'doc-b': {'url': repo.git_dir, 'branch': repo.active_branch.name},
+                      })
+    work(config, tmpdir.strpath, jobs=2, clonejobs=1)
+    assert not tmpdir.join('doc-a.json').check()
+    data = json.loads(tmpdir.join('doc-b.json').read())
+    assert data[repo.active_branch.name]['commits'] == result['commits']